@@ -21,7 +21,7 @@ def create_app(config_object=DevelopmentConfig):
     init_extensions(app)
     print("Finished Initialising app")
     from .models import Invitation, Settings, User, Notification
-    from .tasks import maintenance
+    from .tasks import maintenance, jobs
 
     
     # 2. blueprints
@@ -37,6 +37,14 @@ def create_app(config_object=DevelopmentConfig):
     app.context_processor(inject_server_name)
 
     register_error_handlers(app)
+
+    from .cli import jobs_cli
+    app.cli.add_command(jobs_cli)
     
     app.before_request(require_onboarding)
+
+    # Gunicorn starts these in its master (gunicorn.conf.py); other servers
+    # opt in here so notifications and scheduled tasks still run
+    if app.config["SCHEDULER_AUTOSTART"]:
+        maintenance.start_scheduler(app)
     return app
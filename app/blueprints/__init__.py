@@ -11,7 +11,8 @@ from .api.status import status_bp
 from .emby.routes import emby_bp
 from .media_servers.routes import media_servers_bp
 from .audiobookshelf.routes import abs_bp
+from .jobs.routes import jobs_bp
 
 all_blueprints = (public_bp, wizard_bp, admin_bp, auth_bp,
                   settings_bp, setup_bp, plex_bp, notify_bp, jellyfin_bp, emby_bp, abs_bp, status_bp,
-                  media_servers_bp)
+                  media_servers_bp, jobs_bp)
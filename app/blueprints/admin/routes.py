@@ -1,10 +1,17 @@
+import base64
+import json
 import logging
-from flask import Blueprint, render_template, request, redirect, abort, url_for
+from dataclasses import dataclass
+from flask import Blueprint, render_template, request, redirect, abort, url_for, jsonify
 from app.services.invites import create_invite
-from app.services.media.service import list_users, delete_user, list_users_all_servers, list_users_for_server, scan_libraries_for_server, EMAIL_RE
+from app.services.media.service import delete_users, scan_libraries_for_server
 from app.services.update_check import check_update_available, get_sponsors
 from app.extensions import db, htmx
-from app.models import Invitation, Settings, User, MediaServer, Library, Identity
+from app.models import Invitation, User, MediaServer, Library, Identity, Job
+from app.services.settings import get_setting
+from app.services.search import user_search_clause, invite_ids
+from app.services.libraries import LibrarySyncService
+from app.services.jobs import enqueue, job_state
 from app.blueprints.settings.routes import _load_settings
 import os
 from flask_login import login_required
@@ -124,8 +131,7 @@ def invite_table():
 
     # fallback: default settings when no filter
     if server_type is None:
-        server_type_setting = Settings.query.filter_by(key="server_type").first()
-        server_type = server_type_setting.value if server_type_setting else None
+        server_type = get_setting("server_type")
 
     invites = query.all()
     now = datetime.datetime.now()
@@ -158,48 +164,193 @@ def users():
 @admin_bp.route("/users/table")
 @login_required
 def users_table():
-    server_id = request.args.get("server")
-    order = request.args.get("order", "name_asc")
-    query_text = request.args.get("q", "").lower()
     # single or multi delete
-    if (uid := request.args.get("delete")):
-        delete_user(int(uid))
+    if (uid := request.args.get("delete")) and uid.isdigit():
+        delete_users([int(uid)])
     if (multi := request.args.get("delete_multi")):
-        for uid in multi.split(','):
-            if uid.isdigit():
-                delete_user(int(uid))
+        delete_users(int(uid) for uid in multi.split(',') if uid.isdigit())
 
-    # 1) ensure data synced from media servers
-    try:
-        if server_id:
-            srv = MediaServer.query.get(int(server_id))
-            list_users_for_server(srv)
-        else:
-            list_users_all_servers()
-    except Exception as exc:
-        logging.error("sync users failed: %s", exc)
+    # Servers that were never mirrored (e.g. freshly added) get one background
+    # sync so the grid fills in; everything else – including servers whose
+    # first sync failed – is kept fresh by the scheduler.  Follow-up pages
+    # never look.
+    job = None
+    if not request.values.get("cursor"):
+        never_synced = MediaServer.query.filter(
+            MediaServer.last_synced_at.is_(None), MediaServer.last_sync_status.is_(None)
+        ).all()
+        jobs = [enqueue("sync_users", {"server_id": srv.id}, key=f"sync_users:{srv.id}") for srv in never_synced]
+        job = jobs[0] if jobs else None
 
-    # 2) build DB query with eager load to keep session bound
-    q = (
-        User.query
-        .options(db.joinedload(User.server))
+    return _render_user_grid(job=job)
+
+
+@admin_bp.route("/users/search")
+@login_required
+def users_search():
+    """JSON typeahead: a few users and invitations matching ``q``."""
+    term = request.args.get("q", "").strip()
+    if not term:
+        return jsonify(users=[], invites=[])
+    limit = max(1, min(request.args.get("limit", 10, type=int), 50))
+
+    users = (
+        User.query.options(db.joinedload(User.server))
+        .filter(user_search_clause(term))
+        .order_by(db.func.lower(User.username), User.id)
+        .limit(limit)
+        .all()
     )
+    invites = Invitation.query.filter(Invitation.id.in_(invite_ids(term, limit))).all()
+    return jsonify(
+        users=[
+            {
+                "id": u.id,
+                "username": u.username,
+                "email": u.email,
+                "server": u.server.name if u.server else None,
+            }
+            for u in users
+        ],
+        invites=[{"id": i.id, "code": i.code, "used": bool(i.used)} for i in invites],
+    )
+
+
+@admin_bp.post("/users/sync")
+@login_required
+def sync_users():
+    """Explicit "sync now" – refresh the local mirror from the media servers."""
+    server_id = request.values.get("server")
+    if server_id and server_id.isdigit():
+        job = enqueue("sync_users", {"server_id": int(server_id)}, key=f"sync_users:{server_id}")
+    else:
+        job = enqueue("sync_users", key="sync_users")
+    return _render_user_grid(job=job)
+
+
+USERS_PER_PAGE = 60
+USERS_PER_PAGE_MAX = 200
+
+
+def _user_filters(q):
+    """Apply the ``server`` and ``q`` grid filters from the request to *q*."""
+    server_id = request.values.get("server")
+    query_text = request.values.get("q", "").strip()
     if server_id:
         q = q.filter(User.server_id == int(server_id))
     if query_text:
-        like_pattern = f"%{query_text}%"
-        q = q.filter(db.or_(User.username.ilike(like_pattern), User.email.ilike(like_pattern)))
+        q = q.filter(user_search_clause(query_text))
+    return q
+
+
+def _encode_cursor(name: str, key: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name, key]).encode()).decode()
+
 
-    # sorting
-    if order == "name_desc":
-        q = q.order_by(db.func.lower(User.username).desc())
+def _decode_cursor(cursor: str) -> tuple[str, str] | None:
+    try:
+        name, key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(name), str(key)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class UserCard:
+    """One card of the user grid: a primary account plus its linked accounts."""
+    id: int
+    username: str
+    email: str | None
+    photo: str | None
+    expires: datetime.datetime | None
+    code: str
+    accounts: list
+    allowSync: bool = False
+
+
+def _render_user_grid(job: Job | None = None):
+    """Render one page of the user card grid from the local DB only.
+
+    Filters (``server``, ``q``, ``order``) are read from the request so every
+    endpoint that swaps ``#user_table`` renders the same way.  Accounts are
+    grouped into cards in SQL on ``User.card_key`` and pages are cut with a
+    keyset cursor on ``(card_name, card_key)`` – both stored on every account
+    and indexed together, so a page is a range scan of ``per_page`` cards and
+    the response size doesn't grow with the number of users.  Follow-up
+    pages (``cursor`` set) only return the cards plus the next
+    infinite-scroll sentinel.  *job* adds a progress bar for a background
+    job that will change the grid.
+    """
+    order = request.values.get("order", "name_asc")
+    desc = order == "name_desc"
+    per_page = max(1, min(request.values.get("per_page", USERS_PER_PAGE, type=int), USERS_PER_PAGE_MAX))
+    cursor = _decode_cursor(request.values.get("cursor", ""))
+
+    q = _user_filters(
+        db.session.query(
+            User.card_key.label("key"),
+            User.card_name.label("name"),
+            db.func.min(User.expires).label("expires"),
+            db.func.max(User.photo).label("photo"),
+        )
+    )
+    if cursor:
+        name, key = cursor
+        if desc:
+            q = q.filter(db.or_(User.card_name < name, db.and_(User.card_name == name, User.card_key < key)))
+        else:
+            q = q.filter(db.or_(User.card_name > name, db.and_(User.card_name == name, User.card_key > key)))
+    q = q.group_by(User.card_name, User.card_key)
+    if desc:
+        q = q.order_by(User.card_name.desc(), User.card_key.desc())
     else:
-        q = q.order_by(db.func.lower(User.username))
+        q = q.order_by(User.card_name, User.card_key)
+
+    groups = q.limit(per_page + 1).all()
+    has_more = len(groups) > per_page
+    groups = groups[:per_page]
+    next_cursor = _encode_cursor(groups[-1].name, groups[-1].key) if has_more else None
 
-    users = q.all()
+    cards = _build_cards(groups)
+    context = dict(users=cards, next_cursor=next_cursor, per_page=per_page)
+    if cursor:
+        return render_template("tables/user_card_rows.html", **context)
 
-    grouped = _group_users_for_display(users)
-    return render_template("tables/user_card.html", users=grouped)
+    total = _user_filters(db.session.query(db.func.count(db.distinct(User.card_key)))).scalar()
+    servers = MediaServer.query.order_by(MediaServer.name).all()
+    return render_template("tables/user_card.html", servers=servers, total=total,
+                           job=job_state(job) if job else None, **context)
+
+
+def _build_cards(groups: list) -> list[UserCard]:
+    """Load the accounts of one page of grouped rows into ``UserCard``s."""
+    if not groups:
+        return []
+    accounts: dict[str, list] = {}
+    rows = (
+        _user_filters(User.query.options(db.joinedload(User.server)))
+        .filter(User.card_key.in_([g.key for g in groups]))
+        .order_by(db.func.lower(User.username), User.id)
+    )
+    for user in rows:
+        accounts.setdefault(user.card_key, []).append(user)
+
+    cards = []
+    for group in groups:
+        accts = accounts.get(group.key)
+        if not accts:
+            continue
+        primary = accts[0]
+        cards.append(UserCard(
+            id=primary.id,
+            username=primary.username,
+            email=primary.email,
+            photo=group.photo,
+            expires=group.expires,
+            code=next((a.code for a in accts if a.code and a.code not in ("None", "empty")), ""),
+            accounts=accts,
+        ))
+    return cards
 
 
 @admin_bp.route("/user/<int:db_id>", methods=["GET", "POST"])
@@ -217,9 +368,7 @@ def user_detail(db_id: int):
         db.session.commit()
 
         # Re-render the grid the same way /users/table does
-        all_dict = list_users_all_servers()
-        users_flat = [u for lst in all_dict.values() for u in lst]
-        return render_template('tables/user_card.html', users=_group_users_for_display(users_flat))
+        return _render_user_grid()
 
     # ── GET → serve the compact modal ─────────────────────────────
     return render_template("admin/user_modal.html", user=user)
@@ -228,31 +377,19 @@ def user_detail(db_id: int):
 @admin_bp.post('/invite/scan-libraries')
 @login_required
 def invite_scan_libraries():
-    from app.services.media.service import scan_libraries_for_server
-    from app.models import MediaServer, Library
     sid = request.form.get('server_id')
     if not sid:
         return '<div class="text-red-500">No server selected</div>', 400
     server = MediaServer.query.get(int(sid))
     if not server:
         return '<div class="text-red-500">Invalid server</div>', 400
+    sync = LibrarySyncService(server)
     try:
-        raw = scan_libraries_for_server(server)
-        items = raw.items() if isinstance(raw, dict) else [(n,n) for n in raw]
+        sync.scan()
     except Exception as exc:
         logging.warning('Library scan failed: %s', exc)
         return '<div class="text-red-500">Scan failed</div>'
-    seen=set()
-    for fid,name in items:
-        seen.add(fid)
-        lib = Library.query.filter_by(external_id=fid, server_id=server.id).first()
-        if lib:
-            lib.name = name
-        else:
-            db.session.add(Library(external_id=fid,name=name,server_id=server.id))
-    db.session.commit()
-    libs = Library.query.filter_by(server_id=server.id).order_by(Library.name).all()
-    return render_template('partials/library_checkboxes.html', libs=libs)
+    return render_template('partials/library_checkboxes.html', libs=sync.libraries())
 
 
 @admin_bp.post("/users/link")
@@ -268,9 +405,7 @@ def link_accounts():
     for u in users:
         u.identity = identity
     db.session.commit()
-    all_dict = list_users_all_servers()
-    users_flat = [u for lst in all_dict.values() for u in lst]
-    return render_template('tables/user_card.html', users=_group_users_for_display(users_flat))
+    return _render_user_grid()
 
 @admin_bp.post('/users/unlink')
 @login_required
@@ -313,59 +448,38 @@ def unlink_account():
     db.session.commit()
 
     # Return refreshed grid
-    all_dict = list_users_all_servers()
-    users_flat = [u for lst in all_dict.values() for u in lst]
-    return render_template('tables/user_card.html', users=_group_users_for_display(users_flat))
+    return _render_user_grid()
 
 @admin_bp.post('/users/bulk-delete')
 @login_required
 def bulk_delete_users():
-    ids = request.form.getlist('uids')
-    for uid in ids:
-        delete_user(int(uid))
-    all_dict = list_users_all_servers()
-    users_flat = [u for lst in all_dict.values() for u in lst]
-    return render_template('tables/user_card.html', users=_group_users_for_display(users_flat))
-
-# Helper: group and enrich users for display
-def _group_users_for_display(user_list):
-    """Collapse multiple User rows into primary cards.
-
-    • Accounts that share the same `identity_id` are always grouped.
-    • If no identity link exists, we *only* group by e-mail when the address
-      looks like a real one according to the same regex used by the automatic
-      linker.  This prevents users imported from Plex/ABS that have blank or
-      placeholder addresses ("None", "", etc.) from being merged together.
-    """
+    ids = [int(uid) for uid in request.form.getlist('uids') if uid.isdigit()]
+    if not ids:
+        return _render_user_grid()
+    # the grid reloads once the job is done (job-finished event)
+    return _render_user_grid(job=enqueue("delete_users", {"ids": ids}))
 
-    groups: dict[str, list] = {}
-    for u in user_list:
-        if u.identity_id:
-            key = f"id:{u.identity_id}"
-        else:
-            email = (u.email or "").strip()
-            if EMAIL_RE.fullmatch(email):
-                key = f"email:{email.lower()}"
-            else:
-                # Fallback to the user record itself → no unintended merging
-                key = f"user:{u.id}"
-        groups.setdefault(key, []).append(u)
+def _library_ids(server_type: str, details: dict) -> list[str] | None:
+    """Library ids the account may access, ``None`` meaning all of them."""
+    if server_type == "plex":
+        # Custom API wrapper returns Policy.sections
+        return (details.get("Policy", {}) or {}).get("sections") or []
+
+    if server_type in ("jellyfin", "emby"):
+        pol = details.get("Policy", {}) or {}
+        enabled = pol.get("EnabledFolders", []) or []
+        if not pol.get("EnableAllFolders", False) and enabled:
+            return enabled
+        # access to all – fallback to None to trigger 'all' UI
+        return None
+
+    if server_type in ("audiobookshelf", "abs"):
+        all_flag = (details.get("permissions", {}) or {}).get("accessAllLibraries", False)
+        enabled = details.get("librariesAccessible", []) or []
+        return enabled if not all_flag and enabled else None
+
+    return None
 
-    cards = []
-    for lst in groups.values():
-        primary = min(lst, key=lambda x: (x.username or ""))
-        photo = next((a.photo for a in lst if a.photo), None)
-        expires = min([a.expires for a in lst if a.expires] or [None])
-        code = next((a.code for a in lst if a.code and a.code not in ("None","empty")), "")
-        allow_sync = any(getattr(a, "allowSync", False) for a in lst)
-
-        primary.accounts = lst
-        primary.photo = photo or primary.photo
-        primary.expires = expires
-        primary.code = code
-        primary.allowSync = allow_sync
-        cards.append(primary)
-    return cards
 
 @admin_bp.route("/user/<int:db_id>/details")
 @login_required
@@ -376,10 +490,11 @@ def user_details_modal(db_id: int):
     • Join date (if available)
     • List of libraries they can access (server-specific)
     • Policy / configuration flags returned by the MediaClient
+
+    Linked accounts are fetched concurrently (see ``fetch_user_details``),
+    so the modal opens in the time of the slowest server.
     """
-    import logging
-    from app.services.media.service import get_client_for_media_server
-    from app.models import Library
+    from app.services.media.service import fetch_user_details
 
     user = User.query.get_or_404(db_id)
 
@@ -394,8 +509,16 @@ def user_details_modal(db_id: int):
     else:
         accounts = [user]
 
-    accounts_info = []
+    details_by_user = fetch_user_details(accounts)
+
+    # one query for the library names of every involved server
+    server_ids = {acct.server_id for acct in accounts if acct.server_id}
+    libraries: dict[int, list[Library]] = {}
+    if server_ids:
+        for lib in Library.query.filter(Library.server_id.in_(server_ids)).order_by(Library.name):
+            libraries.setdefault(lib.server_id, []).append(lib)
 
+    accounts_info = []
     for acct in accounts:
         srv = acct.server
         info: dict = {
@@ -406,67 +529,23 @@ def user_details_modal(db_id: int):
             "policies": None,
         }
 
-        if srv:
-            try:
-                client = get_client_for_media_server(srv)
-                if not hasattr(client, "get_user"):
-                    raise AttributeError("Client lacks get_user()")
-
-                # Plex helper expects DB row id; others typically use upstream id stored in token.
-                user_arg = acct.id if srv.server_type == "plex" else acct.token
-                details = client.get_user(user_arg)
-
-                lib_ids: list[str] | None = None
-
-                if srv.server_type == "plex":
-                    # Custom API wrapper returns Policy.sections
-                    lib_ids = (details.get("Policy", {}) or {}).get("sections") or []
-
-                elif srv.server_type in ("jellyfin", "emby"):
-                    pol = details.get("Policy", {}) or {}
-                    enable_all = pol.get("EnableAllFolders", False)
-                    enabled = pol.get("EnabledFolders", []) or []
-                    if not enable_all and enabled:
-                        lib_ids = enabled
-                    else:
-                        # access to all – fallback to None to trigger 'all' UI
-                        lib_ids = None
-
-                elif srv.server_type in ("audiobookshelf", "abs"):
-                    all_flag = (details.get("permissions", {}) or {}).get("accessAllLibraries", False)
-                    enabled = details.get("librariesAccessible", []) or []
-                    if not all_flag and enabled:
-                        lib_ids = enabled
-                    else:
-                        lib_ids = None  # all libraries
-
+        details = details_by_user.get(acct.id)
+        if srv and details is not None:
+            server_libs = libraries.get(srv.id, [])
+            lib_ids = _library_ids(srv.server_type, details)
+            if lib_ids is not None:
                 # Map IDs to names when possible
-                if lib_ids is not None:
-                    libs_q = (
-                        Library.query
-                        .filter(Library.external_id.in_(lib_ids), Library.server_id == srv.id)
-                        .order_by(Library.name)
-                        .all()
-                    )
-                    names = [lib.name for lib in libs_q]
-                    # Preserve IDs with no matching DB row so user sees something
-                    missing = [lid for lid in lib_ids if lid not in {l.external_id for l in libs_q}]
-                    info["libraries"] = names + missing
-                else:
-                    # lib_ids None means full access – pick all enabled libs for server
-                    libs_q = (
-                        Library.query
-                        .filter_by(server_id=srv.id)
-                        .order_by(Library.name)
-                        .all()
-                    )
-                    info["libraries"] = [lib.name for lib in libs_q]
-
-                # Store policies / config for optional display
-                info["policies"] = details.get("Configuration") or details.get("Policy") or details.get("permissions")
-
-            except Exception as exc:
-                logging.error("Failed to fetch user details for account %s/%s: %s", acct.id, acct.username, exc)
+                wanted = set(lib_ids)
+                names = [lib.name for lib in server_libs if lib.external_id in wanted]
+                # Preserve IDs with no matching DB row so user sees something
+                known = {lib.external_id for lib in server_libs}
+                info["libraries"] = names + [lid for lid in lib_ids if lid not in known]
+            else:
+                # lib_ids None means full access – pick all enabled libs for server
+                info["libraries"] = [lib.name for lib in server_libs]
+
+            # Store policies / config for optional display
+            info["policies"] = details.get("Configuration") or details.get("Policy") or details.get("permissions")
 
         accounts_info.append(info)
 
@@ -3,7 +3,8 @@ from flask_login import login_required
 
 from app.services.media.audiobookshelf import AudiobookshelfClient
 from app.forms.join import JoinForm
-from app.models import Invitation, MediaServer
+from app.models import MediaServer
+from app.services.invites import get_invite
 from app.services.media.service import get_client_for_media_server
 
 abs_bp = Blueprint("audiobookshelf", __name__, url_prefix="/abs")
@@ -30,7 +31,7 @@ def scan():
 def public_join():
     form = JoinForm()
     if form.validate_on_submit():
-        inv = Invitation.query.filter_by(code=form.code.data).first()
+        inv = get_invite(form.code.data)
         server = inv.server if inv else MediaServer.query.first()
         client = get_client_for_media_server(server)
         ok, msg = client.join(
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, session, url_for
 from werkzeug.security import check_password_hash
-from app.models import Settings, AdminUser
+from app.models import AdminUser
+from app.services.settings import get_setting
 from app.extensions import db
 import os, logging
 from flask_babel import _
@@ -22,18 +23,8 @@ def login():
     password = request.form.get("password")
 
     # fetch the stored admin credentials
-    admin_username = (
-        db.session
-          .query(Settings.value)
-          .filter_by(key="admin_username")
-          .scalar()
-    )
-    admin_password_hash = (
-        db.session
-          .query(Settings.value)
-          .filter_by(key="admin_password")
-          .scalar()
-    )
+    admin_username = get_setting("admin_username")
+    admin_password_hash = get_setting("admin_password")
 
     if username == admin_username and check_password_hash(admin_password_hash, password):
         # ❑ auto-migrate sha256 → scrypt
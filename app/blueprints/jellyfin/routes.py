@@ -2,7 +2,8 @@ from flask import Blueprint, request, jsonify, abort, render_template, redirect,
 from flask_login import login_required
 from app.services.media.jellyfin import JellyfinClient
 from app.forms.join import JoinForm
-from app.models import Invitation, MediaServer
+from app.models import MediaServer
+from app.services.invites import get_invite
 from app.services.media.service import get_client_for_media_server
 
 
@@ -37,7 +38,7 @@ def public_join():
     form = JoinForm()
     if form.validate_on_submit():
         # Determine server from invitation
-        inv = Invitation.query.filter_by(code=form.code.data).first()
+        inv = get_invite(form.code.data)
         server = inv.server if inv else MediaServer.query.first()
         client = get_client_for_media_server(server)
         ok, msg = client.join(
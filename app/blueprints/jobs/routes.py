@@ -0,0 +1,30 @@
+import json
+
+from flask import Blueprint, jsonify, make_response, render_template, request
+from flask_login import login_required
+
+from app.extensions import db
+from app.models import Job
+from app.services.jobs import DONE, job_state
+
+jobs_bp = Blueprint("jobs", __name__, url_prefix="/jobs")
+
+
+@jobs_bp.route("/<int:job_id>")
+@login_required
+def progress(job_id: int):
+    """Progress of one background job.
+
+    HTMX gets a progress bar that polls itself until the job finishes; a
+    finished job fires a ``job-finished`` event so the page can refresh
+    whatever the job changed.  ``?format=json`` returns the raw state.
+    """
+    job = db.get_or_404(Job, job_id)
+    state = job_state(job)
+    if request.args.get("format") == "json":
+        return jsonify(state)
+
+    resp = make_response(render_template("partials/job_progress.html", job=state))
+    if state["status"] == DONE:
+        resp.headers["HX-Trigger"] = json.dumps({"job-finished": {"id": job.id, "type": job.type}})
+    return resp
@@ -4,7 +4,9 @@ from app.extensions import db
 from app.models import MediaServer, Library, User
 from app.forms.settings import SettingsForm  # reuse existing form for now
 from app.services.servers import check_plex, check_jellyfin, check_emby, check_audiobookshelf
-from app.services.media.service import scan_libraries_for_server
+from app.services.jobs import enqueue, job_state
+from app.services.libraries import LibrarySyncService
+from app.services.media.client_base import invalidate_client
 
 media_servers_bp = Blueprint("media_servers", __name__, url_prefix="/settings/servers")
 
@@ -73,28 +75,23 @@ def create_server():
 @login_required
 def scan_server_libraries(server_id):
     server = MediaServer.query.get_or_404(server_id)
+    sync = LibrarySyncService(server)
     try:
-        items = scan_libraries_for_server(server)
+        sync.scan()
     except Exception as exc:
         flash(f"Library scan failed: {exc}", "error")
         return "<div class='text-red-500'>Failed</div>", 500
 
-    # items may be dict or list[str]
-    pairs = items.items() if isinstance(items, dict) else [(name, name) for name in items]
+    # Render checkboxes partial (reuse existing partials)
+    return render_template('partials/library_checkboxes.html', libs=sync.libraries())
 
-    seen_ids = set()
-    for fid, name in pairs:
-        seen_ids.add(fid)
-        lib = Library.query.filter_by(external_id=fid, server_id=server.id).first()
-        if lib:
-            lib.name = name
-        else:
-            db.session.add(Library(external_id=fid, name=name, server_id=server.id))
-    db.session.commit()
 
-    # Render checkboxes partial (reuse existing partials)
-    all_libs = Library.query.filter_by(server_id=server.id).order_by(Library.name).all()
-    return render_template('partials/library_checkboxes.html', libs=all_libs)
+@media_servers_bp.post("/refresh-libraries")
+@login_required
+def refresh_libraries():
+    """Queue a library refresh of every server and return its progress bar."""
+    job = enqueue("refresh_libraries", key="refresh_libraries")
+    return render_template("partials/job_progress.html", job=job_state(job))
 
 
 @media_servers_bp.route("/<int:server_id>/edit", methods=["GET", "POST"])
@@ -142,4 +139,6 @@ def delete_server():
         # 2) Finally remove the MediaServer itself.
         MediaServer.query.filter_by(id=server_id).delete(synchronize_session=False)
         db.session.commit()
+        # bulk delete bypasses ORM events, so drop the cached client explicitly
+        invalidate_client(int(server_id))
     return "", 204 
\ No newline at end of file
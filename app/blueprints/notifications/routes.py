@@ -1,8 +1,8 @@
 from flask import Blueprint, render_template, request, redirect, make_response, url_for
 from flask_login import login_required
 from app.extensions import db
-from app.models import Notification
-from app.services.notifications import _discord, _ntfy, _apprise  # your existing helpers
+from app.models import Notification, NotificationDelivery
+from app.services.notifications import _discord, _ntfy, _apprise, invalidate_apprise  # your existing helpers
 
 notify_bp = Blueprint("notify", __name__, url_prefix="/settings/notifications")
 
@@ -23,6 +23,7 @@ def create():
             "type":    request.form.get("notification_service"),
             "username": request.form.get("username") or None,
             "password": request.form.get("password") or None,
+            "digest_minutes": request.form.get("digest_minutes", type=int) or None,
         }
 
         # test the connection
@@ -65,6 +66,12 @@ def create():
 def delete_agent():
     agent_id = request.args.get("delete")
     if agent_id:
+        # drop its outbox deliveries too – SQLite doesn't enforce the cascade
+        (
+            NotificationDelivery.query
+            .filter_by(agent_id=agent_id)
+            .delete(synchronize_session=False)
+        )
         # replace peewee delete().where(...).execute()
         (
             Notification.query
@@ -72,4 +79,6 @@ def delete_agent():
             .delete(synchronize_session=False)
         )
         db.session.commit()
+        # bulk delete skips the mapper events
+        invalidate_apprise(int(agent_id))
     return "", 204
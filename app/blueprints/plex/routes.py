@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, abort
 from flask_login import login_required
-from app.services.media.plex import PlexClient
-from cachetools import TTLCache, cached
+from app.services.media.service import get_client
+from app.services.cache import remember, hashed_key
 
 plex_bp = Blueprint("plex", __name__, url_prefix="/plex")
 
@@ -25,7 +25,7 @@ def scan():
 @plex_bp.route("/scan-specific", methods=["POST"])
 @login_required
 def scan_specific():
-    client = PlexClient()
+    client = get_client("plex")
     try:
         libs = client.libraries()
     except Exception:
@@ -33,7 +33,10 @@ def scan_specific():
     return jsonify(libs)
 
 # optional cache so the first endpoint isn't hit spammy
-@cached(cache=TTLCache(maxsize=128, ttl=300))
 def _scan(url, token):
     from plexapi.server import PlexServer
-    return [lib.title for lib in PlexServer(url, token).library.sections()]
+    return remember(
+        hashed_key("plex-scan", url, token),
+        300,
+        lambda: [lib.title for lib in PlexServer(url, token).library.sections()],
+    )
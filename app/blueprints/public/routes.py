@@ -1,9 +1,12 @@
-from flask import Blueprint, redirect, render_template, send_from_directory, request, jsonify, url_for, session
-import os, threading
+from flask import Blueprint, abort, redirect, render_template, send_from_directory, request, jsonify, url_for, session
+from flask_babel import _
+from flask_login import current_user
+import os
 from app.extensions import db
-from app.models import Settings, Invitation, MediaServer
-from app.services.invites import is_invite_valid
-from app.services.media.plex import handle_oauth_token
+from app.models import Invitation, MediaServer
+from app.services.settings import get_setting
+from app.services.invites import get_invite, is_invite_valid
+from app.services.media.plex import onboarding_status, start_onboarding
 from app.services.ombi_client import run_all_importers
 from app.forms.join import JoinForm
 
@@ -13,8 +16,7 @@ public_bp = Blueprint("public", __name__)
 @public_bp.route("/")
 def root():
     # check if admin_username exists
-    admin_setting = Settings.query.filter_by(key="admin_username").first()
-    if not admin_setting:
+    if get_setting("admin_username") is None:
         return redirect("/setup/")              # installation wizard
     return redirect("/admin")
 
@@ -30,9 +32,7 @@ def favicon():
 # ─── Invite link  /j/<code> ─────────────────────────────────────────────────
 @public_bp.route("/j/<code>")
 def invite(code):
-    invitation = Invitation.query.filter(
-        db.func.lower(Invitation.code) == code.lower()
-    ).first()
+    invitation = get_invite(code)
     valid, msg = is_invite_valid(code)
     if not valid:
         return render_template("invalid-invite.html", error=msg)
@@ -56,16 +56,12 @@ def join():
     code  = request.form.get("code")
     token = request.form.get("token")
 
-    print("Got Token: ", token)
 
-    invitation = Invitation.query.filter(
-        db.func.lower(Invitation.code) == code.lower()
-    ).first()
+    invitation = get_invite(code)
     valid, msg = is_invite_valid(code)
     if not valid:
         # server_name for rendering error
-        name_setting = Settings.query.filter_by(key="server_name").first()
-        server_name = name_setting.value if name_setting else None
+        server_name = get_setting("server_name")
 
         return render_template(
             "user-plex-login.html",
@@ -77,17 +73,18 @@ def join():
     server = invitation.server or MediaServer.query.first()
     server_type = server.server_type if server else None
 
-    from flask import current_app
-    app = current_app._get_current_object()
-    
     if server_type == "plex":
-        # run Plex OAuth in background
-        threading.Thread(
-            target=handle_oauth_token,
-            args=(app, token, code),
-            daemon=True
-        ).start()
+        # invite + accept run as a background job; the wizard polls its status
+        onboarding = start_onboarding(token, code, server)
+        if onboarding is None:
+            return render_template(
+                "user-plex-login.html",
+                name=get_setting("server_name"),
+                code=code,
+                code_error=_("Too many people are joining right now – please try again in a minute.")
+            )
         session["wizard_access"] = code
+        session["plex_onboarding"] = onboarding.id
         return redirect(url_for("wizard.start"))
     elif server_type in ("jellyfin", "emby", "audiobookshelf"):
         return render_template("welcome-jellyfin.html", code=code, server_type=server_type)
@@ -95,6 +92,29 @@ def join():
     # fallback if server_type missing/unsupported
     return render_template("invalid-invite.html", error="Configuration error.")
 
+# ─── GET /join/status/<code>  (Plex onboarding progress) ────────────────────
+@public_bp.route("/join/status/<code>")
+def join_status(code):
+    """Onboarding status of the current visitor's Plex sign-up.
+
+    Only the visitor who joined with *code* (or an admin) may look.  HTMX
+    gets a badge that polls itself until the invite is accepted or failed;
+    ``?format=json`` returns ``{"code", "status", "finished", "retrying"}``.
+    """
+    if not current_user.is_authenticated and session.get("wizard_access") != code:
+        abort(404)
+    row = onboarding_status(code, session.get("plex_onboarding"))
+    if row is None:
+        abort(404)
+    # an invite whose automatic accept gave up stays "invited" without a
+    # token – stop polling; with an error otherwise its job will retry
+    finished = row.status in ("accepted", "failed") or (row.status == "invited" and row.token is None)
+    retrying = not finished and bool(row.error)
+    if request.args.get("format") == "json":
+        return jsonify(code=code, status=row.status, finished=finished, retrying=retrying)
+    return render_template("partials/join_status.html", code=code, status=row.status,
+                           finished=finished, retrying=retrying)
+
 @public_bp.route("/health", methods=["GET"])
 def health():
     # If you need to check DB connectivity, do it here.
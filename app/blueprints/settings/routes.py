@@ -7,9 +7,11 @@ from flask_login import login_required
 from flask_babel import _
 
 from app.services.media.service import scan_libraries as scan_media
+from app.services.libraries import LibrarySyncService, library_pairs
 from ...models import Settings, Library, MediaServer
 from ...forms.settings import SettingsForm
 from ...forms.general import GeneralSettingsForm
+from ...services.settings import get_settings
 from ...services.servers  import check_plex, check_jellyfin, check_emby, check_audiobookshelf
 from ...extensions import db
 
@@ -17,7 +19,7 @@ settings_bp = Blueprint("settings", __name__, url_prefix="/settings")
 
 def _load_settings() -> dict:
     # Load all rows and build a dict
-    settings = {s.key: s.value for s in Settings.query.all()}
+    settings = get_settings()
     
     # Convert specific boolean fields from strings to booleans
     boolean_fields = ["allow_downloads_plex", "allow_tv_plex"]
@@ -164,7 +166,7 @@ def server_settings():
 @login_required
 def scan_libraries():
     # 1) credentials: prefer form → fallback to DB
-    s = {r.key: r.value for r in Settings.query.all()}
+    s = get_settings()
     stype = request.form.get("server_type") or s["server_type"]
     url   = request.form.get("server_url")    or s["server_url"]
     key   = request.form.get("api_key")       or s["api_key"]
@@ -174,31 +176,19 @@ def scan_libraries():
 
     # 2) fetch upstream libraries
     try:
-        raw = scan_media(url=url, token=key, server_type=stype)
-        # unify into list of (external_id, display_name)
-        items = raw.items() if isinstance(raw, dict) else [(name, name) for name in raw]
+        items = library_pairs(scan_media(url=url, token=key, server_type=stype))
     except Exception as exc:
         logging.warning("Library scan failed: %s", exc)
         return "<div class='text-red-500'>%s</div>" % _("Library scan failed")
 
-    # 3) upsert into our Library table
-    seen_ids = set()
-    for fid, name in items:
-        seen_ids.add(fid)
-        lib = Library.query.filter_by(external_id=fid).first()
-        if lib:
-            lib.name = name   # keep names fresh
-        else:
-            db.session.add(Library(external_id=fid, name=name))
-    # delete any that upstream no longer offers
-    Library.query.filter(~Library.external_id.in_(seen_ids)).delete(synchronize_session=False)
-    db.session.commit()
+    # 3) mirror into unowned Library rows – the server isn't saved yet
+    sync = LibrarySyncService()
+    sync.apply(items)
 
     # 4) render checkboxes off our Library.enabled
-    all_libs = Library.query.order_by(Library.name).all()
     return render_template(
       "partials/library_checkboxes.html",
-      libs=all_libs
+      libs=sync.libraries(items)
     )
 
 @settings_bp.route('/general', methods=['GET', 'POST'])
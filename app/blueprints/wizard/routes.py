@@ -1,10 +1,13 @@
 from flask_babel import _
 from pathlib import Path
-import frontmatter, markdown
 from flask import Blueprint, render_template, abort, request, session, redirect
 from flask_login import current_user
-from app.models import Settings, MediaServer, Invitation
-from app.services.ombi_client import run_all_importers
+from app.models import MediaServer
+from app.services.invites import get_invite
+from app.services.settings import get_settings
+from app.services.jobs import enqueue
+from app.services.ombi_client import importers_configured
+from app.services.wizard_steps import WizardStep, step_registry
 
 
 wizard_bp = Blueprint("wizard", __name__, url_prefix="/wizard")
@@ -21,12 +24,12 @@ def restrict_wizard():
 
 # ─── helpers ────────────────────────────────────────────────────
 def _settings() -> dict[str, str | None]:
-    data = {s.key: s.value for s in Settings.query.all()}
+    data = get_settings()
 
     # 1️⃣  Override via current invitation (if any)
     inv_code = session.get("wizard_access")
     if inv_code:
-        inv = Invitation.query.filter_by(code=inv_code).first()
+        inv = get_invite(inv_code)
         if inv and inv.server:
             srv = inv.server
             data["server_type"] = srv.server_type
@@ -49,25 +52,8 @@ def _settings() -> dict[str, str | None]:
     return data
 
 
-def _eligible(post: frontmatter.Post, cfg: dict) -> bool:
-    need = post.get("requires", [])
-    return all(cfg.get(k) for k in need)
-
-
-def _steps(server: str, cfg: dict):
-    files = sorted((BASE_DIR / server).glob("*.md"))
-    return [frontmatter.load(f) for f in files if _eligible(frontmatter.load(f), cfg)]
-
-
-def _render(post: frontmatter.Post, ctx: dict) -> str:
-    from flask import render_template_string
-    # Jinja templates inside the markdown files expect a top-level `settings` variable.
-    # Build a context copy that exposes the current config dictionary via this key
-    # while still passing through all existing entries and utilities (e.g. the _() gettext).
-    _vars = ctx.copy()
-    _vars.setdefault("settings", ctx)  # avoid overwriting if already provided
-    md = render_template_string(post.content, **_vars)
-    return markdown.markdown(md, extensions=["fenced_code", "tables", "attr_list"])
+def _steps(server: str, cfg: dict) -> list[WizardStep]:
+    return [s for s in step_registry(BASE_DIR).steps(server) if s.eligible(cfg)]
 
 
 def _serve(server: str, idx: int):
@@ -80,7 +66,7 @@ def _serve(server: str, idx: int):
     direction = request.values.get("dir", "")
 
     idx = max(0, min(idx, len(steps) - 1))
-    html = _render(steps[idx], cfg | {"_": _})
+    html = step_registry(BASE_DIR).render(steps[idx], cfg | {"_": _})
 
     return render_template(
         "wizard/frame.html",
@@ -97,12 +83,14 @@ def _serve(server: str, idx: int):
 @wizard_bp.route("/")
 def start():
     """Entry point – choose wizard folder based on invitation or global settings."""
-    run_all_importers()
+    # the importer POST can take seconds – let the job worker make it
+    if importers_configured():
+        enqueue("ombi_import", key="ombi_import")
 
     inv_code = session.get("wizard_access")
     server_type = None
     if inv_code:
-        inv = Invitation.query.filter_by(code=inv_code).first()
+        inv = get_invite(inv_code)
         if inv and inv.server:
             server_type = inv.server.server_type
 
@@ -0,0 +1,44 @@
+# app/cli.py
+"""``flask jobs …`` commands for the background job queue."""
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app.models import Job
+from app.services.jobs import DEFAULT_LANE, JobWorker, requeue_stale, run_pending
+
+jobs_cli = AppGroup("jobs", help="Background job queue.")
+
+
+@jobs_cli.command("worker")
+@click.option("--concurrency", type=int, default=None, help="Jobs run at once (default: the lane's cap).")
+@click.option("--lane", default=DEFAULT_LANE, show_default=True, help="Lane of job types to run.")
+def worker(concurrency, lane):
+    """Run the job worker in the foreground until interrupted."""
+    app = current_app._get_current_object()
+    w = JobWorker(app, concurrency, lane)
+    click.echo(f"Job worker {w.name} started (concurrency {w.concurrency}).")
+    try:
+        w.run_forever()
+    except KeyboardInterrupt:
+        click.echo("Stopping – waiting for running jobs …")
+    finally:
+        w.stop(wait=True)
+
+
+@jobs_cli.command("run")
+@click.option("--limit", type=int, default=None, help="Stop after this many jobs.")
+def run(limit):
+    """Run queued jobs one after another, then exit."""
+    requeue_stale()
+    click.echo(f"Ran {run_pending(limit)} job(s).")
+
+
+@jobs_cli.command("list")
+@click.option("--limit", type=int, default=20)
+def list_jobs(limit):
+    """Show the most recent jobs."""
+    for job in Job.query.order_by(Job.id.desc()).limit(limit):
+        total = f"/{job.total}" if job.total else ""
+        click.echo(f"{job.id:>6} {job.type:<18} {job.status:<8} {job.progress}{total} "
+                   f"{job.created_at:%Y-%m-%d %H:%M} {job.error or ''}")
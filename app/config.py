@@ -66,9 +66,79 @@ class BaseConfig:
     BABEL_TRANSLATION_DIRECTORIES = str(BASE_DIR / "translations")
     # Scheduler
     SCHEDULER_API_ENABLED = True
+    # Start the scheduler (notification dispatch, expiry, syncs) and job
+    # workers from create_app – for single-process servers such as `flask
+    # run`; Gunicorn starts them in its master via gunicorn.conf.py
+    SCHEDULER_AUTOSTART = os.getenv("SCHEDULER_AUTOSTART", "false").lower() == "true"
     # SQLAlchemy
     SQLALCHEMY_DATABASE_URI = f"sqlite:///{BASE_DIR / 'database' / 'database.db'}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied to every new SQLite connection: busy_timeout (ms) waits for a
+    # lock instead of failing with "database is locked".  SQLITE_TUNING (on in
+    # the Docker image) adds WAL so the workers read while one of them writes,
+    # NORMAL to only fsync at checkpoints (safe with WAL) and a larger page
+    # cache – a negative cache_size is in KiB.
+    SQLITE_PRAGMAS = {
+        "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT", "15000")),
+    }
+    if os.getenv("SQLITE_TUNING", "false").lower() == "true":
+        SQLITE_PRAGMAS |= {
+            "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+            "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+            "cache_size": -int(os.getenv("SQLITE_CACHE_KB", "16384")),
+        }
+    # Media-server user sync: parallel workers and overall deadline (seconds)
+    USER_SYNC_WORKERS = int(os.getenv("USER_SYNC_WORKERS", "4"))
+    USER_SYNC_DEADLINE = int(os.getenv("USER_SYNC_DEADLINE", "30"))
+    # Bulk user deletion: remote deletes in flight per server and in total
+    USER_DELETE_PER_SERVER = int(os.getenv("USER_DELETE_PER_SERVER", "4"))
+    USER_DELETE_WORKERS = int(os.getenv("USER_DELETE_WORKERS", "16"))
+    # User details modal: fan-out deadline and upstream details cache (seconds)
+    USER_DETAILS_DEADLINE = int(os.getenv("USER_DETAILS_DEADLINE", "10"))
+    USER_DETAILS_CACHE_SECONDS = int(os.getenv("USER_DETAILS_CACHE_SECONDS", "60"))
+    # Media-server HTTP clients: keep-alive pool per server, timeouts (seconds)
+    # and retries with backoff for idempotent requests
+    MEDIA_HTTP_POOL_SIZE = int(os.getenv("MEDIA_HTTP_POOL_SIZE", "10"))
+    MEDIA_HTTP_CONNECT_TIMEOUT = float(os.getenv("MEDIA_HTTP_CONNECT_TIMEOUT", "5"))
+    MEDIA_HTTP_READ_TIMEOUT = float(os.getenv("MEDIA_HTTP_READ_TIMEOUT", "10"))
+    MEDIA_HTTP_RETRIES = int(os.getenv("MEDIA_HTTP_RETRIES", "2"))
+    MEDIA_HTTP_BACKOFF = float(os.getenv("MEDIA_HTTP_BACKOFF", "0.5"))
+    # Expired users: how often to check, batch size, remote delete workers and
+    # retry policy for failed remote deletions
+    EXPIRY_CHECK_SECONDS = int(os.getenv("EXPIRY_CHECK_SECONDS", "60"))
+    EXPIRY_BATCH_SIZE = int(os.getenv("EXPIRY_BATCH_SIZE", "100"))
+    EXPIRY_DELETE_WORKERS = int(os.getenv("EXPIRY_DELETE_WORKERS", "4"))
+    EXPIRY_MAX_ATTEMPTS = int(os.getenv("EXPIRY_MAX_ATTEMPTS", "5"))
+    EXPIRY_RETRY_BACKOFF = int(os.getenv("EXPIRY_RETRY_BACKOFF", "60"))
+    # Notification outbox dispatcher: parallel sends per run and retry policy
+    NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", "4"))
+    NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "50"))
+    NOTIFY_MAX_ATTEMPTS = int(os.getenv("NOTIFY_MAX_ATTEMPTS", "5"))
+    NOTIFY_RETRY_BACKOFF = int(os.getenv("NOTIFY_RETRY_BACKOFF", "30"))
+    # Settled outbox events are pruned after this many days
+    NOTIFY_RETENTION_DAYS = int(os.getenv("NOTIFY_RETENTION_DAYS", "30"))
+    # Background jobs: "inprocess" runs the worker pool next to the scheduler,
+    # "external" leaves admin jobs to `flask jobs worker` (sign-ups always run
+    # in-process).  Concurrency is global per lane, heartbeat / stale / retry
+    # timings are in seconds.
+    JOBS_MODE = os.getenv("JOBS_MODE", "inprocess")
+    JOBS_CONCURRENCY = int(os.getenv("JOBS_CONCURRENCY", "2"))
+    JOBS_ONBOARDING_CONCURRENCY = int(os.getenv("JOBS_ONBOARDING_CONCURRENCY", "4"))
+    JOBS_POLL_SECONDS = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+    JOBS_HEARTBEAT_SECONDS = int(os.getenv("JOBS_HEARTBEAT_SECONDS", "15"))
+    JOBS_STALE_SECONDS = int(os.getenv("JOBS_STALE_SECONDS", "90"))
+    JOBS_MAX_ATTEMPTS = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+    JOBS_RETRY_SECONDS = int(os.getenv("JOBS_RETRY_SECONDS", "30"))
+    # Plex sign-ups run as background jobs in their own "onboarding" lane;
+    # joins are turned away while this many are already waiting or running
+    PLEX_ONBOARD_QUEUE_LIMIT = int(os.getenv("PLEX_ONBOARD_QUEUE_LIMIT", "50"))
+    # Rendered wizard steps kept per worker
+    WIZARD_HTML_CACHE_SIZE = int(os.getenv("WIZARD_HTML_CACHE_SIZE", "256"))
+    # Cache shared by all workers: "filesystem" (default), "redis" or "simple"
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "filesystem")
+    CACHE_DIR = str(DATABASE_DIR / "cache")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_THRESHOLD = int(os.getenv("CACHE_THRESHOLD", "500"))
 
 class DevelopmentConfig(BaseConfig):
     DEBUG = True
@@ -6,6 +6,7 @@ from flask_login import LoginManager, UserMixin
 from flask_sqlalchemy import SQLAlchemy
 from flask import request, session, current_app
 from flask_migrate import Migrate
+from sqlalchemy import event
 
 # Instantiate extensions
 db = SQLAlchemy()
@@ -26,7 +27,26 @@ def init_extensions(app):
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
     db.init_app(app)
+    _configure_sqlite(app)
     migrate.init_app(app, db)
+
+
+def _configure_sqlite(app):
+    """Apply ``SQLITE_PRAGMAS`` to every connection the engine opens."""
+    pragmas = app.config.get("SQLITE_PRAGMAS") or {}
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != "sqlite" or not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
     
 
 @login_manager.user_loader
@@ -1,14 +1,38 @@
 # app/middleware.py
+import threading
+
 from flask import request, redirect, url_for
-from app.models import Settings, MediaServer
+from app.extensions import db
+from app.models import MediaServer
+from app.services.settings import get_setting, onboarding_epoch
+
+# Paths that never need a finished onboarding (checked by prefix, no DB access)
+EXEMPT_PREFIXES = ("/setup", "/static", "/settings", "/health", "/favicon.ico")
+
+# Onboarding completes once per install, so once both conditions hold the
+# result is latched for the onboarding epoch it was observed at.  The epoch
+# only moves when a server or the admin account is removed (see
+# app.services.settings), which re-arms the check in every worker.
+_lock = threading.Lock()
+_onboarded_at: int | None = None
+
+
+def _onboarded() -> bool:
+    global _onboarded_at
+    epoch = onboarding_epoch()
+    if epoch is not None and epoch == _onboarded_at:
+        return True
+
+    done = bool(get_setting("admin_username")) and (
+        db.session.query(MediaServer.id).limit(1).scalar() is not None
+    )
+    with _lock:
+        _onboarded_at = epoch if done else None
+    return done
+
 
 def require_onboarding():
-    if request.path.startswith('/setup') or request.path.startswith('/static') or request.path.startswith('/settings'):
+    if request.path.startswith(EXEMPT_PREFIXES):
         return
-    # Check if an admin user exists
-    admin_setting = Settings.query.filter_by(key="admin_username").first()
-    if not admin_setting or not admin_setting.value:
+    if not _onboarded():
         return redirect(url_for('setup.onboarding'))
-    # Require at least one MediaServer to exist
-    if not MediaServer.query.first():
-        return redirect(url_for('setup.onboarding'))
\ No newline at end of file
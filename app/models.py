@@ -1,4 +1,6 @@
+import re
 from datetime import datetime, timezone
+from sqlalchemy import event
 from .extensions import db
 from flask_login import UserMixin
 
@@ -13,19 +15,21 @@ class Invitation(db.Model):
     __tablename__ = 'invitation'
     id = db.Column(db.Integer, primary_key=True)
     code = db.Column(db.String, nullable=False)
+    # lower(code), kept in sync by an attribute event – lookups use this index
+    code_normalized = db.Column(db.String, nullable=True, unique=True, index=True)
     used = db.Column(db.Boolean, default=False, nullable=False)
     used_at = db.Column(db.DateTime, nullable=True)
     created = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
     used_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
     used_by = db.relationship('User', backref=db.backref('invitations', lazy=True))
-    expires = db.Column(db.DateTime, nullable=True)
+    expires = db.Column(db.DateTime, nullable=True, index=True)
     unlimited = db.Column(db.Boolean, nullable=True)
     duration = db.Column(db.String, nullable=True)
     specific_libraries = db.Column(db.String, nullable=True)
     plex_allow_sync = db.Column(db.Boolean, default=False, nullable=True)
     plex_home = db.Column(db.Boolean, default=False, nullable=True)
     plex_allow_channels = db.Column(db.Boolean, default=False, nullable=True)
-    server_id = db.Column(db.Integer, db.ForeignKey('media_server.id'), nullable=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('media_server.id'), nullable=True, index=True)
     server = db.relationship('MediaServer', backref=db.backref('invites', lazy=True))
 
     libraries = db.relationship(
@@ -35,6 +39,11 @@ class Invitation(db.Model):
     )
 
 
+@event.listens_for(Invitation.code, "set")
+def _normalize_invite_code(target, value, _oldvalue, _initiator):
+    target.code_normalized = value.lower() if value else None
+
+
 class Settings(db.Model):
     __tablename__ = 'settings'
     id = db.Column(db.Integer, primary_key=True)
@@ -42,20 +51,81 @@ class Settings(db.Model):
     value = db.Column(db.String, nullable=True)
 
 
+class SettingsVersion(db.Model):
+    """Counters bumped when Settings / MediaServer rows change.
+
+    Row 1 is compared by workers against their cached copy of the settings
+    table; row 2 only moves when a server or the admin account is removed
+    (see ``app.services.settings.onboarding_epoch``).
+    """
+    __tablename__ = 'settings_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+
 class User(db.Model, UserMixin):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
-    token = db.Column(db.String, nullable=False)
+    token = db.Column(db.String, nullable=False, index=True)
     username = db.Column(db.String, nullable=False)
-    email = db.Column(db.String, nullable=True)
+    email = db.Column(db.String, nullable=True, index=True)
     code = db.Column(db.String, nullable=False)
     photo = db.Column(db.String, nullable=True)
-    expires = db.Column(db.DateTime, nullable=True)
+    expires = db.Column(db.DateTime, nullable=True, index=True)
     password = db.Column(db.String, nullable=True)
-    server_id = db.Column(db.Integer, db.ForeignKey('media_server.id'), nullable=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('media_server.id'), nullable=True, index=True)
     server = db.relationship('MediaServer', backref=db.backref('users', lazy=True))
     identity_id = db.Column(db.Integer, db.ForeignKey('identity.id'), nullable=True)
     identity = db.relationship('Identity', backref=db.backref('accounts', lazy=True))
+    # lower(email) when it looks like a real address, else NULL
+    email_normalized = db.Column(db.String, nullable=True, index=True)
+    # Accounts sharing a card_key form one card in the user grid:
+    # "i:<identity_id>", else "e:<email_normalized>", else "u:<id>" (own card;
+    # NULL until the row has an id)
+    card_key = db.Column(db.String, nullable=True, index=True)
+    # lower(username) of the card's first account, the same on every account
+    # of the card – the grid's sort key (see app.services.identities.refresh_cards)
+    card_name = db.Column(db.String, nullable=True)
+
+
+# Placeholder addresses ("None", "empty", …) must never group accounts
+EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+
+
+def user_card_fields(email: str | None, identity_id: int | None, user_id: int | None = None) -> dict:
+    """``email_normalized`` / ``card_key`` values for a user row."""
+    email = (email or "").strip()
+    normalized = email.lower() if EMAIL_RE.fullmatch(email) else None
+    if identity_id:
+        key = f"i:{identity_id}"
+    elif normalized:
+        key = f"e:{normalized}"
+    else:
+        key = f"u:{user_id}" if user_id else None
+    return {"email_normalized": normalized, "card_key": key}
+
+
+@event.listens_for(User, "before_insert")
+@event.listens_for(User, "before_update")
+def _update_card_fields(_mapper, _connection, target):
+    # bulk statements skip this – reconcile_users fills the fields itself
+    for attr, value in user_card_fields(target.email, target.identity_id, target.id).items():
+        setattr(target, attr, value)
+
+
+class ExpiryRetry(db.Model):
+    """Expired user whose remote deletion failed and is waiting for a retry."""
+    __tablename__ = 'expiry_retry'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_error = db.Column(db.String, nullable=True)
+
+
+# User lists (search typeahead, card accounts) order by (lower(username), id)
+db.Index("ix_user_lower_username_id", db.func.lower(User.username), User.id)
+# The admin card grid groups, orders and pages by (card_name, card_key)
+db.Index("ix_user_card_name_key", User.card_name, User.card_key)
 
 
 class Notification(db.Model):
@@ -66,14 +136,87 @@ class Notification(db.Model):
     url = db.Column(db.String, nullable=False)
     username = db.Column(db.String, nullable=True)
     password = db.Column(db.String, nullable=True)
+    # When set, events within this many minutes are sent as one digest message
+    digest_minutes = db.Column(db.Integer, nullable=True)
+
+
+class NotificationEvent(db.Model):
+    """Outbox entry written by ``notify()``; fanned out to agents by the dispatcher."""
+    __tablename__ = 'notification_event'
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String, nullable=False)
+    message = db.Column(db.String, nullable=False)
+    tags = db.Column(db.String, nullable=True)
+    created = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    # False until a delivery row exists for every agent configured at the time
+    fanned_out = db.Column(db.Boolean, default=False, nullable=False, index=True)
+
+
+class NotificationDelivery(db.Model):
+    """Delivery state of one outbox event for one agent."""
+    __tablename__ = 'notification_delivery'
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.Integer, db.ForeignKey('notification_event.id', ondelete='CASCADE'), nullable=False)
+    event = db.relationship('NotificationEvent', backref=db.backref('deliveries', lazy=True, cascade='all, delete-orphan'))
+    agent_id = db.Column(db.Integer, db.ForeignKey('notification.id', ondelete='CASCADE'), nullable=False)
+    # pending / sent / failed
+    status = db.Column(db.String, default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, index=True)
+    last_error = db.Column(db.String, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
 
 
+class Job(db.Model):
+    """Background job run by the worker pool (see ``app.services.jobs``)."""
+    __tablename__ = 'job'
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String, nullable=False)
+    # JSON-encoded keyword arguments for the job type's handler
+    payload = db.Column(db.Text, nullable=True)
+    # jobs sharing a key aren't queued twice while one is still active
+    key = db.Column(db.String, nullable=True, index=True)
+    # queued / running / done / failed
+    status = db.Column(db.String, default='queued', nullable=False, index=True)
+    progress = db.Column(db.Integer, default=0, nullable=False)
+    total = db.Column(db.Integer, nullable=True)
+    message = db.Column(db.String, nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.String, nullable=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    worker = db.Column(db.String, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    # refreshed by the owning worker; a stale one means the worker is gone
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    # a job retried by its handler (RetryJob) isn't claimed before this
+    run_after = db.Column(db.DateTime, nullable=True)
+
+class PlexOnboarding(db.Model):
+    """One Plex sign-up working through the onboarding job (per invite code)."""
+    __tablename__ = 'plex_onboarding'
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String, nullable=False, index=True)
+    server_id = db.Column(db.Integer, db.ForeignKey('media_server.id', ondelete='SET NULL'), nullable=True)
+    # the user's Plex token – only kept until the invite has been accepted
+    token = db.Column(db.String, nullable=True)
+    email = db.Column(db.String, nullable=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+    # pending / invited / accepted / failed
+    status = db.Column(db.String, default='pending', nullable=False)
+    error = db.Column(db.String, nullable=True)
+    job_id = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.now, onupdate=datetime.now, nullable=False)
+
 class AdminUser(UserMixin):
     id = "admin"
 
     @property
     def username(self):
-        return Settings.query.filter_by(key="admin_username").first().value
+        from app.services.settings import get_setting
+        return get_setting("admin_username")
 
 
 class MediaServer(db.Model):
@@ -95,9 +238,17 @@ class MediaServer(db.Model):
 
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
 
+    # When the background sync last mirrored this server's users locally
+    last_synced_at = db.Column(db.DateTime, nullable=True)
+    # Outcome of the most recent sync attempt: ok / timeout / error
+    last_sync_status = db.Column(db.String, nullable=True)
+
 
 class Library(db.Model):
     __tablename__ = "library"
+    __table_args__ = (
+        db.Index("ix_library_server_id_external_id", "server_id", "external_id"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     external_id = db.Column(db.String, unique=True, nullable=False)  # e.g. Plex folder ID
@@ -0,0 +1,107 @@
+# app/scripts/benchmark_lookups.py
+"""Measure hot lookup latency on a throw-away SQLite DB.
+
+    python -m app.scripts.benchmark_lookups [rows]
+
+Seeds *rows* (default 100 000) invitations and users, then times each hot
+lookup with the indexes in place and again after dropping them.
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import insert, text
+
+from app import create_app
+from app.config import BaseConfig
+from app.extensions import db
+from app.models import Invitation, MediaServer, User
+
+LOOKUPS = 200
+
+
+def _timed(fn, args) -> float:
+    """Median latency of ``fn(arg)`` over *args*, in microseconds."""
+    samples = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def _seed(rows: int) -> None:
+    servers = [MediaServer(name=f"s{i}", server_type="jellyfin", url=f"http://s{i}", api_key="k") for i in range(5)]
+    db.session.add_all(servers)
+    db.session.flush()
+    ids = [s.id for s in servers]
+
+    chunk = 10_000
+    for start in range(0, rows, chunk):
+        n = range(start, min(start + chunk, rows))
+        db.session.execute(insert(Invitation), [
+            {"code": f"CODE{i:06d}", "code_normalized": f"code{i:06d}", "used": False,
+             "server_id": ids[i % 5]}
+            for i in n
+        ])
+        db.session.execute(insert(User), [
+            {"token": f"tok{i}", "username": f"user{i}", "email": f"user{i}@example.com",
+             "code": "empty", "server_id": ids[i % 5]}
+            for i in n
+        ])
+    db.session.commit()
+
+
+def _run(rows: int) -> dict[str, float]:
+    picks = random.sample(range(rows), LOOKUPS)
+    sess = db.session
+    return {
+        "invite by lower(code)": _timed(
+            lambda i: Invitation.query.filter(db.func.lower(Invitation.code) == f"code{i:06d}").first(), picks),
+        "invite by code_normalized": _timed(
+            lambda i: Invitation.query.filter_by(code_normalized=f"code{i:06d}").first(), picks),
+        "user by token": _timed(lambda i: User.query.filter_by(token=f"tok{i}").first(), picks),
+        "user by email": _timed(lambda i: User.query.filter_by(email=f"user{i}@example.com").first(), picks),
+        "users of one server (count)": _timed(
+            lambda i: sess.query(User.id).filter_by(server_id=i % 5 + 1).count(), picks[:20]),
+        "invites of one server (count)": _timed(
+            lambda i: sess.query(Invitation.id).filter_by(server_id=i % 5 + 1).count(), picks[:20]),
+    }
+
+
+def main(rows: int = 100_000) -> None:
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+
+    class BenchConfig(BaseConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+        CACHE_BACKEND = "simple"
+
+    app = create_app(BenchConfig)
+    try:
+        with app.app_context():
+            db.create_all()
+            _seed(rows)
+            indexed = _run(rows)
+            for name in ("ix_invitation_code_normalized", "ix_user_token", "ix_user_email",
+                         "ix_user_server_id", "ix_invitation_server_id"):
+                db.session.execute(text(f"DROP INDEX {name}"))
+            db.session.commit()
+            plain = _run(rows)
+            db.session.remove()
+            db.engine.dispose()
+
+        print(f"{rows} invitations / users, median of {LOOKUPS} lookups (µs)")
+        print(f"{'lookup':32} {'no index':>10} {'indexed':>10}")
+        for name in indexed:
+            print(f"{name:32} {plain[name]:10.0f} {indexed[name]:10.0f}")
+    finally:
+        os.unlink(path)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
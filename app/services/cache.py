@@ -0,0 +1,99 @@
+"""Cache shared by every Gunicorn worker (and the scheduler process).
+
+In-process ``TTLCache`` objects are private to one worker, so each worker
+repeated the same upstream fetches and an invalidation in one worker was
+invisible to the others.  Everything that caches upstream data now goes
+through ``shared_cache()`` which is backed by one of:
+
+* ``filesystem`` (default) – cachelib ``FileSystemCache`` under
+  ``database/cache``, the same mechanism already used for sessions;
+* ``redis`` – any Redis-protocol server at ``CACHE_REDIS_URL`` (requires the
+  optional ``redis`` package);
+* ``simple`` – per-process memory, handy for tests and single-worker setups.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+from typing import Any, Callable
+
+from cachelib import BaseCache, FileSystemCache, RedisCache, SimpleCache
+from flask import current_app, has_app_context
+
+__all__ = ["shared_cache", "make_cache", "remember", "hashed_key"]
+
+# Used when there is no app context (scripts, early start-up)
+_fallback = SimpleCache()
+
+
+def make_cache(config: dict, *, redis_client: Any = None) -> BaseCache:
+    """Build the cache backend described by *config*.
+
+    ``redis_client`` lets callers hand in an already connected client (or a
+    stand-in speaking the same API) instead of one built from the URL.
+    """
+    backend = (config.get("CACHE_BACKEND") or "filesystem").lower()
+    timeout = config.get("CACHE_DEFAULT_TIMEOUT", 300)
+
+    if backend == "redis":
+        if redis_client is None:
+            try:
+                import redis  # optional dependency
+            except ImportError as exc:
+                raise RuntimeError(
+                    "CACHE_BACKEND=redis requires the 'redis' package"
+                ) from exc
+            redis_client = redis.from_url(config["CACHE_REDIS_URL"])
+        return RedisCache(host=redis_client, default_timeout=timeout, key_prefix="wizarr:")
+
+    if backend == "simple":
+        return SimpleCache(threshold=config.get("CACHE_THRESHOLD", 500), default_timeout=timeout)
+
+    return FileSystemCache(
+        config["CACHE_DIR"],
+        threshold=config.get("CACHE_THRESHOLD", 500),
+        default_timeout=timeout,
+    )
+
+
+def shared_cache() -> BaseCache:
+    """Return the app's shared cache, building it on first use."""
+    if not has_app_context():
+        return _fallback
+    app = current_app._get_current_object()
+    cache = app.extensions.get("shared_cache")
+    if cache is None:
+        cache = make_cache(app.config)
+        app.extensions["shared_cache"] = cache
+    return cache
+
+
+def hashed_key(prefix: str, *parts: Any) -> str:
+    """Build a cache key without leaking secrets (tokens, URLs) into it."""
+    digest = hashlib.sha256("|".join(map(str, parts)).encode()).hexdigest()
+    return f"{prefix}:{digest}"
+
+
+def remember(key: str, timeout: int, producer: Callable[[], Any]) -> Any:
+    """Return ``cache[key]`` or compute, store and return ``producer()``.
+
+    Exceptions from *producer* propagate and nothing is cached.  Backend
+    errors are logged and treated as a miss so a broken cache never takes
+    the request down with it.
+    """
+    cache = shared_cache()
+    try:
+        value = cache.get(key)
+    except Exception as exc:
+        logging.warning("Shared cache read failed for %s: %s", key, exc)
+        value = None
+    if value is not None:
+        return value
+
+    value = producer()
+    try:
+        cache.set(key, value, timeout=timeout)
+    except Exception as exc:
+        logging.warning("Shared cache write failed for %s: %s", key, exc)
+    return value
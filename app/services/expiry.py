@@ -1,36 +1,117 @@
 import datetime, logging
+from collections import defaultdict
 from typing import List
 
+from flask import current_app
+
 from app.extensions import db
-from app.models import User
-from app.services.media.service import delete_user  # facade (Plex / Jellyfin aware)
+from app.models import User, ExpiryRetry, Invitation, MediaServer
+from app.services.media.client_base import USER_CACHE
+from app.services.media.service import remote_delete_users
 
-def delete_user_if_expired() -> List[int]:
-    """
-    Find users whose `expires` < now, delete them from the media server
-    *and* from the Wizarr DB.  Returns a list of db IDs that were removed.
+
+def _due_users(now: datetime.datetime, limit: int) -> list[User]:
+    """Oldest expired users that are not waiting for a retry backoff.
+
+    Served by the ``user.expires`` index – only the due rows are read.
     """
-    now = datetime.datetime.now()
-    # SQLAlchemy version of: User.select().where(User.expires.is_null(False) & (User.expires < now))
-    expired_rows = (
+    return (
         User.query
+            .outerjoin(ExpiryRetry, ExpiryRetry.user_id == User.id)
             .filter(User.expires != None,  # not null
-                    User.expires < now)
+                    User.expires <= now,
+                    db.or_(ExpiryRetry.user_id == None,
+                           ExpiryRetry.next_attempt_at <= now))
+            .order_by(User.expires)
+            .limit(limit)
             .all()
     )
 
+
+def next_expiry() -> datetime.datetime | None:
+    """Earliest ``User.expires`` still in the table (index lookup)."""
+    return db.session.query(db.func.min(User.expires)).scalar()
+
+
+def _schedule_retry(user_id: int, error: str, now: datetime.datetime) -> bool:
+    """Record a failed remote delete.  Returns ``True`` once retries are exhausted."""
+    cfg = current_app.config
+    retry = db.session.get(ExpiryRetry, user_id) or ExpiryRetry(user_id=user_id, attempts=0)
+    retry.attempts += 1
+    retry.last_error = error[:500]
+    if retry.attempts >= cfg.get("EXPIRY_MAX_ATTEMPTS", 5):
+        return True
+    backoff = cfg.get("EXPIRY_RETRY_BACKOFF", 60) * 2 ** (retry.attempts - 1)
+    retry.next_attempt_at = now + datetime.timedelta(seconds=backoff)
+    db.session.add(retry)
+    return False
+
+
+def _process_batch(users: list[User], now: datetime.datetime) -> list[int]:
+    by_server: dict[int | None, list[User]] = defaultdict(list)
+    for user in users:
+        by_server[user.server_id].append(user)
+
+    removable: list[int] = []
+    for server_id, group in by_server.items():
+        server = db.session.get(MediaServer, server_id) if server_id else None
+        if server is None:
+            # nothing to delete upstream
+            removable.extend(u.id for u in group)
+            continue
+
+        for user_id, error in remote_delete_users(server, group).items():
+            if error is None:
+                removable.append(user_id)
+            elif _schedule_retry(user_id, error, now):
+                logging.error("Giving up remote deletion of expired user %s – %s", user_id, error)
+                removable.append(user_id)
+            else:
+                logging.warning("Remote deletion of expired user %s failed, will retry – %s", user_id, error)
+
+    if removable:
+        db.session.query(Invitation).filter(Invitation.used_by_id.in_(removable)).update(
+            {Invitation.used_by_id: None}, synchronize_session=False
+        )
+        db.session.query(ExpiryRetry).filter(ExpiryRetry.user_id.in_(removable)).delete(synchronize_session=False)
+        db.session.query(User).filter(User.id.in_(removable)).delete(synchronize_session=False)
+    db.session.commit()
+
+    for server_id in by_server:
+        USER_CACHE.invalidate(server_id)
+    return removable
+
+
+def delete_user_if_expired() -> List[int]:
+    """
+    Find users whose `expires` has passed, delete them from the media server
+    *and* from the Wizarr DB.  Returns a list of db IDs that were removed.
+
+    Users are handled in batches of ``EXPIRY_BATCH_SIZE``: remote deletions run
+    concurrently per server, local rows go in one statement per batch, and
+    users whose remote deletion failed are parked in ``expiry_retry`` with
+    exponential backoff until ``EXPIRY_MAX_ATTEMPTS`` is reached – after that
+    they're removed locally anyway so the UI stays consistent.
+    """
+    now = datetime.datetime.now()
+    batch_size = current_app.config.get("EXPIRY_BATCH_SIZE", 100)
+
+    nxt = next_expiry()
+    if nxt is None or nxt > now:
+        return []
+
     deleted: list[int] = []
-    for user in expired_rows:
+    while True:
+        batch = _due_users(now, batch_size)
+        if not batch:
+            break
         try:
-            # remove from Plex/Jellyfin + Ombi
-            delete_user(user.id)
-            # now delete from our SQL database too:
-            db.session.delete(user)
-            db.session.commit()
-
-            deleted.append(user.id)
+            deleted.extend(_process_batch(batch, now))
         except Exception as exc:
             db.session.rollback()
-            logging.error("Failed to delete expired user %s – %s", user.id, exc)
+            logging.error("Failed to process expired users – %s", exc)
+            break
+        if len(batch) < batch_size:
+            break
 
     return deleted
@@ -0,0 +1,160 @@
+"""Link accounts that share the same real e-mail address to one ``Identity``.
+
+``User.email_normalized`` / ``User.card_key`` are maintained on every write
+(see ``app.models.user_card_fields``), so finding the accounts that still
+need linking is a single indexed ``GROUP BY`` instead of loading and
+regex-matching every user.
+
+``User.card_name`` – the sort key of a card in the admin grid – depends on
+all accounts of the card, so it is refreshed for whole cards by
+``refresh_cards``: automatically after ORM flushes, explicitly after the
+bulk statements of ``link_identities`` and ``reconcile_users``.
+"""
+
+from __future__ import annotations
+
+from typing import Iterable
+
+from sqlalchemy import String, cast, event, func, literal, select, update
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import Identity, User
+
+__all__ = ["pending_link_emails", "link_identities", "refresh_cards", "stale_card_keys"]
+
+# keep IN (...) lists well below SQLite's bound-parameter limit
+_CHUNK = 500
+
+
+def pending_link_emails() -> list[str]:
+    """Normalized e-mails shared by accounts that aren't on one identity yet."""
+    stmt = (
+        select(User.email_normalized)
+        .where(User.email_normalized.isnot(None))
+        .group_by(User.email_normalized)
+        .having(
+            func.count(User.id) > 1,
+            db.or_(
+                func.count(User.id) != func.count(User.identity_id),
+                func.min(User.identity_id) != func.max(User.identity_id),
+            ),
+        )
+    )
+    return list(db.session.scalars(stmt))
+
+
+def link_identities(emails: Iterable[str] | None = None) -> int:
+    """Put all accounts sharing one of *emails* on the same identity.
+
+    Defaults to ``pending_link_emails()``.  An identity already held by one
+    of the accounts is reused, otherwise a new one is created from the
+    oldest account.  Only rows whose identity changes are written; returns
+    their count.  The caller commits.
+    """
+    emails = sorted(set(pending_link_emails() if emails is None else filter(None, emails)))
+    changed = 0
+    cards = set()
+    for start in range(0, len(emails), _CHUNK):
+        rows = db.session.execute(
+            select(User.id, User.email_normalized, User.identity_id, User.email, User.username)
+            .where(User.email_normalized.in_(emails[start:start + _CHUNK]))
+            .order_by(User.id)
+        ).all()
+
+        buckets: dict[str, list] = {}
+        for row in rows:
+            buckets.setdefault(row.email_normalized, []).append(row)
+
+        for same in buckets.values():
+            if len(same) < 2:
+                continue
+            identity_id = next((r.identity_id for r in same if r.identity_id), None)
+            if identity_id is None:
+                identity = Identity(primary_email=same[0].email, primary_username=same[0].username)
+                db.session.add(identity)
+                db.session.flush()
+                identity_id = identity.id
+            ids = [r.id for r in same if r.identity_id != identity_id]
+            if ids:
+                db.session.execute(
+                    update(User)
+                    .where(User.id.in_(ids))
+                    .values(identity_id=identity_id, card_key=f"i:{identity_id}")
+                )
+                changed += len(ids)
+                cards.add(f"i:{identity_id}")
+    refresh_cards(cards)
+    return changed
+
+
+def refresh_cards(keys: Iterable[str | None] = (), connection=None) -> None:
+    """Bring ``card_key`` / ``card_name`` up to date for the cards in *keys*.
+
+    A ``None`` in *keys* stands for new accounts without a key yet: they are
+    given their own ``"u:<id>"`` card.  ``card_name`` is rewritten for every
+    account of each card in *keys*, so all accounts of a card always agree
+    on it.  The caller commits.
+    """
+    keys = set(keys)
+    unkeyed = None in keys
+    keys = sorted(keys - {None})
+    if not (keys or unkeyed):
+        return
+    conn = db.session.connection() if connection is None else connection
+    user = User.__table__
+    other = user.alias("other")
+    # NULL for unkeyed rows – they are alone on their new card
+    first_name = (
+        select(func.min(func.lower(other.c.username)))
+        .where(other.c.card_key == user.c.card_key)
+        .scalar_subquery()
+    )
+    values = {
+        "card_key": func.coalesce(user.c.card_key, literal("u:") + cast(user.c.id, String)),
+        "card_name": func.coalesce(first_name, func.lower(user.c.username)),
+    }
+    for start in range(0, max(len(keys), 1), _CHUNK):
+        where = user.c.card_key.in_(keys[start:start + _CHUNK])
+        if unkeyed and start == 0:
+            where = db.or_(user.c.card_key.is_(None), where)
+        conn.execute(user.update().where(where).values(**values))
+
+
+def stale_card_keys() -> list[str]:
+    """Cards whose ``card_name`` no longer matches their accounts.
+
+    Bulk deletes skip the flush hook below, so the remaining accounts of a
+    card keep sorting under a removed account's name until this is repaired.
+    """
+    stmt = (
+        select(User.card_key)
+        .where(User.card_key.isnot(None))
+        .group_by(User.card_key)
+        .having(
+            db.or_(
+                func.count(User.card_name) != func.count(User.id),
+                func.min(User.card_name) != func.max(User.card_name),
+                func.min(User.card_name) != func.min(func.lower(User.username)),
+            )
+        )
+    )
+    return list(db.session.scalars(stmt))
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_flushed_cards(session, _flush_context):
+    # history is still the pre-flush one here, so old keys are visible too
+    keys = set()
+    for obj in session.new | session.deleted:
+        if isinstance(obj, User):
+            keys.add(obj.card_key)
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = db.inspect(obj)
+        if any(state.attrs[a].history.has_changes() for a in ("card_key", "username")):
+            keys.add(obj.card_key)
+            keys.update(state.attrs.card_key.history.deleted)
+    if keys:
+        refresh_cards(keys, session.connection())
@@ -14,11 +14,15 @@ def _generate_code() -> str:
     return "".join(secrets.choice(CODESET) for _ in range(CODESIZE))
 
 
+def get_invite(code: str | None) -> Invitation | None:
+    """Load an Invitation by code, case-insensitively, via the unique index."""
+    if not code:
+        return None
+    return Invitation.query.filter_by(code_normalized=code.lower()).first()
+
+
 def is_invite_valid(code: str) -> Tuple[bool, str]:
-    # Try to load the Invitation by code (case-insensitive)
-    invitation = Invitation.query.filter(
-        db.func.lower(Invitation.code) == code.lower()  # case insensitive
-    ).first()
+    invitation = get_invite(code)
     if not invitation:
         return False, "Invalid code"
     now = datetime.datetime.now()
@@ -33,7 +37,7 @@ def create_invite(form: Any) -> Invitation:
     """Takes a WTForms or dict-like `form` with the same keys as your old version."""
     # generate or validate provided code
     code = (form.get("code") or _generate_code()).upper()
-    if len(code) != CODESIZE or Invitation.query.filter_by(code=code).first():
+    if len(code) != CODESIZE or get_invite(code):
         raise ValueError("Invalid or duplicate code")
 
     now = datetime.datetime.now()
@@ -0,0 +1,405 @@
+"""Persistent background jobs with progress reporting.
+
+Slow admin operations (full user sync, bulk deletes, library refreshes) are
+written to the ``job`` table by ``enqueue()`` and executed by a
+``JobWorker`` – either in-process next to the scheduler (``JOBS_MODE =
+"inprocess"``) or in a separate ``flask jobs worker`` process – so the web
+request only pays for one INSERT.
+
+* Job types are plain functions registered with ``@job_type("name")``; they
+  receive a ``JobContext`` plus the JSON payload as keyword arguments and
+  report progress through ``ctx.progress()``.
+* Every job type belongs to a *lane* with its own worker and cap, so
+  user-facing work (Plex sign-ups) never waits behind a bulk admin job.  At
+  most ``JOBS_CONCURRENCY`` jobs of the default lane – and
+  ``JOBS_<LANE>_CONCURRENCY`` of any other – run at once across all
+  workers: claiming is a single conditional UPDATE, which SQLite serialises.
+  ``JOBS_MODE = "external"`` only moves the default lane out of process.
+* Running jobs carry a heartbeat.  When a worker dies (deploy, OOM …) its
+  jobs go stale and are re-queued – up to ``JOBS_MAX_ATTEMPTS`` – so handlers
+  must be safe to run again.  A handler can ask for the same by raising
+  ``RetryJob``; the job then waits ``JOBS_RETRY_SECONDS`` × attempts first.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import os
+import socket
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from flask import current_app
+from sqlalchemy import func, select, update
+
+from app.extensions import db
+from app.models import Job
+
+__all__ = [
+    "JOB_TYPES",
+    "JOB_LANES",
+    "DEFAULT_LANE",
+    "job_type",
+    "lanes",
+    "lane_concurrency",
+    "RetryJob",
+    "JobContext",
+    "enqueue",
+    "job_state",
+    "run_job",
+    "run_pending",
+    "requeue_stale",
+    "JobWorker",
+    "start_workers",
+]
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+DEFAULT_LANE = "default"
+
+JOB_TYPES: dict[str, Callable[..., Any]] = {}
+JOB_LANES: dict[str, str] = {}
+
+
+def job_type(name: str, *, lane: str = DEFAULT_LANE):
+    """Register *fn* as the handler of jobs of type *name*, run in *lane*."""
+    def decorator(fn):
+        JOB_TYPES[name] = fn
+        JOB_LANES[name] = lane
+        return fn
+    return decorator
+
+
+def lanes() -> list[str]:
+    """Every lane with a registered job type, the default lane first."""
+    return [DEFAULT_LANE, *sorted(set(JOB_LANES.values()) - {DEFAULT_LANE})]
+
+
+def lane_concurrency(config, lane: str) -> int:
+    """Cap of *lane*: ``JOBS_CONCURRENCY`` or ``JOBS_<LANE>_CONCURRENCY``."""
+    if lane == DEFAULT_LANE:
+        return config.get("JOBS_CONCURRENCY", 2)
+    return config.get(f"JOBS_{lane.upper()}_CONCURRENCY", 2)
+
+
+def _in_lane(lane: str):
+    # the default lane also picks up types nobody registered, so they fail
+    # instead of sitting in the queue
+    if lane == DEFAULT_LANE:
+        return Job.type.notin_([t for t, l in JOB_LANES.items() if l != DEFAULT_LANE])
+    return Job.type.in_([t for t, l in JOB_LANES.items() if l == lane])
+
+
+class RetryJob(Exception):
+    """Raised by a handler to run the job again after *delay* seconds.
+
+    Defaults to ``JOBS_RETRY_SECONDS`` × attempts so far; the job fails once
+    it has used ``JOBS_MAX_ATTEMPTS``.
+    """
+
+    def __init__(self, message: str = "", delay: float | None = None):
+        super().__init__(message)
+        self.delay = delay
+
+
+class JobContext:
+    """Handed to a job handler to report progress."""
+
+    def __init__(self, job_id: int, attempt: int = 1, max_attempts: int = 1):
+        self.job_id = job_id
+        self.attempt = attempt
+        self.max_attempts = max_attempts
+
+    @property
+    def final_attempt(self) -> bool:
+        """Whether a ``RetryJob`` raised now would fail the job instead."""
+        return self.attempt >= self.max_attempts
+
+    def progress(self, done: int, total: int | None = None, message: str | None = None) -> None:
+        """Record progress.  Commits the session – call between units of work."""
+        values: dict[str, Any] = {"progress": done, "heartbeat_at": datetime.datetime.now()}
+        if total is not None:
+            values["total"] = total
+        if message is not None:
+            values["message"] = message[:200]
+        db.session.execute(update(Job).where(Job.id == self.job_id).values(**values))
+        db.session.commit()
+
+
+# ─── producer side ──────────────────────────────────────────────────────────
+
+_local_workers: dict[str, "JobWorker"] = {}
+
+
+def enqueue(type_: str, payload: dict | None = None, *, key: str | None = None) -> Job:
+    """Queue a job and return it.
+
+    With *key*, an already queued or running job with the same key is
+    returned instead of queueing a duplicate (e.g. repeated "sync now").
+    """
+    if type_ not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {type_}")
+    if key is not None:
+        existing = Job.query.filter(Job.key == key, Job.status.in_(ACTIVE)).first()
+        if existing is not None:
+            return existing
+    job = Job(type=type_, payload=json.dumps(payload or {}), key=key, status=QUEUED)
+    db.session.add(job)
+    db.session.commit()
+    worker = _local_workers.get(JOB_LANES[type_])
+    if worker is not None:
+        worker.wake()
+    return job
+
+
+def job_state(job: Job) -> dict:
+    """JSON-friendly view of *job* for progress endpoints."""
+    percent = None
+    if job.total:
+        percent = min(100, int(job.progress * 100 / job.total))
+    elif job.status == DONE:
+        percent = 100
+    return {
+        "id": job.id,
+        "type": job.type,
+        "status": job.status,
+        "progress": job.progress,
+        "total": job.total,
+        "percent": percent,
+        "message": job.message,
+        "error": job.error,
+        "result": json.loads(job.result) if job.result else None,
+        "finished": job.status in (DONE, FAILED),
+    }
+
+
+# ─── consumer side ──────────────────────────────────────────────────────────
+
+def _claim(worker: str, concurrency: int, lane: str = DEFAULT_LANE) -> int | None:
+    """Atomically move the oldest due job of *lane* to running, within its cap."""
+    now = datetime.datetime.now()
+    candidate = db.session.execute(
+        select(Job.id)
+        .where(
+            Job.status == QUEUED,
+            _in_lane(lane),
+            db.or_(Job.run_after.is_(None), Job.run_after <= now),
+        )
+        .order_by(Job.id)
+        .limit(1)
+    ).scalar()
+    if candidate is None:
+        return None
+    running = (
+        select(func.count(Job.id)).where(Job.status == RUNNING, _in_lane(lane)).scalar_subquery()
+    )
+    claimed = db.session.execute(
+        update(Job)
+        .where(Job.id == candidate, Job.status == QUEUED, running < concurrency)
+        .values(
+            status=RUNNING,
+            worker=worker,
+            attempts=Job.attempts + 1,
+            started_at=now,
+            heartbeat_at=now,
+            error=None,
+        )
+    ).rowcount
+    db.session.commit()
+    return candidate if claimed else None
+
+
+def run_job(job_id: int) -> None:
+    """Execute a claimed job and record its outcome."""
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return
+    kind, payload = job.type, json.loads(job.payload or "{}")
+    handler = JOB_TYPES.get(kind)
+    max_attempts = current_app.config.get("JOBS_MAX_ATTEMPTS", 3)
+    ctx = JobContext(job_id, job.attempts, max_attempts)
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job type: {kind}")
+        result = handler(ctx, **payload)
+    except RetryJob as exc:
+        db.session.rollback()
+        error = (str(exc) or exc.__class__.__name__)[:500]
+        if ctx.final_attempt:
+            logging.error("Job %s (%s) failed after %s attempts: %s", job_id, kind, ctx.attempt, error)
+            values = {"status": FAILED, "error": error}
+        else:
+            delay = exc.delay
+            if delay is None:
+                delay = current_app.config.get("JOBS_RETRY_SECONDS", 30) * ctx.attempt
+            logging.warning("Job %s (%s) will retry in %ss: %s", job_id, kind, delay, error)
+            run_after = datetime.datetime.now() + datetime.timedelta(seconds=delay)
+            db.session.execute(
+                update(Job)
+                .where(Job.id == job_id)
+                .values(status=QUEUED, worker=None, error=error, run_after=run_after)
+            )
+            db.session.commit()
+            return
+    except Exception as exc:
+        db.session.rollback()
+        logging.error("Job %s (%s) failed: %s", job_id, kind, exc, exc_info=True)
+        values = {"status": FAILED, "error": (str(exc) or exc.__class__.__name__)[:500]}
+    else:
+        values = {"status": DONE, "result": json.dumps(result) if result is not None else None}
+    values["finished_at"] = datetime.datetime.now()
+    db.session.execute(update(Job).where(Job.id == job_id).values(**values))
+    db.session.commit()
+
+
+def requeue_stale() -> int:
+    """Re-queue running jobs whose worker stopped heart-beating.
+
+    Jobs that already used ``JOBS_MAX_ATTEMPTS`` are failed instead.
+    Returns the number of jobs touched.
+    """
+    cfg = current_app.config
+    cutoff = datetime.datetime.now() - datetime.timedelta(seconds=cfg.get("JOBS_STALE_SECONDS", 90))
+    stale = (Job.status == RUNNING) & (Job.heartbeat_at < cutoff)
+    max_attempts = cfg.get("JOBS_MAX_ATTEMPTS", 3)
+    failed = db.session.execute(
+        update(Job)
+        .where(stale, Job.attempts >= max_attempts)
+        .values(status=FAILED, error="worker lost", finished_at=datetime.datetime.now())
+    ).rowcount
+    requeued = db.session.execute(
+        update(Job).where(stale).values(status=QUEUED, worker=None)
+    ).rowcount
+    db.session.commit()
+    if requeued:
+        logging.warning("Re-queued %s job(s) from a lost worker.", requeued)
+    return failed + requeued
+
+
+def _worker_name() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def run_pending(limit: int | None = None, lane: str | None = None) -> int:
+    """Run due jobs – of *lane*, or of every lane – one after another.
+
+    Used by ``flask jobs run`` and tests.  Returns the number of jobs run.
+    """
+    worker = _worker_name()
+    ran = 0
+    for name in [lane] if lane else lanes():
+        concurrency = lane_concurrency(current_app.config, name)
+        while limit is None or ran < limit:
+            job_id = _claim(worker, concurrency, name)
+            if job_id is None:
+                break
+            run_job(job_id)
+            ran += 1
+    return ran
+
+
+class JobWorker:
+    """Poll the job table and run one lane's jobs on a small thread pool."""
+
+    def __init__(self, app, concurrency: int | None = None, lane: str = DEFAULT_LANE):
+        self.app = app
+        cfg = app.config
+        self.lane = lane
+        self.concurrency = concurrency or lane_concurrency(cfg, lane)
+        self.poll = cfg.get("JOBS_POLL_SECONDS", 1)
+        self.heartbeat = cfg.get("JOBS_HEARTBEAT_SECONDS", 15)
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{lane}"
+
+        self._slots = threading.Semaphore(self.concurrency)
+        self._active: set[int] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"job-{lane}")
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> "JobWorker":
+        self._thread = threading.Thread(target=self.run_forever, name=f"job-worker-{self.lane}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, wait: bool = True) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+        self._pool.shutdown(wait=wait)
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def run_forever(self) -> None:
+        last_beat = 0.0
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    now = datetime.datetime.now().timestamp()
+                    if now - last_beat >= self.heartbeat:
+                        self._beat()
+                        requeue_stale()
+                        last_beat = now
+                    self._fill()
+                except Exception as exc:
+                    db.session.rollback()
+                    logging.error("Job worker loop failed: %s", exc)
+                finally:
+                    db.session.remove()
+            self._wake.wait(self.poll)
+            self._wake.clear()
+
+    def _beat(self) -> None:
+        with self._lock:
+            active = list(self._active)
+        if active:
+            db.session.execute(
+                update(Job)
+                .where(Job.id.in_(active), Job.status == RUNNING)
+                .values(heartbeat_at=datetime.datetime.now())
+            )
+            db.session.commit()
+
+    def _fill(self) -> None:
+        while self._slots.acquire(blocking=False):
+            job_id = _claim(self.name, self.concurrency, self.lane)
+            if job_id is None:
+                self._slots.release()
+                return
+            with self._lock:
+                self._active.add(job_id)
+            self._pool.submit(self._run, job_id)
+
+    def _run(self, job_id: int) -> None:
+        try:
+            with self.app.app_context():
+                try:
+                    run_job(job_id)
+                finally:
+                    db.session.remove()
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+            self._slots.release()
+            self._wake.set()
+
+
+def start_workers(app) -> dict[str, JobWorker]:
+    """Start in-process workers for *app* (once per process and lane).
+
+    Every lane gets one, except the default lane when ``JOBS_MODE`` is
+    ``"external"`` – sign-ups never depend on a separate worker process.
+    """
+    for lane in lanes():
+        if lane == DEFAULT_LANE and app.config.get("JOBS_MODE", "inprocess") != "inprocess":
+            continue
+        if lane not in _local_workers:
+            _local_workers[lane] = JobWorker(app, lane=lane).start()
+    return dict(_local_workers)
@@ -0,0 +1,199 @@
+"""Mirror a media server's upstream libraries into the ``Library`` table.
+
+All library scan endpoints go through ``LibrarySyncService``: the upstream
+``{external_id: name}`` map is diffed against the local rows loaded in one
+query, and the resulting inserts / renames / deletions are applied as bulk
+statements in one transaction – nothing is written when nothing changed.
+
+The scheduled ``refresh_libraries`` job runs every server through it, so
+the table stays fresh without an admin clicking "scan", and join paths map
+folder names to ids with ``library_map()`` – an in-memory copy of the
+server's rows – instead of asking the media server on every signup.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Iterable, Mapping
+
+from sqlalchemy import delete, insert, select, update
+
+from app.extensions import db
+from app.models import Library, MediaServer, invite_libraries
+
+__all__ = [
+    "LibrarySyncResult",
+    "LibrarySyncService",
+    "library_pairs",
+    "library_map",
+    "invalidate_library_map",
+    "refresh_all_libraries",
+]
+
+# How long a worker trusts its copy of a server's library map (seconds)
+LIBRARY_MAP_TTL = int(os.getenv("LIBRARY_MAP_TTL", "300"))
+
+
+@dataclass(frozen=True)
+class LibrarySyncResult:
+    added: list[str] = field(default_factory=list)
+    updated: list[str] = field(default_factory=list)
+    removed: list[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.added or self.updated or self.removed)
+
+
+def library_pairs(raw: Mapping[str, str] | Iterable[str]) -> dict[str, str]:
+    """Normalise a client's ``libraries()`` result to ``{external_id: name}``."""
+    if isinstance(raw, Mapping):
+        return dict(raw)
+    return {name: name for name in raw}
+
+
+class LibrarySyncService:
+    """Sync the libraries of one server (``None``: not-yet-saved server).
+
+    Rows of other servers are never deleted or re-assigned; ``external_id``
+    is globally unique, so an upstream id already owned by another server is
+    only renamed.  Unowned rows (``server_id IS NULL``, e.g. from a scan run
+    before the server was saved) are claimed by *server*.
+    """
+
+    def __init__(self, server: MediaServer | None = None):
+        self.server_id = server.id if server is not None else None
+        self._server = server
+
+    def scan(self) -> LibrarySyncResult:
+        """Fetch the server's libraries upstream and apply them."""
+        from app.services.media.service import scan_libraries_for_server
+
+        return self.apply(library_pairs(scan_libraries_for_server(self._server)))
+
+    def apply(self, upstream: Mapping[str, str]) -> LibrarySyncResult:
+        upstream = dict(upstream)
+        owned = Library.server_id.is_(None) if self.server_id is None else db.or_(
+            Library.server_id == self.server_id, Library.server_id.is_(None)
+        )
+        rows = db.session.execute(
+            select(Library.id, Library.external_id, Library.name, Library.server_id).where(
+                db.or_(owned, Library.external_id.in_(upstream))
+            )
+        ).all()
+
+        by_ext = {row.external_id: row for row in rows}
+        inserts, updates, removed = [], [], []
+        for ext_id, name in upstream.items():
+            row = by_ext.get(ext_id)
+            if row is None:
+                inserts.append({"external_id": ext_id, "name": name, "server_id": self.server_id})
+                continue
+            changes = {}
+            if row.name != name:
+                changes["name"] = name
+            if row.server_id is None and self.server_id is not None:
+                changes["server_id"] = self.server_id
+            if changes:
+                updates.append({"id": row.id, **changes})
+        for row in rows:
+            if row.external_id not in upstream and row.server_id == self.server_id:
+                removed.append(row)
+
+        if not (inserts or updates or removed):
+            return LibrarySyncResult()
+
+        try:
+            if inserts:
+                db.session.execute(insert(Library), inserts)
+            if updates:
+                db.session.execute(update(Library), updates)
+            if removed:
+                ids = [row.id for row in removed]
+                db.session.execute(delete(invite_libraries).where(invite_libraries.c.library_id.in_(ids)))
+                db.session.execute(
+                    delete(Library).where(Library.id.in_(ids)),
+                    execution_options={"synchronize_session": False},
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        if self.server_id is not None:
+            invalidate_library_map(self.server_id)
+
+        by_id = {row.id: row.external_id for row in rows}
+        return LibrarySyncResult(
+            added=[i["external_id"] for i in inserts],
+            updated=[by_id[u["id"]] for u in updates],
+            removed=[row.external_id for row in removed],
+        )
+
+    def libraries(self, external_ids: Iterable[str] | None = None) -> list[Library]:
+        """The server's libraries (or the given ones) ordered by name."""
+        q = Library.query
+        if external_ids is not None:
+            q = q.filter(Library.external_id.in_(list(external_ids)))
+        else:
+            q = q.filter(Library.server_id.is_(None) if self.server_id is None
+                         else Library.server_id == self.server_id)
+        return q.order_by(Library.name).all()
+
+
+# ─── per-worker name/id map ─────────────────────────────────────────────────
+
+_MAPS: dict[int, tuple[float, dict[str, str]]] = {}
+_MAPS_LOCK = threading.Lock()
+
+
+def library_map(server_id: int) -> dict[str, str]:
+    """``{name: external_id}`` plus ``{external_id: external_id}`` for a server.
+
+    Built from the ``Library`` table and kept per worker for
+    ``LIBRARY_MAP_TTL`` seconds; callers fall back to a live lookup for
+    names that aren't in it.
+    """
+    now = time.monotonic()
+    with _MAPS_LOCK:
+        entry = _MAPS.get(server_id)
+    if entry is not None and now - entry[0] < LIBRARY_MAP_TTL:
+        return entry[1]
+
+    rows = db.session.execute(
+        select(Library.external_id, Library.name).where(Library.server_id == server_id)
+    ).all()
+    mapping = {name: ext_id for ext_id, name in rows}
+    mapping.update({ext_id: ext_id for ext_id, _name in rows})
+    with _MAPS_LOCK:
+        _MAPS[server_id] = (now, mapping)
+    return mapping
+
+
+def invalidate_library_map(server_id: int) -> None:
+    with _MAPS_LOCK:
+        _MAPS.pop(server_id, None)
+
+
+def refresh_all_libraries(progress=None) -> dict[int, LibrarySyncResult | None]:
+    """Scan every media server's libraries into the table (scheduled job).
+
+    A server that can't be reached keeps its current rows and maps to
+    ``None`` in the result.  *progress*, if given, is called as
+    ``progress(done, total, server_name)`` after each server.
+    """
+    servers = MediaServer.query.order_by(MediaServer.id).all()
+    results: dict[int, LibrarySyncResult | None] = {}
+    for done, server in enumerate(servers, 1):
+        try:
+            results[server.id] = LibrarySyncService(server).scan()
+        except Exception as exc:
+            db.session.rollback()
+            logging.warning("Library refresh for %s failed: %s", server.name, exc)
+            results[server.id] = None
+        if progress is not None:
+            progress(done, len(servers), server.name)
+    return results
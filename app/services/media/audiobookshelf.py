@@ -19,11 +19,9 @@ import logging
 from typing import Any, Dict, List
 import re
 
-import requests
-
 from app.extensions import db
 from app.models import User, Invitation, Library
-from .client_base import MediaClient, register_media_client
+from .client_base import MediaClient, RemoteUser, USER_CACHE, reconcile_users, register_media_client
 
 
 @register_media_client("audiobookshelf")
@@ -69,7 +67,7 @@ class AudiobookshelfClient(MediaClient):
         """
         url = f"{self.url}{path}"
         logging.info("ABS GET  %s", url)
-        resp = requests.get(url, headers=self._headers, timeout=10)
+        resp = self.http.get(url, headers=self._headers, timeout=self.timeout)
         resp.raise_for_status()
         return resp
 
@@ -96,6 +94,18 @@ class AudiobookshelfClient(MediaClient):
 
     # --- users ---------------------------------------------------------
 
+    def fetch_users(self) -> List[RemoteUser]:
+        data = self._get(f"{self.API_PREFIX}/users").json()
+        raw_users: List[Dict[str, Any]] = data.get("users", data)  # ABS may wrap list in {"users": [...]}
+        return [
+            RemoteUser(
+                id=u["id"],
+                username=u.get("username", "abs-user"),
+                email=u.get("email", ""),
+            )
+            for u in raw_users
+        ]
+
     def list_users(self) -> List[User]:
         """Read users from Audiobookshelf and reflect them locally.
 
@@ -104,60 +114,34 @@ class AudiobookshelfClient(MediaClient):
         still on the TODO list.
         """
         try:
-            data = self._get(f"{self.API_PREFIX}/users").json()
-            raw_users: List[Dict[str, Any]] = data.get("users", data)  # ABS may wrap list in {"users": [...]}
+            remote_users = self.remote_users()
         except Exception as exc:
             logging.warning("ABS: failed to list users – %s", exc)
             return []
 
-        # Index by ABS user‐id for quick lookups
-        raw_by_id = {u["id"]: u for u in raw_users}
-
-        # ------------------------------------------------------------------
-        # 1) Add new users or update basic fields so the UI has fresh data
-        # ------------------------------------------------------------------
-        for uid, remote in raw_by_id.items():
-            db_row = (
-                User.query
-                .filter_by(token=uid, server_id=getattr(self, "server_id", None))
-                .first()
-            )
-            if not db_row:
-                db_row = User(
-                    token=uid,
-                    username=remote.get("username", "abs-user"),
-                    email=remote.get("email", ""),
-                    code="empty",  # placeholder – signifies "no invite code"
-                    password="abs",  # placeholder
-                    server_id=getattr(self, "server_id", None),
-                )
-                db.session.add(db_row)
-            else:
-                # Simple field refresh (username/email might have changed)
-                db_row.username = remote.get("username", db_row.username)
-                db_row.email = remote.get("email", db_row.email)
-
-        db.session.commit()
-
-        # ------------------------------------------------------------------
-        # 2) Remove local users that have disappeared upstream.  This keeps
-        #    the Wizarr DB in sync so "ghost" accounts don't show up as
-        #    "Local" after they were deleted on the ABS server.
-        # ------------------------------------------------------------------
-        to_check = (
-            User.query
-            .filter(User.server_id == getattr(self, "server_id", None))
-            .all()
+        server_id = getattr(self, "server_id", None)
+
+        # New users are added, username/email refreshed, and local users that
+        # disappeared upstream removed so "ghost" accounts don't show up as
+        # "Local" after they were deleted on the ABS server.
+        reconcile_users(
+            server_id,
+            remote_users,
+            key="token",
+            remote_key=lambda u: u.id,
+            row_values=lambda u: {
+                "token": u.id,
+                "username": u.username,
+                "email": u.email,
+                "code": "empty",  # placeholder – signifies "no invite code"
+                "password": "abs",  # placeholder
+            },
+            update_fields=("username", "email"),
         )
-        for local in to_check:
-            if local.token not in raw_by_id:
-                db.session.delete(local)
-
-        db.session.commit()
 
         return (
             User.query
-            .filter(User.server_id == getattr(self, "server_id", None))
+            .filter(User.server_id == server_id)
             .all()
         )
 
@@ -176,11 +160,11 @@ class AudiobookshelfClient(MediaClient):
             "email": email,
             "type": "admin" if is_admin else "user",
         }
-        resp = requests.post(
+        resp = self.http.post(
             f"{self.url}{self.API_PREFIX}/users",
             json=payload,
             headers=self._headers,
-            timeout=10,
+            timeout=self.timeout,
         )
         resp.raise_for_status()
         data = resp.json()
@@ -189,21 +173,21 @@ class AudiobookshelfClient(MediaClient):
 
     def update_user(self, user_id: str, payload: Dict[str, Any]):
         """PATCH arbitrary fields on a user object."""
-        resp = requests.patch(
+        resp = self.http.patch(
             f"{self.url}{self.API_PREFIX}/users/{user_id}",
             json=payload,
             headers=self._headers,
-            timeout=10,
+            timeout=self.timeout,
         )
         resp.raise_for_status()
         return resp.json()
 
     def delete_user(self, user_id: str):
         """Delete a user permanently from Audiobookshelf."""
-        resp = requests.delete(
+        resp = self.http.delete(
             f"{self.url}{self.API_PREFIX}/users/{user_id}",
             headers=self._headers,
-            timeout=10,
+            timeout=self.timeout,
         )
         # 204 No Content or 200
         if resp.status_code not in (200, 204):
@@ -258,7 +242,7 @@ class AudiobookshelfClient(MediaClient):
     def join(self, username: str, password: str, confirm: str, email: str, code: str):
         """Public invite flow for Audiobookshelf users."""
         from sqlalchemy import or_
-        from app.services.invites import is_invite_valid
+        from app.services.invites import get_invite, is_invite_valid
         from app.models import Invitation, User
 
         if not self.EMAIL_RE.fullmatch(email):
@@ -283,7 +267,7 @@ class AudiobookshelfClient(MediaClient):
             user_id = self.create_user(username, password, email=email)
             if not user_id:
                 return False, "Audiobookshelf did not return a user id – please verify the server URL/token."
-            inv = Invitation.query.filter_by(code=code).first()
+            inv = get_invite(code)
 
             # ------------------------------------------------------------------
             # 1) Restrict library access (if requested)
@@ -335,6 +319,7 @@ class AudiobookshelfClient(MediaClient):
                 db.session.rollback()
                 logging.exception("ABS join failed during DB commit")
                 return False, "Internal error while saving the account."
+            USER_CACHE.invalidate(getattr(self, "server_id", None))
 
             # 4) mark invite used
             self._mark_invite_used(inv, local)
@@ -10,11 +10,24 @@
 
 from __future__ import annotations
 
+import logging
+import os
+import threading
 from abc import ABC, abstractmethod
-from typing import Optional
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+import requests
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from app.extensions import db
-from app.models import Settings, MediaServer
+from app.models import MediaServer, User, user_card_fields
+from app.services.identities import link_identities, refresh_cards
+from app.services.cache import shared_cache
+from app.services.settings import get_setting
 
 # ---------------------------------------------------------------------------
 # Registry helpers
@@ -39,6 +52,329 @@ def register_media_client(name: str):
 
     return decorator
 
+# ---------------------------------------------------------------------------
+# Pooled HTTP sessions
+# ---------------------------------------------------------------------------
+
+# One keep-alive ``requests.Session`` per MediaServer (keyed by server id, or
+# by URL for ad-hoc clients without a row) shared by every request handled in
+# this worker process.
+_SESSIONS: dict[object, tuple[str, requests.Session]] = {}
+_SESSIONS_LOCK = threading.Lock()
+_SESSIONS_PID = os.getpid()
+
+_HTTP_DEFAULTS = {
+    "MEDIA_HTTP_POOL_SIZE": 10,
+    "MEDIA_HTTP_CONNECT_TIMEOUT": 5,
+    "MEDIA_HTTP_READ_TIMEOUT": 10,
+    "MEDIA_HTTP_RETRIES": 2,
+    "MEDIA_HTTP_BACKOFF": 0.5,
+}
+
+
+def _http_setting(key: str):
+    if has_app_context():
+        return current_app.config.get(key, _HTTP_DEFAULTS[key])
+    return _HTTP_DEFAULTS[key]
+
+
+def _build_session() -> requests.Session:
+    # urllib3 only retries idempotent methods by default (no POST/PATCH), so
+    # a retried request can never create a user twice.
+    retries = Retry(
+        total=_http_setting("MEDIA_HTTP_RETRIES"),
+        backoff_factor=_http_setting("MEDIA_HTTP_BACKOFF"),
+        status_forcelist=(502, 503, 504),
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        raise_on_status=False,
+    )
+    pool_size = _http_setting("MEDIA_HTTP_POOL_SIZE")
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def http_session(server_id: int | None, url: str | None) -> requests.Session:
+    """Return the pooled session for *server_id* (or *url* when no row exists).
+
+    A session is replaced when the server's URL changes, and the whole pool is
+    dropped after a fork so workers never share sockets with the master.
+    """
+    global _SESSIONS_PID
+    key = server_id if server_id is not None else url
+    with _SESSIONS_LOCK:
+        if _SESSIONS_PID != os.getpid():
+            _SESSIONS.clear()
+            _SESSIONS_PID = os.getpid()
+        entry = _SESSIONS.get(key)
+        if entry is not None and entry[0] == url:
+            return entry[1]
+        if entry is not None:
+            entry[1].close()
+        session = _build_session()
+        _SESSIONS[key] = (url, session)
+        return session
+
+
+def close_http_session(server_id: int) -> None:
+    """Drop the pooled session of a server that was edited or removed."""
+    with _SESSIONS_LOCK:
+        entry = _SESSIONS.pop(server_id, None)
+    if entry is not None:
+        entry[1].close()
+
+
+# ---------------------------------------------------------------------------
+# Upstream user snapshots
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class RemoteUser:
+    """Lightweight, session-independent view of an upstream account."""
+
+    id: str
+    username: str
+    email: str | None = None
+    photo: str | None = None
+
+
+class UserSnapshotCache:
+    """TTL cache of upstream user lists keyed by ``server_id``.
+
+    Entries are plain ``RemoteUser`` tuples, never ORM rows, so they stay
+    valid across requests and DB sessions.  They live in the shared cache
+    backend, so a snapshot fetched – or invalidated – by one worker is seen
+    by all of them; the backend's ``CACHE_THRESHOLD`` bounds its size and
+    each entry expires after ``ttl`` seconds.  Hit/miss counters are kept
+    per process.  Backend errors (e.g. Redis down) are logged and treated as
+    a miss, so callers fall back to a live fetch.
+    """
+
+    def __init__(self, ttl: int = 600) -> None:
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    @staticmethod
+    def _key(server_id: int) -> str:
+        return f"users:{server_id}"
+
+    def _count(self, stat: str) -> None:
+        with self._lock:
+            self._stats[stat] += 1
+
+    def get(self, server_id: int) -> tuple[RemoteUser, ...] | None:
+        try:
+            users = shared_cache().get(self._key(server_id))
+        except Exception as exc:
+            logging.warning("User snapshot read for server %s failed: %s", server_id, exc)
+            users = None
+        self._count("hits" if users is not None else "misses")
+        return users
+
+    def set(self, server_id: int, users: tuple[RemoteUser, ...]) -> None:
+        try:
+            shared_cache().set(self._key(server_id), users, timeout=self.ttl)
+        except Exception as exc:
+            logging.warning("User snapshot write for server %s failed: %s", server_id, exc)
+
+    def invalidate(self, server_id: int | None) -> None:
+        """Drop the snapshot of a single server (no-op for ``None``)."""
+        if server_id is None:
+            return
+        try:
+            shared_cache().delete(self._key(server_id))
+        except Exception as exc:
+            logging.warning("User snapshot invalidation for server %s failed: %s", server_id, exc)
+        self._count("invalidations")
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._stats)
+
+
+USER_CACHE = UserSnapshotCache(ttl=int(os.getenv("USER_CACHE_TTL", "600")))
+
+
+# ---------------------------------------------------------------------------
+# Set-based reconcile of local users against an upstream snapshot
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class ReconcileResult:
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+
+def reconcile_users(
+    server_id: int | None,
+    remote_users: Iterable[RemoteUser],
+    *,
+    key: str,
+    remote_key: Callable[[RemoteUser], str | None],
+    row_values: Callable[[RemoteUser], dict],
+    update_fields: tuple[str, ...] = (),
+    adopt_orphans: bool = False,
+) -> ReconcileResult:
+    """Mirror *remote_users* into the ``User`` rows of *server_id*.
+
+    Local rows are loaded in a single query and diffed in memory against the
+    snapshot on the ``User.<key>`` column (``remote_key`` extracts the
+    matching value from a ``RemoteUser``).  New accounts are inserted with
+    ``row_values(remote)``, the columns listed in ``update_fields`` are
+    refreshed from the same dict (empty upstream values never blank a local
+    one), and rows missing upstream are deleted –
+    each as one bulk statement, all in one transaction.
+
+    With ``adopt_orphans`` legacy rows without a ``server_id`` take part in
+    the diff and are claimed by this server when they still exist upstream.
+    """
+    key_col = getattr(User, key)
+    cols = [User.id, User.server_id, User.identity_id, User.card_key, key_col,
+            *(getattr(User, f) for f in update_fields)]
+    scope = User.server_id == server_id
+    if adopt_orphans:
+        scope = db.or_(scope, User.server_id.is_(None))
+    local_rows = db.session.execute(db.select(*cols).where(scope)).all()
+
+    remote_by_key = {}
+    for remote in remote_users:
+        remote_by_key.setdefault(remote_key(remote), remote)
+
+    local_by_key = {}
+    for row in local_rows:
+        local_by_key.setdefault(getattr(row, key), row)
+
+    inserts, updates, deletes = [], [], []
+    touched_emails, touched_cards = set(), set()
+    for k, remote in remote_by_key.items():
+        values = row_values(remote)
+        row = local_by_key.get(k)
+        if row is None:
+            # bulk inserts bypass the mapper events that maintain these
+            card = user_card_fields(values.get("email"), None)
+            inserts.append({**values, **card, "server_id": server_id})
+            touched_emails.add(card["email_normalized"])
+            touched_cards.add(card["card_key"])
+            continue
+        changes = {
+            f: values[f]
+            for f in update_fields
+            if values[f] and getattr(row, f) != values[f]
+        }
+        if "email" in changes:
+            card = user_card_fields(changes["email"], row.identity_id, row.id)
+            changes.update(card)
+            touched_emails.add(card["email_normalized"])
+            touched_cards.update((row.card_key, card["card_key"]))
+        elif "username" in changes:
+            touched_cards.add(row.card_key)
+        if row.server_id != server_id:
+            changes["server_id"] = server_id
+        if changes:
+            updates.append({"id": row.id, **changes})
+    for k, row in local_by_key.items():
+        if k not in remote_by_key:
+            deletes.append(row.id)
+            touched_cards.add(row.card_key)
+
+    try:
+        if inserts:
+            db.session.execute(db.insert(User), inserts)
+        if updates:
+            db.session.execute(db.update(User), updates)
+        if deletes:
+            db.session.execute(
+                db.delete(User).where(User.id.in_(deletes)),
+                execution_options={"synchronize_session": False},
+            )
+        refresh_cards(touched_cards)
+        # only the accounts whose e-mail changed can need a new link
+        link_identities(touched_emails)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return ReconcileResult(len(inserts), len(updates), len(deletes))
+
+
+# ---------------------------------------------------------------------------
+# Connected client registry
+# ---------------------------------------------------------------------------
+
+# server_id -> (credential fingerprint, client).  Reusing the instance keeps
+# e.g. the PlexServer / MyPlexAccount handshake alive across requests.
+_INSTANCES: dict[int, tuple[tuple, "MediaClient"]] = {}
+_INSTANCES_LOCK = threading.Lock()
+_INSTANCES_PID = os.getpid()
+_INSTANCE_STATS = {"hits": 0, "misses": 0, "invalidations": 0}
+
+
+def _fingerprint(row: MediaServer) -> tuple:
+    return (row.server_type, row.url, row.api_key)
+
+
+def client_for_server(row: MediaServer) -> "MediaClient":
+    """Return the shared client for *row*, building it on first use.
+
+    The cached instance is rebuilt whenever the row's type, URL or API key
+    differ from what it was created with, so edits made by another worker are
+    picked up as well.
+    """
+    global _INSTANCES_PID
+    fp = _fingerprint(row)
+    with _INSTANCES_LOCK:
+        if _INSTANCES_PID != os.getpid():
+            _INSTANCES.clear()
+            _INSTANCES_PID = os.getpid()
+        entry = _INSTANCES.get(row.id)
+        if entry is not None and entry[0] == fp:
+            _INSTANCE_STATS["hits"] += 1
+            return entry[1]
+        _INSTANCE_STATS["misses"] += 1
+
+    cls = CLIENTS.get(row.server_type)
+    if not cls:
+        raise ValueError(f"Unsupported media server type: {row.server_type}")
+    client = cls(media_server=row)
+    with _INSTANCES_LOCK:
+        _INSTANCES[row.id] = (fp, client)
+    return client
+
+
+def invalidate_client(server_id: int) -> None:
+    """Forget the cached client, HTTP pool and user snapshot for *server_id*."""
+    with _INSTANCES_LOCK:
+        if _INSTANCES.pop(server_id, None) is not None:
+            _INSTANCE_STATS["invalidations"] += 1
+    close_http_session(server_id)
+    USER_CACHE.invalidate(server_id)
+
+
+def client_registry_stats() -> dict[str, int]:
+    """Hit / miss / invalidation counters plus the number of live clients."""
+    with _INSTANCES_LOCK:
+        return {**_INSTANCE_STATS, "size": len(_INSTANCES)}
+
+
+@event.listens_for(MediaServer, "after_update")
+def _invalidate_on_update(mapper, connection, target):
+    # Bookkeeping columns (name, last_synced_at, …) don't affect the client.
+    state = db.inspect(target)
+    if any(state.attrs[col].history.has_changes() for col in ("server_type", "url", "api_key")):
+        invalidate_client(target.id)
+
+
+@event.listens_for(MediaServer, "after_delete")
+def _invalidate_on_delete(mapper, connection, target):
+    invalidate_client(target.id)
+
+
 # ---------------------------------------------------------------------------
 # Base class
 # ---------------------------------------------------------------------------
@@ -94,12 +430,8 @@ class MediaClient(ABC):
         # callers relying on those attributes should migrate to supply a
         # MediaServer.
 
-        self.url = (
-            db.session.query(Settings.value).filter_by(key=url_key).scalar()
-        )
-        self.token = (
-            db.session.query(Settings.value).filter_by(key=token_key).scalar()
-        )
+        self.url = get_setting(url_key)
+        self.token = get_setting(token_key)
 
     # ------------------------------------------------------------------
     # Helpers
@@ -113,6 +445,35 @@ class MediaClient(ABC):
         self.url: str = row.url  # type: ignore[attr-defined]
         self.token: str = row.api_key  # type: ignore[attr-defined]
 
+    @property
+    def http(self) -> requests.Session:
+        """Pooled keep-alive session shared by all clients of this server."""
+        return http_session(getattr(self, "server_id", None), self.url)
+
+    @property
+    def timeout(self) -> tuple[float, float]:
+        """``(connect, read)`` timeout used for upstream HTTP calls."""
+        return (
+            _http_setting("MEDIA_HTTP_CONNECT_TIMEOUT"),
+            _http_setting("MEDIA_HTTP_READ_TIMEOUT"),
+        )
+
+    def fetch_users(self) -> list[RemoteUser]:
+        """Return the upstream accounts – implemented by each client."""
+        raise NotImplementedError
+
+    def remote_users(self, *, refresh: bool = False) -> tuple[RemoteUser, ...]:
+        """Upstream accounts for this server, served from ``USER_CACHE``."""
+        server_id = getattr(self, "server_id", None)
+        if server_id is not None and not refresh:
+            cached = USER_CACHE.get(server_id)
+            if cached is not None:
+                return cached
+        users = tuple(self.fetch_users())
+        if server_id is not None:
+            USER_CACHE.set(server_id, users)
+        return users
+
     @abstractmethod
     def libraries(self):
         raise NotImplementedError
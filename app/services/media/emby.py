@@ -12,6 +12,8 @@ EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
 class EmbyClient(JellyfinClient):
     """Wrapper around the Emby REST API using credentials from Settings."""
 
+    FOLDER_ID_KEY = "Guid"
+
     def libraries(self) -> dict[str, str]:
         """Return mapping of library GUIDs to names."""
         return {
@@ -51,10 +53,7 @@ class EmbyClient(JellyfinClient):
 
     def _set_specific_folders(self, user_id: str, names: list[str]):
         """Set library access for a user and ensure playback permissions."""
-        items = self.get("/Library/MediaFolders").json()["Items"]
-        mapping = {i["Name"]: i["Guid"] for i in items}
-        
-        print(mapping)
+        mapping = self._folder_mapping(names)
 
         folder_ids = [self._folder_name_to_id(n, mapping) for n in names]
         folder_ids = [fid for fid in folder_ids if fid]
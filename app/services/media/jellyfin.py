@@ -3,13 +3,12 @@ import logging
 import re
 from sqlalchemy import or_
 
-import requests
-
 from app.extensions import db
 from app.models import Invitation, User, Settings, Library
 from app.services.notifications import notify
-from app.services.invites import is_invite_valid
-from .client_base import MediaClient, register_media_client
+from app.services.invites import get_invite, is_invite_valid
+from app.services.libraries import library_map
+from .client_base import MediaClient, RemoteUser, USER_CACHE, reconcile_users, register_media_client
 
 EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,7}$")
 
@@ -18,6 +17,9 @@ EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,7}$")
 class JellyfinClient(MediaClient):
     """Wrapper around the Jellyfin REST API using credentials from Settings."""
 
+    # MediaFolders field that EnabledFolders refers to (and Library.external_id holds)
+    FOLDER_ID_KEY = "Id"
+
     def __init__(self, *args, **kwargs):
         # Ensure default url/token keys if caller didn't override.
         if "url_key" not in kwargs:
@@ -32,24 +34,24 @@ class JellyfinClient(MediaClient):
         return {"X-Emby-Token": self.token}
 
     def get(self, path: str):
-        r = requests.get(f"{self.url}{path}", headers=self.hdrs, timeout=10)
+        r = self.http.get(f"{self.url}{path}", headers=self.hdrs, timeout=self.timeout)
         logging.info("GET  %s%s → %s", self.url, path, r.status_code)
         r.raise_for_status()
         return r
 
     def post(self, path: str, payload: dict):
-        r = requests.post(
+        r = self.http.post(
             f"{self.url}{path}",
             json=payload,
             headers=self.hdrs,
-            timeout=10
+            timeout=self.timeout
         )
         logging.info("POST %s%s → %s", self.url, path, r.status_code)
         r.raise_for_status()
         return r
 
     def delete(self, path: str):
-        r = requests.delete(f"{self.url}{path}", headers=self.hdrs, timeout=10)
+        r = self.http.delete(f"{self.url}{path}", headers=self.hdrs, timeout=self.timeout)
         logging.info("DEL  %s%s → %s", self.url, path, r.status_code)
         r.raise_for_status()
         return r
@@ -92,40 +94,29 @@ class JellyfinClient(MediaClient):
 
         return self.post(f"/Users/{jf_id}", current).json()
 
+    def fetch_users(self) -> list[RemoteUser]:
+        return [
+            RemoteUser(id=u["Id"], username=u["Name"])
+            for u in self.get("/Users").json()
+        ]
+
     def list_users(self) -> list[User]:
         """Sync users from Jellyfin into the local DB and return the list of User records."""
-        jf_users = {u["Id"]: u for u in self.get("/Users").json()}
-
-        for jf in jf_users.values():
-            existing = User.query.filter_by(token=jf["Id"]).first()
-            if not existing:
-                new = User(
-                    token=jf["Id"],
-                    username=jf["Name"],
-                    email="empty",
-                    code="empty",
-                    password="empty",
-                    server_id=getattr(self, 'server_id', None),
-                )
-                db.session.add(new)
-        db.session.commit()
-
-        # delete local users for this server that no longer exist upstream
-        to_check = (
-            User.query
-            .filter(User.server_id == getattr(self, 'server_id', None))
-            .all()
-        )
-        for dbu in to_check:
-            if dbu.token not in jf_users:
-                db.session.delete(dbu)
-        db.session.commit()
-
-        return (
-            User.query
-            .filter(User.server_id == getattr(self, 'server_id', None))
-            .all()
+        server_id = getattr(self, 'server_id', None)
+        reconcile_users(
+            server_id,
+            self.remote_users(),
+            key="token",
+            remote_key=lambda u: u.id,
+            row_values=lambda u: {
+                "token": u.id,
+                "username": u.username,
+                "email": "empty",
+                "code": "empty",
+                "password": "empty",
+            },
         )
+        return User.query.filter(User.server_id == server_id).all()
 
     # --- helpers -----------------------------------------------------
 
@@ -144,20 +135,31 @@ class JellyfinClient(MediaClient):
     def _folder_name_to_id(name: str, cache: dict[str, str]) -> str | None:
         """Resolve a folder name or ID to the server ID."""
 
-        # Allow passing the actual ID directly
-        if name in cache.values():
-            return name
-
+        # IDs map to themselves, so this also accepts the actual ID
         return cache.get(name)
 
-    def _set_specific_folders(self, user_id: str, names: list[str]):
+    def _folder_mapping(self, names: list[str]) -> dict[str, str]:
+        """Folder name/id → id map, from the local Library table when possible.
+
+        The table is kept fresh by the ``refresh_libraries`` job, so signups
+        only ask the server when one of *names* isn't known locally.
+        """
+        server_id = getattr(self, "server_id", None)
+        if server_id is not None:
+            mapping = library_map(server_id)
+            if all(self._folder_name_to_id(n, mapping) for n in names):
+                return mapping
+
         mapping = {
-            item["Name"]: item["Id"]
+            item["Name"]: item[self.FOLDER_ID_KEY]
             for item in self.get("/Library/MediaFolders").json()["Items"]
         }
-
         # Also map IDs directly for convenience
         mapping.update({v: v for v in mapping.values()})
+        return mapping
+
+    def _set_specific_folders(self, user_id: str, names: list[str]):
+        mapping = self._folder_mapping(names)
 
         folder_ids = [self._folder_name_to_id(n, mapping) for n in names]
         folder_ids = [fid for fid in folder_ids if fid]
@@ -197,7 +199,7 @@ class JellyfinClient(MediaClient):
         try:
             user_id = self.create_user(username, password)
 
-            inv = Invitation.query.filter_by(code=code).first()
+            inv = get_invite(code)
 
             if inv.libraries:
                 sections = [lib.external_id for lib in inv.libraries]
@@ -225,13 +227,14 @@ class JellyfinClient(MediaClient):
             )
             db.session.add(new_user)
             db.session.commit()
+            USER_CACHE.invalidate(getattr(self, "server_id", None))
 
-            self._mark_invite_used(inv, new_user)
             notify(
                 "New User",
                 f"User {username} has joined your server! 🎉",
                 tags="tada",
             )
+            self._mark_invite_used(inv, new_user)
 
             return True, ""
 
@@ -1,15 +1,19 @@
 import datetime
-import threading
 import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import func, select
 
-from cachetools import cached, TTLCache
 from plexapi.server import PlexServer
 from plexapi.myplex import MyPlexAccount
+from plexapi.exceptions import Unauthorized
 
 from app.extensions import db
-from app.models import Invitation, User, Settings, Library, MediaServer
+from app.models import Invitation, Job, User, Settings, Library, MediaServer, PlexOnboarding
+from app.services.invites import get_invite
 from app.services.notifications import notify
-from .client_base import MediaClient, register_media_client
+from .client_base import MediaClient, RemoteUser, USER_CACHE, reconcile_users, register_media_client
 from app.services.media.service import get_client_for_media_server
 
 
@@ -42,13 +46,13 @@ class PlexClient(MediaClient):
     @property
     def server(self) -> PlexServer:
         if self._server is None:
-            self._server = PlexServer(self.url, self.token)
+            self._server = PlexServer(self.url, self.token, session=self.http)
         return self._server
 
     @property
     def admin(self) -> MyPlexAccount:
         if self._admin is None:
-            self._admin = MyPlexAccount(token=self.token)
+            self._admin = MyPlexAccount(token=self.token, session=self.http)
         return self._admin
 
     def libraries(self) -> dict[str, str]:
@@ -108,111 +112,196 @@ class PlexClient(MediaClient):
             except Exception as e:
                 logging.error("Error removing friend: %s", e)
 
-    @cached(cache=TTLCache(maxsize=1024, ttl=600))
+    def fetch_users(self) -> list[RemoteUser]:
+        """Return the Plex friends/home users that have access to this server."""
+        machine_id = self.server.machineIdentifier
+        return [
+            RemoteUser(id=str(u.id), username=u.title, email=u.email, photo=u.thumb)
+            for u in self.admin.users()
+            if any(s.machineIdentifier == machine_id for s in u.servers)
+        ]
+
     def list_users(self) -> list[User]:
         """Sync users from Plex into the local DB and return the list of User records."""
-        server_id = self.server.machineIdentifier
-
-        plex_users = {
-            u.email: u
-            for u in self.admin.users()
-            if any(s.machineIdentifier == server_id for s in u.servers)
-        }
-        db_users = (
-            db.session.query(User)
-            .filter(
-                db.or_(User.server_id.is_(None), User.server_id == getattr(self, 'server_id', None))
-            )
-            .all()
+        server_id = getattr(self, 'server_id', None)
+        reconcile_users(
+            server_id,
+            self.remote_users(),
+            key="email",
+            remote_key=lambda u: u.email or "None",
+            row_values=lambda u: {
+                "email": u.email or "None",
+                "username": u.username,
+                "token": "None",
+                "code": "None",
+                "photo": u.photo,
+            },
+            update_fields=("photo",),
+            adopt_orphans=True,
         )
+        return db.session.query(User).filter(User.server_id == server_id).all()
 
-        known_emails = set(plex_users.keys())
-        for db_user in db_users:
-            if db_user.email not in known_emails:
-                db.session.delete(db_user)
-        db.session.commit()
 
-        for plex_user in plex_users.values():
-            existing = db.session.query(User).filter_by(email=plex_user.email, server_id=getattr(self, 'server_id', None)).first()
-            if not existing:
-                new_user = User(
-                    email=plex_user.email or "None",
-                    username=plex_user.title,
-                    token="None",
-                    code="None",
-                    server_id=getattr(self, 'server_id', None),
-                )
-                db.session.add(new_user)
-        db.session.commit()
 
-        users = (
-            db.session.query(User)
-            .filter(User.server_id == getattr(self, 'server_id', None))
-            .all()
-        )
-        for u in users:
-            p = plex_users.get(u.email)
-            if p:
-                u.photo = p.thumb
 
-        return users
+# ─── Invite & onboarding ──────────────────────────────────────────────────
 
+# Sign-ups are onboarded by the ``plex_onboard`` background job (see
+# app.tasks.jobs) in its own "onboarding" lane, so a burst of invites queues
+# up behind that lane's concurrency limit – never behind admin jobs – instead
+# of starting threads per request.  Progress is kept on a ``PlexOnboarding``
+# row the wizard polls via /join/status/<code>.
 
+PENDING, INVITED, ACCEPTED, FAILED = "pending", "invited", "accepted", "failed"
 
 
-# ─── Invite & onboarding ──────────────────────────────────────────────────
+def start_onboarding(token: str, code: str, server: MediaServer | None) -> PlexOnboarding | None:
+    """Record a Plex sign-up and queue its onboarding job.
 
-def handle_oauth_token(app, token: str, code: str) -> None:
-    """Called after Plex OAuth handshake; create DB user and invite to Plex."""
-    with app.app_context():
-        account = MyPlexAccount(token=token)
-        email = account.email
-
-        inv = Invitation.query.filter_by(code=code).first()
-        server = inv.server if inv and inv.server else MediaServer.query.first()
-        server_id = server.id if server else None
-
-        # remove any previous account with same email on this server
-        db.session.query(User).filter(
-            User.email == email,
-            User.server_id == server_id
-        ).delete(synchronize_session=False)
-        db.session.commit()
+    Returns ``None`` – and queues nothing – when ``PLEX_ONBOARD_QUEUE_LIMIT``
+    onboarding jobs are already waiting or running.
+    """
+    from app.services.jobs import ACTIVE, enqueue
 
-        duration = inv.duration if inv else None
-        expires = (
-            datetime.datetime.now() + datetime.timedelta(days=int(duration))
-            if duration else None
-        )
+    limit = current_app.config.get("PLEX_ONBOARD_QUEUE_LIMIT", 50)
+    queued = db.session.scalar(
+        select(func.count(Job.id)).where(Job.type == "plex_onboard", Job.status.in_(ACTIVE))
+    )
+    if queued >= limit:
+        logging.warning("Plex onboarding queue full (%s jobs); turning away a join.", queued)
+        return None
 
-        new_user = User(
-            token=token,
-            email=email,
-            username=account.username,
-            code=code,
-            expires=expires,
-            server_id=server_id,
-        )
-        db.session.add(new_user)
-        db.session.commit()
+    row = PlexOnboarding(code=code, token=token, server_id=server.id if server else None, status=PENDING)
+    db.session.add(row)
+    db.session.commit()
+    row.job_id = enqueue("plex_onboard", {"onboarding_id": row.id}).id
+    db.session.commit()
+    return row
+
+
+def onboard_plex_user(onboarding_id: int, progress=None, final_attempt: bool = True) -> str | None:
+    """Create the local user, invite it to Plex and accept the invite.
+
+    Each completed stage is persisted on the ``PlexOnboarding`` row, so a job
+    re-run – after a lost worker or a ``RetryJob`` – resumes where it
+    stopped.  *progress*, if given, is called as ``progress(done, total,
+    message)``.  Returns the final status; failures are handled by
+    ``_onboarding_failed``.
+    """
+    row = db.session.get(PlexOnboarding, onboarding_id)
+    if row is None or row.status in (ACCEPTED, FAILED) or row.token is None:
+        return row.status if row else None
+    progress = progress or (lambda *a: None)
+
+    try:
+        inv = get_invite(row.code)
+        server = db.session.get(MediaServer, row.server_id) if row.server_id else MediaServer.query.first()
+        # the registry client keeps the admin's MyPlexAccount / PlexServer
+        # sessions alive across jobs
+        client = get_client_for_media_server(server)
+        account = MyPlexAccount(token=row.token)
+
+        if row.status == PENDING:
+            progress(0, 2, "inviting")
+            # user, invite and status are committed together – a failed
+            # invite leaves no local account behind
+            user = _create_user(account, row.token, row.code, inv, server)
+            _invite_user(account.email, row.code, user.id, server)
+            row.email, row.user_id, row.status, row.error = account.email, user.id, INVITED, None
+            notify(
+                "User Joined",
+                f"User {account.username} has joined your server!",
+                "tada"
+            )
+            db.session.commit()
+            # drop this server's cached user list so the next sync sees the invite
+            USER_CACHE.invalidate(server.id)
 
-        _invite_user(email, code, new_user.id, server)
+        progress(1, 2, "accepting")
+        _post_join_setup(account, client)
+    except Exception as exc:
+        return _onboarding_failed(onboarding_id, exc, final_attempt)
+
+    row.status, row.token, row.error = ACCEPTED, None, None
+    db.session.commit()
+    progress(2, 2)
+    return row.status
 
-        notify(
-            "User Joined",
-            f"User {account.username} has joined your server!",
-            "tada"
-        )
 
-        threading.Thread(
-            target=_post_join_setup,
-            args=(app, token),
-            daemon=True
-        ).start()
+def _onboarding_failed(onboarding_id: int, exc: Exception, final_attempt: bool) -> str:
+    """Record a failed onboarding attempt and retry it while that can help.
+
+    Raises ``RetryJob`` unless this was the *final_attempt* or Plex rejected
+    the user's token.  Then the token is dropped: a ``pending`` sign-up is
+    marked failed and *exc* re-raised, an ``invited`` one keeps its invite
+    for the user to accept in Plex.
+    """
+    from app.services.jobs import RetryJob
+
+    db.session.rollback()
+    row = db.session.get(PlexOnboarding, onboarding_id)
+    row.error = _error_text(exc)
+    if not (final_attempt or isinstance(exc, Unauthorized)):
+        db.session.commit()
+        raise RetryJob(row.error) from exc
+
+    row.token = None
+    if row.status == PENDING:
+        row.status = FAILED
+        db.session.commit()
+        raise exc
+    logging.error("Post-join setup failed: %s", exc)
+    db.session.commit()
+    return row.status
+
+
+def onboarding_status(code: str, onboarding_id: int | None = None) -> PlexOnboarding | None:
+    """The sign-up *onboarding_id* if it belongs to *code*, else the latest one."""
+    if onboarding_id is not None:
+        row = db.session.get(PlexOnboarding, onboarding_id)
+        if row is not None and row.code == code:
+            return row
+    return (
+        PlexOnboarding.query.filter_by(code=code)
+        .order_by(PlexOnboarding.id.desc())
+        .first()
+    )
+
+
+def _error_text(exc: Exception) -> str:
+    return (str(exc) or exc.__class__.__name__)[:500]
+
+
+def _create_user(account: MyPlexAccount, token: str, code: str, inv, server: MediaServer | None) -> User:
+    server_id = server.id if server else None
+
+    # remove any previous account with same email on this server
+    db.session.query(User).filter(
+        User.email == account.email,
+        User.server_id == server_id
+    ).delete(synchronize_session=False)
+
+    duration = inv.duration if inv else None
+    expires = (
+        datetime.datetime.now() + datetime.timedelta(days=int(duration))
+        if duration else None
+    )
+
+    new_user = User(
+        token=token,
+        email=account.email,
+        username=account.username,
+        code=code,
+        expires=expires,
+        server_id=server_id,
+    )
+    db.session.add(new_user)
+    db.session.flush()
+    return new_user
 
 
 def _invite_user(email: str, code: str, user_id: int, server: MediaServer) -> None:
-    inv = Invitation.query.filter_by(code=code).first()
+    inv = get_invite(code)
     client = get_client_for_media_server(server)
 
     # libraries list
@@ -235,32 +324,25 @@ def _invite_user(email: str, code: str, user_id: int, server: MediaServer) -> No
     logging.info("Invited %s to Plex", email)
 
     if user_id:
-        user = User.query.get(user_id)
-        inv.used_by = user
+        inv.used_by = db.session.get(User, user_id)
     inv.used_at = datetime.datetime.now()
     if not inv.unlimited:
         inv.used = True
-    # clear cached user list so admin UI shows the new invite
-    PlexClient.list_users.cache_clear()
-    db.session.commit()
 
 
-def _post_join_setup(app, token: str):
-    with app.app_context():
-        client = PlexClient()
-        try:
-            user = MyPlexAccount(token=token)
-            
-            user.acceptInvite(client.admin.email)
-            user.enableViewStateSync()
-            _opt_out_online_sources(user)
-        except Exception as exc:
-            logging.error("Post-join setup failed: %s", exc)
+def _post_join_setup(account: MyPlexAccount, client: "PlexClient") -> None:
+    account.acceptInvite(client.admin.email)
+    account.enableViewStateSync()
+    _opt_out_online_sources(account)
 
 
 def _opt_out_online_sources(user: MyPlexAccount):
-    for src in user.onlineMediaSources():
-        src.optOut()
+    # one plex.tv round trip per source – send them side by side
+    sources = user.onlineMediaSources()
+    if not sources:
+        return
+    with ThreadPoolExecutor(max_workers=min(len(sources), 4), thread_name_prefix="plex-optout") as pool:
+        list(pool.map(lambda src: src.optOut(), sources))
 
 
 # ─── User queries / mutate ────────────────────────────────────────────────
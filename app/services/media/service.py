@@ -1,10 +1,18 @@
 """Facade that dispatches media user management to Plex or Jellyfin."""
 
 from app.extensions import db
-from app.models import Settings, User, MediaServer, Identity
-from .client_base import CLIENTS
-from collections import defaultdict
-import re
+from app.models import ExpiryRetry, Invitation, User, MediaServer
+from app.services.cache import hashed_key, remember
+from app.services.identities import link_identities, refresh_cards, stale_card_keys
+from app.services.settings import get_setting
+from .client_base import CLIENTS, USER_CACHE, client_for_server
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+from itertools import zip_longest
+from typing import Iterable
+import datetime
+import logging
+import threading
 
 
 def _mode() -> str:
@@ -12,17 +20,17 @@ def _mode() -> str:
     Reads the 'server_type' setting from the DB.
     Falls back to None if it isn't set.
     """
-    return (
-        db.session
-          .query(Settings.value)
-          .filter_by(key="server_type")
-          .scalar()
-    )
+    return get_setting("server_type")
 
 
 def get_client(server_type: str | None = None, url: str | None = None, token: str | None = None):
     """
-    Instantiate the MediaClient for the given server_type, optionally overriding URL/token.
+    Return the MediaClient for the given server_type, optionally overriding URL/token.
+
+    Without overrides the shared client of the first matching MediaServer is
+    reused; ad-hoc credentials always get a fresh, uncached instance that is
+    detached from any row, so its HTTP pool is keyed by URL and never
+    replaces a configured server's session.
     """
     if server_type is None:
         server_type = _mode()
@@ -30,7 +38,14 @@ def get_client(server_type: str | None = None, url: str | None = None, token: st
         cls = CLIENTS[server_type]
     except KeyError:
         raise ValueError(f"Unsupported media server type: {server_type}")
+    if not url and not token:
+        row = MediaServer.query.filter_by(server_type=server_type).first()
+        if row is not None:
+            return client_for_server(row)
     client = cls()
+    if url or token:
+        client.server_id = None
+        client.server_row = None
     if url:
         client.url = url
     if token:
@@ -39,15 +54,8 @@ def get_client(server_type: str | None = None, url: str | None = None, token: st
 
 
 def get_client_for_media_server(server: MediaServer):
-    """Return a configured MediaClient instance for the given MediaServer row."""
-    cls = CLIENTS.get(server.server_type)
-    if not cls:
-        raise ValueError(f"Unsupported media server type: {server.server_type}")
-
-    # MediaClient can now accept the row directly which centralises
-    # credential handling and attribute population.
-    client = cls(media_server=server)
-    return client
+    """Return the shared MediaClient instance for the given MediaServer row."""
+    return client_for_server(server)
 
 
 def list_users(clear_cache: bool = False):
@@ -55,71 +63,160 @@ def list_users(clear_cache: bool = False):
     Return current users from the configured media server, syncing local DB as needed.
     """
     client = get_client(_mode())
-    # clear cache on clients that support it
-    if clear_cache and hasattr(client, 'list_users') and hasattr(client.list_users, 'cache_clear'):
-        client.list_users.cache_clear()
+    if clear_cache:
+        USER_CACHE.invalidate(getattr(client, "server_id", None))
     return client.list_users()
 
 
-def list_users_for_server(server: MediaServer, *, clear_cache: bool = False):
-    """List users for a specific MediaServer instance and ensure server_id set."""
+def list_users_for_server(server: MediaServer, *, clear_cache: bool = False, stamp: bool = True):
+    """Sync users for a specific MediaServer into the local DB.
+
+    Ensures ``server_id`` is set on every returned row and, unless *stamp* is
+    false, stamps ``MediaServer.last_synced_at`` / ``last_sync_status`` so
+    the admin UI knows how fresh its local mirror is.
+    """
     client = get_client_for_media_server(server)
-    if clear_cache and hasattr(client, 'list_users') and hasattr(client.list_users, 'cache_clear'):
-        client.list_users.cache_clear()
+    if clear_cache:
+        USER_CACHE.invalidate(server.id)
     users = client.list_users()
     # ensure linkage
-    changed = False
     for u in users:
         if u.server_id != server.id:
             u.server_id = server.id
-            changed = True
-    if changed:
-        db.session.commit()
+    if stamp:
+        server.last_synced_at = datetime.datetime.now()
+        server.last_sync_status = "ok"
+    db.session.commit()
     return users
 
 
 def delete_user(db_id: int) -> None:
     """Delete a user from its associated MediaServer and local DB."""
-    user = db.session.get(User, db_id)
-    if not user:
-        return
+    delete_users([db_id])
 
-    server = user.server
-    if server is None:
-        # fallback: derive from token? Skip remote deletion
-        db.session.delete(user)
-        db.session.commit()
-        return
 
-    client = get_client_for_media_server(server)
+def delete_users(ids: Iterable[int]) -> dict[int, str | None]:
+    """Delete many users from their media servers and the local DB.
+
+    Remote deletions for all servers run concurrently (see
+    ``remote_delete_many``); a failed remote deletion is logged but the user
+    is still removed locally so the UI stays consistent, as before.  Local
+    rows go in one statement, and each involved server's user cache is
+    invalidated once at the end.  Returns ``{user_id: None | error}`` for
+    every user that existed.
+    """
+    users = (
+        User.query.options(db.joinedload(User.server))
+        .filter(User.id.in_({int(i) for i in ids}))
+        .all()
+    )
+    if not users:
+        return {}
+
+    groups: dict[MediaServer, list[User]] = {}
+    for user in users:
+        if user.server is not None:
+            groups.setdefault(user.server, []).append(user)
+
+    results: dict[int, str | None] = {u.id: None for u in users}
+    results.update(remote_delete_many(groups))
+    for uid, error in results.items():
+        if error is not None:
+            logging.error("Remote deletion of user %s failed: %s", uid, error)
+
+    user_ids = list(results)
+    cards = {u.card_key for u in users}
+    db.session.query(Invitation).filter(Invitation.used_by_id.in_(user_ids)).update(
+        {Invitation.used_by_id: None}, synchronize_session=False
+    )
+    db.session.query(ExpiryRetry).filter(ExpiryRetry.user_id.in_(user_ids)).delete(synchronize_session=False)
+    db.session.query(User).filter(User.id.in_(user_ids)).delete(synchronize_session=False)
+    # the remaining accounts of those cards may now sort under another name
+    refresh_cards(cards)
+    db.session.commit()
+    # the rows are gone – don't let the identity map hand them out again
+    for user in users:
+        db.session.expunge(user)
 
-    # clear cache pre‐removal if supported
-    if hasattr(client, 'list_users') and hasattr(client.list_users, 'cache_clear'):
-        client.list_users.cache_clear()
+    for server in groups:
+        USER_CACHE.invalidate(server.id)
+    return results
 
-    try:
-        if server.server_type == 'plex':
-            if user.email and user.email != 'None':
-                client.delete_user(user.email)
+
+def _remote_delete(app, client, server_type: str, email: str | None, token: str) -> None:
+    with app.app_context():
+        if server_type == 'plex':
+            if email and email != 'None':
+                client.delete_user(email)
         else:
-            client.delete_user(user.token)
-    except Exception as exc:
-        # log but still remove locally so UI stays consistent
-        import logging
-        logging.error("Remote deletion failed: %s", exc)
+            client.delete_user(token)
 
-    db.session.delete(user)
-    db.session.commit()
 
-    if hasattr(client, 'list_users') and hasattr(client.list_users, 'cache_clear'):
-        client.list_users.cache_clear()
+def _gated_remote_delete(gate: threading.Semaphore, *args) -> None:
+    with gate:
+        _remote_delete(*args)
+
+
+def remote_delete_many(
+    groups: dict[MediaServer, list[User]], *, per_server: int | None = None
+) -> dict[int, str | None]:
+    """Delete users from several servers concurrently, local DB untouched.
+
+    One pool of up to ``USER_DELETE_WORKERS`` threads serves every server,
+    and a semaphore per server keeps at most *per_server*
+    (``USER_DELETE_PER_SERVER``) deletions in flight against any one of
+    them.  Each server's client is built once.  Returns
+    ``{user_id: None | error message}``.
+    """
+    app = current_app._get_current_object()
+    per_server = per_server or app.config.get("USER_DELETE_PER_SERVER", 4)
+
+    results: dict[int, str | None] = {}
+    queues = []
+    for server, users in groups.items():
+        if not users:
+            continue
+        try:
+            client = get_client_for_media_server(server)
+        except Exception as exc:
+            results.update({u.id: str(exc) or exc.__class__.__name__ for u in users})
+            continue
+        gate = threading.BoundedSemaphore(per_server)
+        queues.append([(gate, client, server.server_type, u) for u in users])
+
+    # interleave servers so one big server can't park the whole pool on its semaphore
+    jobs = [job for batch in zip_longest(*queues) for job in batch if job is not None]
+    if not jobs:
+        return results
+
+    workers = max(1, min(app.config.get("USER_DELETE_WORKERS", 16), len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="user-delete") as pool:
+        futures = {
+            pool.submit(_gated_remote_delete, gate, app, client, server_type, u.email, u.token): u.id
+            for gate, client, server_type, u in jobs
+        }
+        for fut, uid in futures.items():
+            exc = fut.exception()
+            results[uid] = None if exc is None else str(exc) or exc.__class__.__name__
+    return results
+
+
+def remote_delete_users(server: MediaServer, users: list[User]) -> dict[int, str | None]:
+    """Delete *users* from *server* concurrently, leaving the local DB alone.
+
+    Uses one shared client and up to ``EXPIRY_DELETE_WORKERS`` threads.
+    Returns ``{user_id: None | error message}`` so callers can decide what to
+    retry; local rows and caches are the caller's business.
+    """
+    if not users:
+        return {}
+    per_server = current_app.config.get("EXPIRY_DELETE_WORKERS", 4)
+    return remote_delete_many({server: users}, per_server=per_server)
 
 
 def delete_user_for_server(server: MediaServer, db_id: int) -> None:
     """Delete a user from the given MediaServer and local DB."""
     client = get_client_for_media_server(server)
-    if hasattr(client, 'list_users') and hasattr(client.list_users, 'cache_clear'):
-        client.list_users.cache_clear()
 
     user = db.session.get(User, db_id)
     if user:
@@ -132,8 +229,7 @@ def delete_user_for_server(server: MediaServer, db_id: int) -> None:
         db.session.delete(user)
         db.session.commit()
 
-    if hasattr(client, 'list_users') and hasattr(client.list_users, 'cache_clear'):
-        client.list_users.cache_clear()
+    USER_CACHE.invalidate(server.id)
 
 
 def scan_libraries(url: str | None = None, token: str | None = None, server_type: str | None = None):
@@ -151,56 +247,157 @@ def scan_libraries_for_server(server: MediaServer):
     return client.libraries()
 
 
-EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
-
+def _sync_server_users(app, server_id: int, clear_cache: bool,
+                       timed_out: threading.Event, lock: threading.Lock) -> None:
+    """Worker body: sync one server inside its own app context / DB session.
 
-def _auto_link_identities():
-    """Group accounts that share the *same, valid* email address.
-
-    Users imported from Plex/Jellyfin which lack a real email often use
-    placeholders like "None" or "empty".  Linking those together would create
-    one giant pseudo-identity, so we now skip addresses that don't match a
-    simple *user@host* pattern.
+    A worker that outlives the deadline still finishes its sync, but leaves
+    the server's ``last_sync_status = "timeout"`` alone.
     """
+    with app.app_context():
+        server = db.session.get(MediaServer, server_id)
+        if server is None:
+            return
+        try:
+            list_users_for_server(server, clear_cache=clear_cache, stamp=False)
+            with lock:
+                if timed_out.is_set():
+                    return
+                server.last_synced_at = datetime.datetime.now()
+                server.last_sync_status = "ok"
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
 
-    users = (
-        db.session.query(User)
-        .filter(User.email.isnot(None))
-        .all()
-    )
 
-    buckets: dict[str, list[User]] = defaultdict(list)
-    for u in users:
-        email = (u.email or "").strip()
-        if not EMAIL_RE.fullmatch(email):
-            # ignore invalid / placeholder addresses
-            continue
-        buckets[email.lower()].append(u)
+def sync_users_all_servers(clear_cache: bool = False) -> dict[int, str]:
+    """Sync users for every server concurrently.
 
-    for same in buckets.values():
-        if len(same) < 2:
-            continue  # nothing to link
+    Each server is synced in a pool thread (``USER_SYNC_WORKERS``) with its
+    own app context, and the whole fan-out is bounded by
+    ``USER_SYNC_DEADLINE`` seconds, so wall-clock time is that of the slowest
+    server rather than the sum.  Returns ``{server_id: "ok"|"timeout"|"error"}``
+    and records the same value on ``MediaServer.last_sync_status``.
+    """
+    app = current_app._get_current_object()
+    server_ids = [sid for (sid,) in db.session.query(MediaServer.id).all()]
+    if not server_ids:
+        return {}
+
+    workers = max(1, min(app.config.get("USER_SYNC_WORKERS", 4), len(server_ids)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="user-sync")
+    lock = threading.Lock()
+    timed_out = {sid: threading.Event() for sid in server_ids}
+    futures = {
+        pool.submit(_sync_server_users, app, sid, clear_cache, timed_out[sid], lock): sid
+        for sid in server_ids
+    }
+    done, pending = wait(futures, timeout=app.config.get("USER_SYNC_DEADLINE", 30))
+    # Don't block on stragglers – they finish (or fail) in the background,
+    # without overwriting the "timeout" status recorded below.
+    with lock:
+        for fut in pending:
+            timed_out[futures[fut]].set()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    statuses: dict[int, str] = {}
+    for fut in done:
+        sid = futures[fut]
+        if fut.exception() is not None:
+            logging.error("User sync for server %s failed: %s", sid, fut.exception())
+            statuses[sid] = "error"
+        else:
+            statuses[sid] = "ok"
+    for fut in pending:
+        sid = futures[fut]
+        logging.warning("User sync for server %s exceeded the deadline", sid)
+        statuses[sid] = "timeout"
+
+    failed = {sid: st for sid, st in statuses.items() if st != "ok"}
+    for server in db.session.query(MediaServer).filter(MediaServer.id.in_(failed)).all():
+        server.last_sync_status = failed[server.id]
+    db.session.commit()
 
-        identity = same[0].identity or Identity(
-            primary_email=same[0].email,
-            primary_username=same[0].username,
+    # link after syncing so freshly mirrored accounts are grouped right away,
+    # and repair the card names bulk deletes elsewhere left behind
+    link_identities()
+    refresh_cards(stale_card_keys())
+    db.session.commit()
+    return statuses
+
+
+def _fetch_user_details(app, server_id: int, user_arg, ttl: int) -> dict:
+    """Worker body: ``client.get_user()`` for one account, briefly cached."""
+    with app.app_context():
+        server = db.session.get(MediaServer, server_id)
+        if server is None:
+            raise ValueError(f"No server with id {server_id}")
+        client = get_client_for_media_server(server)
+        if not hasattr(client, "get_user"):
+            raise AttributeError("Client lacks get_user()")
+        return remember(
+            hashed_key("user-details", server_id, user_arg),
+            ttl,
+            lambda: client.get_user(user_arg),
         )
-        db.session.add(identity)
-        db.session.flush()
 
-        for u in same:
-            u.identity_id = identity.id
 
-    db.session.commit()
+def fetch_user_details(accounts: list[User]) -> dict[int, dict | None]:
+    """Upstream details (policy, configuration …) for several accounts.
+
+    Every account is fetched in a pool thread with its own app context and
+    the whole fan-out is bounded by ``USER_DETAILS_DEADLINE`` seconds, so an
+    identity spanning several servers costs the slowest server rather than
+    the sum.  Results are cached for ``USER_DETAILS_CACHE_SECONDS`` per
+    (server, user).  Returns ``{user_id: details}``; accounts that failed,
+    timed out or have no server map to ``None``.
+    """
+    app = current_app._get_current_object()
+    ttl = app.config.get("USER_DETAILS_CACHE_SECONDS", 60)
+    # Plex's get_user() expects the DB row id, the others the upstream id
+    jobs = {
+        acct.id: (acct.server_id, acct.id if acct.server.server_type == "plex" else acct.token)
+        for acct in accounts
+        if acct.server is not None
+    }
+    results: dict[int, dict | None] = {acct.id: None for acct in accounts}
+    if not jobs:
+        return results
+
+    workers = max(1, min(app.config.get("USER_SYNC_WORKERS", 4), len(jobs)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="user-details")
+    futures = {
+        pool.submit(_fetch_user_details, app, sid, user_arg, ttl): uid
+        for uid, (sid, user_arg) in jobs.items()
+    }
+    done, pending = wait(futures, timeout=app.config.get("USER_DETAILS_DEADLINE", 10))
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    for fut in done:
+        uid = futures[fut]
+        if fut.exception() is not None:
+            logging.error("Failed to fetch user details for account %s: %s", uid, fut.exception())
+        else:
+            results[uid] = fut.result()
+    for fut in pending:
+        logging.warning("Fetching user details for account %s exceeded the deadline", futures[fut])
+    return results
 
 
 def list_users_all_servers(clear_cache: bool = False):
-    """Return users for all servers (mapping server -> list)."""
-    _auto_link_identities()
+    """Sync users for all servers (mapping server -> list).
+
+    This performs an upstream round-trip to every server, so it is meant for
+    the scheduled ``sync_users`` job and the explicit "sync now" action –
+    admin views read the local ``User`` mirror instead.  Servers that failed
+    or timed out map to an empty list; see ``sync_users_all_servers`` for the
+    per-server status.
+    """
+    statuses = sync_users_all_servers(clear_cache=clear_cache)
     res = {}
-    for server in db.session.query(MediaServer).all():
-        try:
-            res[server.id] = list_users_for_server(server, clear_cache=clear_cache)
-        except Exception:
-            res[server.id] = []
-    return res
\ No newline at end of file
+    for sid, status in statuses.items():
+        res[sid] = (
+            User.query.filter(User.server_id == sid).all() if status == "ok" else []
+        )
+    return res
@@ -1,51 +1,137 @@
 import apprise
+import datetime
 import logging
 import json
 import base64
 import requests
-from app.models import Notification
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import event
 
-__all__ = ["notify"]
+from app.extensions import db
+from app.models import Notification, NotificationEvent, NotificationDelivery
 
-def _send(url: str, data, headers: dict) -> bool:
+__all__ = ["notify", "dispatch_notifications", "prune_notifications", "invalidate_apprise"]
+
+
+class DeliveryError(Exception):
+    """A notification could not be delivered; ``retry_after`` is in seconds."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _retry_after(resp: requests.Response) -> float | None:
+    """Seconds to wait after a 429 – ``Retry-After`` header or Discord's JSON body."""
+    header = resp.headers.get("Retry-After")
+    if header:
+        try:
+            return float(header)
+        except ValueError:
+            pass
+    try:
+        return float(resp.json()["retry_after"])
+    except Exception:
+        return None
+
+
+def _post(url: str, data, headers: dict) -> None:
+    """POST and raise ``DeliveryError`` unless the agent accepted it."""
     try:
         resp = requests.post(url, data=data, headers=headers, timeout=5)
-        if resp.status_code in (200, 204):
-            return True
-        logging.error(
-            "Notification failed – %s → %s • %s",
-            url, resp.status_code, resp.text
-        )
-        return False
     except requests.RequestException as exc:
-        logging.error("Notification request error: %s", exc)
+        raise DeliveryError(f"request error: {exc}") from exc
+    if resp.status_code in (200, 204):
+        return
+    raise DeliveryError(
+        f"{resp.status_code} • {resp.text[:200]}",
+        retry_after=_retry_after(resp) if resp.status_code == 429 else None,
+    )
+
+
+def _send(url: str, data, headers: dict) -> bool:
+    try:
+        _post(url, data, headers)
+        return True
+    except DeliveryError as exc:
+        logging.error("Notification failed – %s → %s", url, exc)
         return False
 
-def _discord(msg: str, webhook_url: str) -> bool:
+
+def _discord_request(msg: str, webhook_url: str) -> tuple:
     data    = json.dumps({"content": msg})
     headers = {"Content-Type": "application/json"}
-    return _send(webhook_url, data, headers)
+    return webhook_url, data, headers
 
-def _ntfy(
+
+def _ntfy_request(
     msg: str, title: str, tags: str, url: str,
     username: str | None, password: str | None
-) -> bool:
+) -> tuple:
     headers = {"Title": title, "Tags": tags}
     if username and password:
         creds = f"{username}:{password}"
         headers["Authorization"] = "Basic " + \
             base64.b64encode(creds.encode()).decode()
-    return _send(url, msg, headers)
+    return url, msg, headers
+
+
+def _discord(msg: str, webhook_url: str) -> bool:
+    return _send(*_discord_request(msg, webhook_url))
+
+def _ntfy(
+    msg: str, title: str, tags: str, url: str,
+    username: str | None, password: str | None
+) -> bool:
+    return _send(*_ntfy_request(msg, title, tags, url, username, password))
+
+# Parsed ``apprise.Apprise`` objects per Notification row: agent_id → (url, obj, lock).
+# Building one re-parses the URL and loads plugins, which adds up when an
+# invite campaign produces hundreds of events an hour.
+_APPRISE: dict[int, tuple[str, apprise.Apprise, threading.Lock]] = {}
+_APPRISE_LOCK = threading.Lock()
+
+
+def _apprise_for(agent_id: int, url: str) -> tuple[apprise.Apprise, threading.Lock]:
+    with _APPRISE_LOCK:
+        entry = _APPRISE.get(agent_id)
+        if entry is None or entry[0] != url:
+            obj = apprise.Apprise()
+            obj.add(url)
+            entry = (url, obj, threading.Lock())
+            _APPRISE[agent_id] = entry
+        return entry[1], entry[2]
+
+
+def invalidate_apprise(agent_id: int) -> None:
+    """Forget the cached Apprise object of one agent."""
+    with _APPRISE_LOCK:
+        _APPRISE.pop(agent_id, None)
+
 
-def _apprise(msg: str, title: str, tags: str, url: str) -> bool:
+@event.listens_for(Notification, "after_update")
+@event.listens_for(Notification, "after_delete")
+def _agent_changed(_mapper, _connection, target):
+    invalidate_apprise(target.id)
+
+
+def _apprise(msg: str, title: str, tags: str, url: str, agent_id: int | None = None) -> bool:
     try:
-        apprise_client = apprise.Apprise()
-        apprise_client.add(url)
+        if agent_id is None:
+            # ad-hoc (e.g. "test & create") – nothing worth caching yet
+            apprise_client, lock = apprise.Apprise(), threading.Lock()
+            apprise_client.add(url)
+        else:
+            apprise_client, lock = _apprise_for(agent_id, url)
 
-        result = apprise_client.notify(
-            title=title,
-            body=msg
-        )
+        with lock:
+            result = apprise_client.notify(
+                title=title,
+                body=msg
+            )
 
         logging.info(f"Apprise notification {'sent' if result else 'failed'}: {title}")
         return result
@@ -54,15 +140,209 @@ def _apprise(msg: str, title: str, tags: str, url: str) -> bool:
         logging.error(f"Error sending Apprise notification: {e}")
         return False
 
+
+def _deliver(job: dict) -> None:
+    """Send one outbox event to one agent; raises ``DeliveryError`` on failure.
+
+    *job* is a plain dict snapshot so it can be handed to a worker thread
+    without dragging ORM objects (and their session) along.
+    """
+    if job["type"] == "discord":
+        _post(*_discord_request(job["message"], job["url"]))
+    elif job["type"] == "ntfy":
+        _post(*_ntfy_request(
+            job["message"], job["title"], job["tags"],
+            job["url"], job["username"], job["password"]
+        ))
+    elif job["type"] == "apprise":
+        if not _apprise(job["message"], job["title"], job["tags"], job["url"], job["agent_id"]):
+            raise DeliveryError("apprise reported failure")
+    else:
+        raise DeliveryError(f"unknown agent type {job['type']!r}")
+
+
 def notify(title: str, message: str, tags: str):
-    """Broadcast to every configured agent."""
-    for agent in Notification.query.all():
-        if agent.type == "discord":
-            _discord(message, agent.url)
-        elif agent.type == "ntfy":
-            _ntfy(
-                message, title, tags,
-                agent.url, agent.username, agent.password
+    """Queue a broadcast to every configured agent.
+
+    Only the outbox row is added here – the scheduler's dispatcher sends it
+    so slow or rate-limited agents never hold up the caller.  The caller
+    owns the transaction: the event is flushed, and goes out only once the
+    caller commits.
+    """
+    db.session.add(NotificationEvent(title=title, message=message, tags=tags))
+    db.session.flush()
+
+
+def _fan_out(now: datetime.datetime) -> None:
+    """Create a delivery row per agent for every event not fanned out yet.
+
+    Deliveries for digest agents are due at the end of the agent's open
+    digest window (starting a new one if needed), so everything within the
+    window comes due together and goes out as one message.
+    """
+    events = NotificationEvent.query.filter_by(fanned_out=False).all()
+    if not events:
+        return
+    agents = db.session.query(Notification.id, Notification.digest_minutes).all()
+    open_windows = dict(
+        db.session.query(NotificationDelivery.agent_id, db.func.max(NotificationDelivery.next_attempt_at))
+        .filter(NotificationDelivery.status == "pending",
+                NotificationDelivery.attempts == 0,
+                NotificationDelivery.next_attempt_at > now)
+        .group_by(NotificationDelivery.agent_id)
+        .all()
+    )
+    for event_row in events:
+        for aid, digest in agents:
+            due = now
+            if digest:
+                due = open_windows.setdefault(aid, now + datetime.timedelta(minutes=digest))
+            db.session.add(
+                NotificationDelivery(event_id=event_row.id, agent_id=aid, attempts=0, next_attempt_at=due)
             )
-        elif agent.type == "apprise":
-            _apprise(message, title, tags, agent.url)
+        event_row.fanned_out = True
+    db.session.commit()
+
+
+# Longest message each agent type accepts (Discord rejects longer content with
+# a 400, ntfy turns it into an attachment); apprise splits messages itself
+_MESSAGE_LIMITS = {"discord": 2000, "ntfy": 4096}
+
+
+def _fit(lines: list[str], limit: int | None) -> str:
+    """Join *lines*, replacing the ones past *limit* with "… and N more"."""
+    message = "\n".join(lines)
+    if limit is None or len(message) <= limit:
+        return message
+    kept, size = [], 0
+    for i, line in enumerate(lines):
+        more = f"… and {len(lines) - i} more"
+        if size + len(line) + 1 + len(more) > limit:
+            kept.append(more)
+            break
+        kept.append(line)
+        size += len(line) + 1
+    message = "\n".join(kept)
+    # a single line longer than the limit on its own
+    return message if len(message) <= limit else message[:limit - 1] + "…"
+
+
+def _digest(events: list[NotificationEvent], limit: int | None = None) -> tuple[str, str, str]:
+    """Title, message and tags for several events sent as one, within *limit*."""
+    if len(events) == 1:
+        e = events[0]
+        return e.title, _fit([e.message], limit), e.tags or ""
+    lines = _fit([f"• {e.title}: {e.message}" for e in events], limit)
+    tags = ",".join(sorted({t for e in events for t in (e.tags or "").split(",") if t}))
+    return f"{len(events)} notifications", lines, tags
+
+
+def dispatch_notifications() -> dict[str, int]:
+    """Send due outbox deliveries in parallel and record the outcome per agent.
+
+    Due deliveries of a digest agent are coalesced into one message, cut
+    to the agent type's length limit with an "… and N more" line.
+    Failures are retried with exponential backoff (``NOTIFY_RETRY_BACKOFF``
+    doubled per attempt, or the agent's 429 ``Retry-After`` if longer) until
+    ``NOTIFY_MAX_ATTEMPTS`` is reached.  Returns counts of sent / retry /
+    failed deliveries.
+    """
+    cfg = current_app.config
+    now = datetime.datetime.now()
+    _fan_out(now)
+
+    due = (
+        db.session.query(NotificationDelivery, NotificationEvent, Notification)
+        .join(NotificationEvent, NotificationDelivery.event_id == NotificationEvent.id)
+        .join(Notification, NotificationDelivery.agent_id == Notification.id)
+        .filter(NotificationDelivery.status == "pending",
+                NotificationDelivery.next_attempt_at <= now)
+        .order_by(NotificationDelivery.next_attempt_at)
+        .limit(cfg.get("NOTIFY_BATCH_SIZE", 50))
+        .all()
+    )
+    counts = {"sent": 0, "retry": 0, "failed": 0}
+    if not due:
+        return counts
+
+    # one send per delivery, or per agent for digest agents
+    groups: dict[tuple, list] = defaultdict(list)
+    for delivery, event_row, agent in due:
+        key = (agent.id,) if agent.digest_minutes else (agent.id, delivery.id)
+        groups[key].append((delivery, event_row, agent))
+
+    jobs = {}
+    for key, rows in groups.items():
+        agent = rows[0][2]
+        title, message, tags = _digest([e for _d, e, _a in rows], _MESSAGE_LIMITS.get(agent.type))
+        jobs[key] = {
+            "agent_id": agent.id, "type": agent.type, "url": agent.url,
+            "username": agent.username, "password": agent.password,
+            "title": title, "message": message, "tags": tags,
+        }
+    workers = max(1, min(cfg.get("NOTIFY_WORKERS", 4), len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notify") as pool:
+        futures = {key: pool.submit(_deliver, job) for key, job in jobs.items()}
+
+    max_attempts = cfg.get("NOTIFY_MAX_ATTEMPTS", 5)
+    backoff = cfg.get("NOTIFY_RETRY_BACKOFF", 30)
+    for key, rows in groups.items():
+        exc = futures[key].exception()
+        agent = rows[0][2]
+        for delivery, _event, _agent in rows:
+            delivery.attempts += 1
+            if exc is None:
+                delivery.status = "sent"
+                delivery.sent_at = now
+                delivery.last_error = None
+                counts["sent"] += 1
+                continue
+
+            delivery.last_error = str(exc)[:500]
+            if delivery.attempts >= max_attempts:
+                delivery.status = "failed"
+                counts["failed"] += 1
+                continue
+
+            wait = backoff * 2 ** (delivery.attempts - 1)
+            retry_after = getattr(exc, "retry_after", None)
+            if retry_after:
+                wait = max(wait, retry_after)
+            delivery.next_attempt_at = now + datetime.timedelta(seconds=wait)
+            counts["retry"] += 1
+
+        if exc is not None:
+            logging.warning("Notification to %s failed (%s event(s)): %s", agent.name, len(rows), exc)
+
+    db.session.commit()
+    return counts
+
+
+def prune_notifications(days: int | None = None) -> int:
+    """Delete outbox events older than *days* whose deliveries are all settled.
+
+    Defaults to ``NOTIFY_RETENTION_DAYS``.  Events that still have a pending
+    delivery are kept however old they are.  Returns the number of events
+    removed (their deliveries go with them).
+    """
+    if days is None:
+        days = current_app.config.get("NOTIFY_RETENTION_DAYS", 30)
+    # NotificationEvent.created is stored in UTC
+    cutoff = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None) - datetime.timedelta(days=days)
+    pending = db.select(NotificationDelivery.event_id).where(NotificationDelivery.status == "pending")
+    ids = list(db.session.scalars(
+        db.select(NotificationEvent.id).where(
+            NotificationEvent.fanned_out.is_(True),
+            NotificationEvent.created < cutoff,
+            NotificationEvent.id.not_in(pending),
+        )
+    ))
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        db.session.execute(db.delete(NotificationDelivery).where(NotificationDelivery.event_id.in_(chunk)))
+        db.session.execute(
+            db.delete(NotificationEvent).where(NotificationEvent.id.in_(chunk)),
+            execution_options={"synchronize_session": False},
+        )
+    db.session.commit()
+    return len(ids)
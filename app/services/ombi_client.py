@@ -1,17 +1,17 @@
 import logging
 import requests
-from app.models import Settings, User
+from app.models import User
+from app.services.settings import get_setting
 
-__all__ = ["run_user_importer", "delete_user"]
+__all__ = ["importers_configured", "run_user_importer", "run_all_importers", "delete_user"]
 
 def _cfg():
     """Fetch Ombi/Overseerr URL and API key from the DB."""
-    url_row = Settings.query.filter_by(key="overseerr_url").first()
-    key_row = Settings.query.filter_by(key="ombi_api_key").first()
-    return (
-        url_row.value if url_row else None,
-        key_row.value if key_row else None,
-    )
+    return get_setting("overseerr_url"), get_setting("ombi_api_key")
+
+def importers_configured() -> bool:
+    url, key = _cfg()
+    return bool(url and key)
 
 def run_user_importer(name: str):
     url, key = _cfg()
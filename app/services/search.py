@@ -0,0 +1,126 @@
+"""Full-text search over users, identities and invitation codes.
+
+Backed by an SQLite FTS5 table with the ``trigram`` tokenizer, so substring
+searches ("%term%") are answered from the index instead of scanning the
+tables.  Triggers keep it in sync with every write – ORM, bulk or raw SQL –
+and the table is created by migration ``20250622_search_index`` or, for
+``db.create_all()`` databases, by the ``after_create`` hook below.
+
+Rows are keyed ``rowid = id * 4 + kind`` so triggers can update them by
+rowid instead of scanning the (unindexed) FTS columns.
+"""
+
+from __future__ import annotations
+
+from sqlalchemy import Integer, bindparam, event, text
+
+from app.extensions import db
+from app.models import Invitation, User
+
+__all__ = ["user_search_clause", "invite_ids", "search_available", "SEARCH_DDL"]
+
+KIND_USER, KIND_IDENTITY, KIND_INVITATION = 0, 1, 2
+
+# trigram needs at least three characters to match anything
+MIN_TERM = 3
+
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(body, tokenize='trigram')",
+    # users: username + email
+    """CREATE TRIGGER IF NOT EXISTS search_user_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_au AFTER UPDATE OF username, email ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_ad AFTER DELETE ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+    END""",
+    # identities: primary e-mail
+    """CREATE TRIGGER IF NOT EXISTS search_identity_ai AFTER INSERT ON identity BEGIN
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 1, coalesce(new.primary_email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_identity_au AFTER UPDATE OF primary_email ON identity BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 1, coalesce(new.primary_email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_identity_ad AFTER DELETE ON identity BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+    END""",
+    # invitations: code
+    """CREATE TRIGGER IF NOT EXISTS search_invitation_ai AFTER INSERT ON invitation BEGIN
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 2, new.code);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_invitation_au AFTER UPDATE OF code ON invitation BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 2, new.code);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_invitation_ad AFTER DELETE ON invitation BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+    END""",
+]
+
+
+@event.listens_for(db.metadata, "after_create")
+def _create_search_index(_target, connection, **_kw):
+    if connection.dialect.name != "sqlite":
+        return
+    try:
+        for ddl in SEARCH_DDL:
+            connection.exec_driver_sql(ddl)
+    except Exception:
+        # SQLite built without FTS5/trigram – search falls back to LIKE
+        pass
+
+
+_available: bool | None = None
+
+
+def search_available() -> bool:
+    """Whether the FTS table exists in the current database."""
+    global _available
+    if not _available:
+        _available = db.engine.dialect.name == "sqlite" and db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_index'")
+        ).first() is not None
+    return _available
+
+
+def _match(term: str, kind: int):
+    phrase = '"' + term.replace('"', '""') + '"'
+    # unique binds: a query may combine several of these subqueries
+    return text(
+        "SELECT rowid / 4 AS id FROM search_index "
+        "WHERE search_index MATCH :phrase AND rowid % 4 = :kind"
+    ).bindparams(
+        bindparam("phrase", phrase, unique=True),
+        bindparam("kind", kind, unique=True),
+    ).columns(id=Integer)
+
+
+def _use_index(term: str) -> bool:
+    return len(term) >= MIN_TERM and search_available()
+
+
+def user_search_clause(term: str):
+    """Filter matching users by username / e-mail / identity e-mail."""
+    term = term.strip().lower()
+    if not _use_index(term):
+        like = f"%{term}%"
+        return db.or_(User.username.ilike(like), User.email.ilike(like))
+    return db.or_(
+        User.id.in_(_match(term, KIND_USER)),
+        User.identity_id.in_(_match(term, KIND_IDENTITY)),
+    )
+
+
+def invite_ids(term: str, limit: int = 10) -> list[int]:
+    """IDs of invitations whose code contains *term*."""
+    term = term.strip().lower()
+    if not _use_index(term):
+        rows = db.session.query(Invitation.id).filter(Invitation.code.ilike(f"%{term}%")).limit(limit)
+        return [r for (r,) in rows]
+    return [r.id for r in db.session.execute(_match(term, KIND_INVITATION)).fetchmany(limit)]
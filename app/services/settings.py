@@ -0,0 +1,201 @@
+"""Per-worker cache of the key/value ``Settings`` table.
+
+Nearly every request reads a few settings (admin username, server name,
+server type …).  Instead of querying the table each time, every worker keeps
+a copy of the whole table and compares a single-row ``settings_version``
+counter – at most once per request – to find out whether another worker
+changed something.  The counter is bumped automatically in the same
+transaction as any Settings / MediaServer write, so callers like
+``_save_settings`` or the setup flow don't have to remember to do it.
+Writes that only touch a server's sync bookkeeping (``last_synced_at`` /
+``last_sync_status``) don't count, so background syncs keep the cache warm.
+"""
+
+from __future__ import annotations
+
+import threading
+
+from flask import g, has_request_context
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.extensions import db
+from app.models import MediaServer, Settings, SettingsVersion
+
+__all__ = [
+    "get_settings",
+    "get_setting",
+    "get_bool",
+    "get_int",
+    "settings_version",
+    "onboarding_epoch",
+    "invalidate_settings",
+]
+
+_TRACKED = (Settings, MediaServer)
+
+# Sync bookkeeping written on every background user sync – nothing cached
+# from Settings depends on it, so writing only these doesn't bump the version
+_UNTRACKED_COLUMNS = {MediaServer: frozenset({"last_synced_at", "last_sync_status"})}
+
+# SettingsVersion rows: the settings counter and the onboarding epoch
+_VERSION_ID, _EPOCH_ID = 1, 2
+
+_lock = threading.Lock()
+_version: int | None = None
+_epoch: int | None = None
+_values: dict[str, str | None] = {}
+
+
+def invalidate_settings() -> None:
+    """Force the next access to reload (used after local writes)."""
+    global _version
+    with _lock:
+        _version = None
+    if has_request_context():
+        g.pop("_settings_checked", None)
+
+
+def _load_values() -> dict[str, str | None]:
+    return {k: v for k, v in db.session.execute(select(Settings.key, Settings.value))}
+
+
+_has_version_table: bool | None = None
+
+
+def _version_table_exists(connection) -> bool:
+    # databases that haven't run the migration yet simply aren't cached
+    global _has_version_table
+    if not _has_version_table:
+        _has_version_table = db.inspect(connection).has_table(SettingsVersion.__tablename__)
+    return _has_version_table
+
+
+def _current() -> dict[str, str | None]:
+    global _version, _epoch, _values
+    if has_request_context() and g.get("_settings_checked"):
+        return _values
+    if not _version_table_exists(db.session.connection()):
+        return _load_values()
+
+    counters = dict(db.session.execute(
+        select(SettingsVersion.id, SettingsVersion.version)
+        .where(SettingsVersion.id.in_((_VERSION_ID, _EPOCH_ID)))
+    ).all())
+    remote = counters.get(_VERSION_ID)
+    with _lock:
+        _epoch = counters.get(_EPOCH_ID, 0)
+        stale = remote is None or remote != _version
+    if stale:
+        values = _load_values()
+        with _lock:
+            _version, _values = remote, values
+    if has_request_context():
+        g._settings_checked = True
+    return _values
+
+
+def get_settings() -> dict[str, str | None]:
+    """Return a copy of the whole settings table as ``{key: value}``."""
+    return dict(_current())
+
+
+def get_setting(key: str, default: str | None = None) -> str | None:
+    value = _current().get(key)
+    return default if value is None else value
+
+
+def get_bool(key: str, default: bool = False) -> bool:
+    value = _current().get(key)
+    if value is None:
+        return default
+    return value.lower() == "true"
+
+
+def get_int(key: str, default: int | None = None) -> int | None:
+    try:
+        return int(_current()[key])
+    except (KeyError, TypeError, ValueError):
+        return default
+
+
+def settings_version() -> int | None:
+    """Version of the cached settings snapshot (checked like any other read)."""
+    _current()
+    return _version
+
+
+def onboarding_epoch() -> int | None:
+    """Counter that only moves when a server or the admin account is removed.
+
+    Read together with the settings version, so it costs no extra query.
+    ``None`` when the version table doesn't exist yet.
+    """
+    _current()
+    return _epoch
+
+
+# ─── version bumping ────────────────────────────────────────────────────────
+
+def _bump(connection, *, onboarding: bool = False) -> None:
+    if not _version_table_exists(connection):
+        return
+    for row_id in (_VERSION_ID, _EPOCH_ID) if onboarding else (_VERSION_ID,):
+        result = connection.execute(
+            update(SettingsVersion)
+            .where(SettingsVersion.id == row_id)
+            .values(version=SettingsVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(SettingsVersion).values(id=row_id, version=1))
+    invalidate_settings()
+
+
+def _undoes_onboarding(obj, deleted: bool) -> bool:
+    """A removed server, or the admin account removed / cleared."""
+    if isinstance(obj, MediaServer):
+        return deleted
+    if isinstance(obj, Settings) and obj.key == "admin_username":
+        return deleted or not obj.value
+    return False
+
+
+def _changes_tracked_columns(obj) -> bool:
+    """Whether a dirty tracked row changed anything but bookkeeping columns."""
+    ignored = _UNTRACKED_COLUMNS.get(type(obj), frozenset())
+    state = db.inspect(obj)
+    return any(
+        attr.key not in ignored and state.attrs[attr.key].history.has_changes()
+        for attr in state.mapper.column_attrs
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, _flush_context):
+    # history is still the pre-flush one here, so dirty rows can be checked
+    if any(isinstance(obj, _TRACKED) for obj in session.new | session.deleted) or any(
+        isinstance(obj, _TRACKED) and _changes_tracked_columns(obj) for obj in session.dirty
+    ):
+        onboarding = any(_undoes_onboarding(obj, True) for obj in session.deleted) or any(
+            _undoes_onboarding(obj, False) for obj in session.dirty
+        )
+        _bump(session.connection(), onboarding=onboarding)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _after_bulk(orm_execute_state):
+    # Query(...).update()/.delete() skip the flush, so catch them here
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _TRACKED:
+        # the affected rows are unknown – assume the worst for onboarding
+        onboarding = orm_execute_state.is_delete or mapper.class_ is Settings
+        _bump(orm_execute_state.session.connection(), onboarding=onboarding)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(_session):
+    # a rolled-back bump may have been cached under a version number that
+    # the next real write will reuse
+    invalidate_settings()
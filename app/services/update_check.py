@@ -1,7 +1,7 @@
 from typing import Dict, List
 
 import requests
-from cachetools import cached, TTLCache
+from app.services.cache import remember
 from packaging.version import parse as vparse
 
 MANIFEST_URL = (
@@ -11,7 +11,6 @@ CACHE_HOURS = 6
 
 
 
-@cached(cache=TTLCache(maxsize=1, ttl=CACHE_HOURS * 3600))
 def _fetch_manifest() -> Dict:
     resp = requests.get(
         MANIFEST_URL,
@@ -26,7 +25,8 @@ def _fetch_manifest() -> Dict:
 
 def _manifest() -> Dict:
     try:
-        return _fetch_manifest()
+        # shared across workers so only one of them hits GitHub per period
+        return remember("update-manifest", CACHE_HOURS * 3600, _fetch_manifest)
     except Exception:
         # on failure, return empty or last good state if you choose to store it elsewhere
         return {}
@@ -0,0 +1,195 @@
+"""Parsed and pre-compiled wizard steps (``wizard_steps/<server>/*.md``).
+
+Each markdown file is read and its front matter parsed once; the body is
+compiled into a Jinja template on the app's environment.  A server's steps
+are re-read only when the directory or one of its files changes (mtime), so
+a wizard click costs one template render plus the markdown pass.
+
+On top of that the fully rendered HTML is kept in a small LRU keyed by the
+step, the locale and the values of exactly the variables the step reads, so
+users walking the same steps during an invite wave mostly hit the cache.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import hashlib
+import frontmatter
+import markdown
+from cachetools import LRUCache
+from flask import current_app
+from flask_babel import get_locale
+from jinja2 import Template, meta
+from sqlalchemy import event
+
+from app.models import MediaServer, Settings
+
+__all__ = ["WizardStep", "StepRegistry", "step_registry"]
+
+MD_EXTENSIONS = ["fenced_code", "tables", "attr_list"]
+
+# ``markdown.Markdown`` instances are expensive to build (extension loading)
+# but not thread-safe, so keep one per thread and ``reset()`` between uses.
+_md_local = threading.local()
+
+
+def _markdown(text: str) -> str:
+    md = getattr(_md_local, "md", None)
+    if md is None:
+        md = _md_local.md = markdown.Markdown(extensions=MD_EXTENSIONS)
+    return md.reset().convert(text)
+
+
+# Template variables whose value depends on the visitor rather than on
+# settings – steps reading them are never served from the HTML cache.
+_PER_REQUEST_NAMES = frozenset({"request", "session", "g", "current_user", "csrf_token"})
+
+# Bumped whenever Settings / MediaServer rows change; registries drop their
+# rendered HTML when they notice a new generation.
+_generation = 0
+
+
+def _bump_generation(*_args) -> None:
+    global _generation
+    _generation += 1
+
+
+for _model in (Settings, MediaServer):
+    for _evt in ("after_insert", "after_update", "after_delete"):
+        event.listen(_model, _evt, _bump_generation)
+
+
+@dataclass(frozen=True)
+class WizardStep:
+    path: Path
+    requires: tuple[str, ...]
+    template: Template
+    # undeclared template variables, i.e. everything the step reads
+    names: frozenset[str] = frozenset()
+    mtime: int = 0
+
+    @property
+    def cacheable(self) -> bool:
+        return not (self.names & _PER_REQUEST_NAMES)
+
+    def eligible(self, cfg: dict) -> bool:
+        return all(cfg.get(k) for k in self.requires)
+
+    @staticmethod
+    def context(ctx: dict) -> dict:
+        # Jinja templates inside the markdown files expect a top-level `settings` variable.
+        # Build a context copy that exposes the current config dictionary via this key
+        # while still passing through all existing entries and utilities (e.g. the _() gettext).
+        _vars = ctx.copy()
+        _vars.setdefault("settings", ctx)  # avoid overwriting if already provided
+        current_app.update_template_context(_vars)
+        return _vars
+
+    def render(self, ctx: dict) -> str:
+        return _markdown(self.template.render(self.context(ctx)))
+
+    def fingerprint(self, variables: dict) -> str:
+        """Hash of the template variables this step actually reads."""
+        parts = []
+        for name in sorted(self.names):
+            value = variables.get(name)
+            if name == "settings" and isinstance(value, dict):
+                value = sorted((k, v) for k, v in value.items() if not callable(v))
+            elif callable(value):
+                continue  # gettext & co. – covered by the locale
+            parts.append(f"{name}={value!r}")
+        return hashlib.sha1("\x00".join(parts).encode()).hexdigest()
+
+
+class StepRegistry:
+    """Per-server cache of ``WizardStep`` lists (invalidated by mtime) plus an
+    LRU of rendered step HTML (dropped when Settings / MediaServer change)."""
+
+    def __init__(self, base_dir: Path, jinja_env, html_cache_size: int = 256) -> None:
+        self.base_dir = base_dir
+        self.env = jinja_env
+        self._lock = threading.Lock()
+        self._html: LRUCache = LRUCache(maxsize=html_cache_size)
+        self._html_generation = _generation
+        self.stats = {"hits": 0, "misses": 0}
+        # server → (directory mtime, {path: file mtime}, steps)
+        self._cache: dict[str, tuple[int, dict[Path, int], list[WizardStep]]] = {}
+
+    def _load(self, path: Path) -> WizardStep:
+        post = frontmatter.load(path)
+        return WizardStep(
+            path=path,
+            requires=tuple(post.get("requires", []) or ()),
+            template=self.env.from_string(post.content),
+            names=frozenset(meta.find_undeclared_variables(self.env.parse(post.content))),
+            mtime=path.stat().st_mtime_ns,
+        )
+
+    def steps(self, server: str) -> list[WizardStep]:
+        """All steps of *server* in file-name order (empty if unknown)."""
+        if not server or server.startswith(".") or "/" in server:
+            return []
+        directory = self.base_dir / server
+        try:
+            dir_mtime = directory.stat().st_mtime_ns
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+
+        cached = self._cache.get(server)
+        if cached and cached[0] == dir_mtime and self._files_unchanged(cached[1]):
+            return cached[2]
+
+        with self._lock:
+            files = sorted(directory.glob("*.md"))
+            mtimes = {f: f.stat().st_mtime_ns for f in files}
+            steps = [self._load(f) for f in files]
+            self._cache[server] = (dir_mtime, mtimes, steps)
+        return steps
+
+    @staticmethod
+    def _files_unchanged(mtimes: dict[Path, int]) -> bool:
+        try:
+            return all(os.stat(p).st_mtime_ns == m for p, m in mtimes.items())
+        except FileNotFoundError:
+            return False
+
+    def render(self, step: WizardStep, ctx: dict) -> str:
+        """Render *step*, serving identical inputs from the HTML cache."""
+        if not step.cacheable:
+            return step.render(ctx)
+
+        variables = step.context(ctx)
+        key = (step.path, step.mtime, str(get_locale()), step.fingerprint(variables))
+        with self._lock:
+            if self._html_generation != _generation:
+                self._html.clear()
+                self._html_generation = _generation
+            html = self._html.get(key)
+            self.stats["hits" if html is not None else "misses"] += 1
+        if html is None:
+            html = _markdown(step.template.render(variables))
+            with self._lock:
+                self._html[key] = html
+        return html
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._html.clear()
+
+
+def step_registry(base_dir: Path) -> StepRegistry:
+    """Return the app's registry for *base_dir*, creating it on first use."""
+    registry = current_app.extensions.get("wizard_steps")
+    if registry is None or registry.base_dir != base_dir:
+        registry = StepRegistry(
+            base_dir,
+            current_app.jinja_env,
+            html_cache_size=current_app.config.get("WIZARD_HTML_CACHE_SIZE", 256),
+        )
+        current_app.extensions["wizard_steps"] = registry
+    return registry
@@ -0,0 +1,78 @@
+# app/tasks/jobs.py
+"""Job types run by the background worker (see app.services.jobs)."""
+from app.extensions import db
+from app.models import MediaServer
+from app.services.jobs import job_type
+from app.services.libraries import refresh_all_libraries
+from app.services.media.plex import onboard_plex_user
+from app.services.media.service import delete_users, list_users_for_server, sync_users_all_servers
+from app.services.ombi_client import run_all_importers
+
+# ids per delete_users() call – progress is reported after each chunk
+DELETE_CHUNK = 50
+
+
+@job_type("sync_users")
+def sync_users_job(ctx, server_id: int | None = None):
+    """Mirror one server's (or every server's) users into the local DB."""
+    if server_id is None:
+        ctx.progress(0, message="Syncing all servers")
+        statuses = sync_users_all_servers(clear_cache=True)
+        ctx.progress(len(statuses), len(statuses))
+        return {str(sid): status for sid, status in statuses.items()}
+
+    server = db.session.get(MediaServer, server_id)
+    if server is None:
+        return {str(server_id): "missing"}
+    ctx.progress(0, 1, f"Syncing {server.name}")
+    try:
+        list_users_for_server(server, clear_cache=True)
+    except Exception:
+        # recorded, so the user grid doesn't queue another first sync
+        db.session.rollback()
+        server.last_sync_status = "error"
+        db.session.commit()
+        raise
+    ctx.progress(1, 1)
+    return {str(server_id): "ok"}
+
+
+@job_type("delete_users")
+def delete_users_job(ctx, ids: list[int]):
+    """Delete users in chunks; users already gone (e.g. on resume) are skipped."""
+    failed: dict[str, str] = {}
+    deleted = 0
+    ctx.progress(0, len(ids))
+    for start in range(0, len(ids), DELETE_CHUNK):
+        results = delete_users(ids[start:start + DELETE_CHUNK])
+        deleted += len(results)
+        failed.update({str(uid): err for uid, err in results.items() if err})
+        ctx.progress(min(start + DELETE_CHUNK, len(ids)), len(ids))
+    return {"deleted": deleted, "remote_failures": failed}
+
+
+@job_type("refresh_libraries")
+def refresh_libraries_job(ctx):
+    """Refresh every server's library list."""
+    results = refresh_all_libraries(
+        progress=lambda done, total, name: ctx.progress(done, total, name)
+    )
+    return {str(sid): (r is not None and r.changed) for sid, r in results.items()}
+
+
+@job_type("ombi_import")
+def ombi_import_job(ctx):
+    """Have Ombi/Overseerr import new media-server users."""
+    run_all_importers()
+    return {}
+
+
+@job_type("plex_onboard", lane="onboarding")
+def plex_onboard_job(ctx, onboarding_id: int):
+    """Invite a Plex sign-up and accept the invite on their behalf."""
+    status = onboard_plex_user(
+        onboarding_id,
+        progress=lambda done, total, message=None: ctx.progress(done, total, message),
+        final_attempt=ctx.final_attempt,
+    )
+    return {"status": status}
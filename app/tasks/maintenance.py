@@ -1,10 +1,117 @@
 # app/tasks/maintenance.py
 import logging
+import os
+import time
 from app.extensions import scheduler
 from app.services.expiry import delete_user_if_expired   # ← fixed import
+from app.services.libraries import refresh_all_libraries
+from app.services.media.service import sync_users_all_servers
+from app.services.notifications import dispatch_notifications, prune_notifications
+
+# How often the notification outbox is flushed to the agents, and how often
+# the dispatcher prunes settled events from it
+NOTIFY_DISPATCH_SECONDS = int(os.getenv("NOTIFY_DISPATCH_SECONDS", "5"))
+NOTIFY_PRUNE_SECONDS = int(os.getenv("NOTIFY_PRUNE_SECONDS", "3600"))
+_last_prune = 0.0
+
+# How often the local User table is refreshed from every media server
+USER_SYNC_MINUTES = int(os.getenv("USER_SYNC_INTERVAL_MINUTES", "15"))
+
+# How often every media server's library list is refreshed into the DB
+LIBRARY_REFRESH_MINUTES = int(os.getenv("LIBRARY_REFRESH_MINUTES", "60"))
 
-@scheduler.task("interval", id="check_expiring", minutes=15, misfire_grace_time=900)
 def check_expiring():
     with scheduler.app.app_context():
         deleted = delete_user_if_expired()
         logging.info("Deleted %s expired users.", len(deleted)) if len(deleted) > 0 else None
+
+
+def schedule_expiry_check(app) -> None:
+    """Schedule ``check_expiring`` every ``EXPIRY_CHECK_SECONDS`` of *app*.
+
+    Expired users are removed within that many seconds of their deadline.
+    Registered at start-up rather than with ``@scheduler.task`` because the
+    interval comes from the app config.
+    """
+    seconds = app.config["EXPIRY_CHECK_SECONDS"]
+    scheduler.add_job(
+        id="check_expiring",
+        func=check_expiring,
+        trigger="interval",
+        seconds=seconds,
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=seconds,
+        replace_existing=True,
+    )
+
+
+def start_scheduler(app) -> None:
+    """Start the scheduled tasks and the in-process job workers for *app*.
+
+    Called once per server: from the Gunicorn master (``gunicorn.conf.py``),
+    ``python run.py``, or ``create_app`` when ``SCHEDULER_AUTOSTART`` is set
+    for other servers such as ``flask run``.  Without it nothing dispatches
+    the notification outbox.  Later calls in the same process are no-ops.
+    """
+    from app.services.jobs import start_workers
+
+    if scheduler.running:
+        return
+    scheduler.init_app(app)
+    schedule_expiry_check(app)
+    scheduler.start()
+
+    # background jobs run here too – admin jobs only unless a
+    # `flask jobs worker` handles them, sign-ups always
+    start_workers(app)
+
+
+@scheduler.task("interval", id="sync_users", minutes=USER_SYNC_MINUTES, misfire_grace_time=USER_SYNC_MINUTES * 60)
+def sync_users():
+    """Mirror every media server's users into the local DB for the admin UI."""
+    with scheduler.app.app_context():
+        statuses = sync_users_all_servers()
+        ok = sum(1 for s in statuses.values() if s == "ok")
+        logging.info("Synced users for %s/%s media servers.", ok, len(statuses))
+
+
+@scheduler.task(
+    "interval",
+    id="refresh_libraries",
+    minutes=LIBRARY_REFRESH_MINUTES,
+    max_instances=1,
+    coalesce=True,
+    misfire_grace_time=LIBRARY_REFRESH_MINUTES * 60,
+)
+def refresh_libraries():
+    """Keep the Library table in step with every media server."""
+    with scheduler.app.app_context():
+        results = refresh_all_libraries()
+        changed = sum(1 for r in results.values() if r is not None and r.changed)
+        failed = sum(1 for r in results.values() if r is None)
+        if changed or failed:
+            logging.info("Library refresh: %s servers changed, %s failed.", changed, failed)
+
+
+@scheduler.task(
+    "interval",
+    id="dispatch_notifications",
+    seconds=NOTIFY_DISPATCH_SECONDS,
+    max_instances=1,
+    coalesce=True,
+    misfire_grace_time=NOTIFY_DISPATCH_SECONDS,
+)
+def send_notifications():
+    """Deliver queued notifications from the outbox and prune old ones."""
+    global _last_prune
+    with scheduler.app.app_context():
+        counts = dispatch_notifications()
+        if counts["retry"] or counts["failed"]:
+            logging.info("Notifications: %s sent, %s retrying, %s failed.",
+                         counts["sent"], counts["retry"], counts["failed"])
+        if time.monotonic() - _last_prune >= NOTIFY_PRUNE_SECONDS:
+            _last_prune = time.monotonic()
+            pruned = prune_notifications()
+            if pruned:
+                logging.info("Pruned %s old notification(s) from the outbox.", pruned)
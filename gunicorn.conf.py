@@ -1,5 +1,7 @@
+import sys
+
 from app import create_app
-from app.extensions import scheduler
+from app.tasks.maintenance import start_scheduler
 from app.scripts.migrate_libraries import run_library_migration, update_server_verified
 from app.scripts.migrate_media_server import migrate_single_to_multi
 
@@ -14,5 +16,17 @@ def on_starting(server):
     
     migrate_single_to_multi(app)
     
-    scheduler.init_app(app)
-    scheduler.start()
+    # scheduled tasks and in-process job workers
+    start_scheduler(app)
+
+
+def post_fork(server, worker):
+    # With --preload the worker inherits run:app's engine from the master.
+    # Drop the inherited pool (without closing the parent's connections) so
+    # every worker opens its own SQLite connections.
+    run = sys.modules.get("run")
+    if run is None:
+        return
+    from app.extensions import db
+    with run.app.app_context():
+        db.engine.dispose(close=False)
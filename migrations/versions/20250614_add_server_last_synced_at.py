@@ -0,0 +1,26 @@
+"""
+add last_synced_at to media_server
+
+Revision ID: 20250614_last_synced_at
+Revises: 20250613_external_url
+Create Date: 2025-06-14 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250614_last_synced_at'
+down_revision = '20250613_external_url'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media_server', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_synced_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('media_server', schema=None) as batch_op:
+        batch_op.drop_column('last_synced_at')
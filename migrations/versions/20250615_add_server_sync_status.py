@@ -0,0 +1,26 @@
+"""
+add last_sync_status to media_server
+
+Revision ID: 20250615_sync_status
+Revises: 20250614_last_synced_at
+Create Date: 2025-06-15 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250615_sync_status'
+down_revision = '20250614_last_synced_at'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('media_server', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_sync_status', sa.String(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('media_server', schema=None) as batch_op:
+        batch_op.drop_column('last_sync_status')
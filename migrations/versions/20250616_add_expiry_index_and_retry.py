@@ -0,0 +1,42 @@
+"""
+index user.expires and add expiry_retry queue
+
+Revision ID: 20250616_expiry_engine
+Revises: 20250615_sync_status
+Create Date: 2025-06-16 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250616_expiry_engine'
+down_revision = '20250615_sync_status'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_expires'), ['expires'], unique=False)
+
+    op.create_table(
+        'expiry_retry',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id'),
+    )
+    with op.batch_alter_table('expiry_retry', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_expiry_retry_next_attempt_at'), ['next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expiry_retry', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_expiry_retry_next_attempt_at'))
+    op.drop_table('expiry_retry')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_expires'))
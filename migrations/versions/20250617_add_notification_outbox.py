@@ -0,0 +1,58 @@
+"""
+add notification outbox tables
+
+Revision ID: 20250617_notification_outbox
+Revises: 20250616_expiry_engine
+Create Date: 2025-06-17 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250617_notification_outbox'
+down_revision = '20250616_expiry_engine'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'notification_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('message', sa.String(), nullable=False),
+        sa.Column('tags', sa.String(), nullable=True),
+        sa.Column('created', sa.DateTime(), nullable=False),
+        sa.Column('fanned_out', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('notification_event', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_notification_event_fanned_out'), ['fanned_out'], unique=False)
+
+    op.create_table(
+        'notification_delivery',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.Integer(), nullable=False),
+        sa.Column('agent_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+        sa.Column('last_error', sa.String(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['event_id'], ['notification_event.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['agent_id'], ['notification.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('notification_delivery', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_notification_delivery_next_attempt_at'), ['next_attempt_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification_delivery', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notification_delivery_next_attempt_at'))
+    op.drop_table('notification_delivery')
+
+    with op.batch_alter_table('notification_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notification_event_fanned_out'))
+    op.drop_table('notification_event')
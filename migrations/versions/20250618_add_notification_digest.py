@@ -0,0 +1,26 @@
+"""
+add digest_minutes to notification
+
+Revision ID: 20250618_notification_digest
+Revises: 20250617_notification_outbox
+Create Date: 2025-06-18 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250618_notification_digest'
+down_revision = '20250617_notification_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('digest_minutes', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('notification', schema=None) as batch_op:
+        batch_op.drop_column('digest_minutes')
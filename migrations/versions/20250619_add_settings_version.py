@@ -0,0 +1,30 @@
+"""
+add settings_version counter
+
+Revision ID: 20250619_settings_version
+Revises: 20250618_notification_digest
+Create Date: 2025-06-19 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250619_settings_version'
+down_revision = '20250618_notification_digest'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table = op.create_table(
+        'settings_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.bulk_insert(table, [{'id': 1, 'version': 0}])
+
+
+def downgrade():
+    op.drop_table('settings_version')
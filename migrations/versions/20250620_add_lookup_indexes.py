@@ -0,0 +1,96 @@
+"""
+index hot lookup columns and add invitation.code_normalized
+
+Revision ID: 20250620_lookup_indexes
+Revises: 20250619_settings_version
+Create Date: 2025-06-20 00:00:00
+
+"""
+import logging
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250620_lookup_indexes'
+down_revision = '20250619_settings_version'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+invitation = sa.table(
+    'invitation',
+    sa.column('id', sa.Integer),
+    sa.column('code', sa.String),
+    sa.column('code_normalized', sa.String),
+)
+
+
+def upgrade():
+    # user.expires is already indexed by 20250616_expiry_engine
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_token'), ['token'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_email'), ['email'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_server_id'), ['server_id'], unique=False)
+
+    with op.batch_alter_table('invitation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('code_normalized', sa.String(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_invitation_server_id'), ['server_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_invitation_expires'), ['expires'], unique=False)
+
+    _backfill_code_normalized()
+    with op.batch_alter_table('invitation', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_invitation_code_normalized'), ['code_normalized'], unique=True)
+
+    with op.batch_alter_table('library', schema=None) as batch_op:
+        batch_op.create_index('ix_library_server_id_external_id', ['server_id', 'external_id'], unique=False)
+
+
+def _backfill_code_normalized():
+    """Set ``code_normalized`` on every invitation.
+
+    Should two legacy codes differ only in case, the oldest one keeps its code
+    (lookups were case-insensitive before too) and the others are renamed to
+    ``<code>-2``, ``<code>-3``, … so each stays redeemable under the unique
+    index.  Renamed codes are logged for the admin to hand out again.
+    """
+    conn = op.get_bind()
+    rows = conn.execute(invitation.select().order_by(invitation.c.id)).all()
+    taken = {row.code.lower() for row in rows}
+    seen, params = set(), []
+    for row in rows:
+        code = row.code
+        if code.lower() in seen:
+            n = 2
+            while f"{row.code}-{n}".lower() in taken:
+                n += 1
+            code = f"{row.code}-{n}"
+            taken.add(code.lower())
+            logger.warning("Invitation %s: code %r clashes with an older one, renamed to %r",
+                           row.id, row.code, code)
+        seen.add(code.lower())
+        params.append({"_id": row.id, "_code": code, "_normalized": code.lower()})
+    if params:
+        conn.execute(
+            invitation.update()
+            .where(invitation.c.id == sa.bindparam('_id'))
+            .values(code=sa.bindparam('_code'), code_normalized=sa.bindparam('_normalized')),
+            params,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('library', schema=None) as batch_op:
+        batch_op.drop_index('ix_library_server_id_external_id')
+
+    with op.batch_alter_table('invitation', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_invitation_code_normalized'))
+        batch_op.drop_index(batch_op.f('ix_invitation_expires'))
+        batch_op.drop_index(batch_op.f('ix_invitation_server_id'))
+        batch_op.drop_column('code_normalized')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_server_id'))
+        batch_op.drop_index(batch_op.f('ix_user_email'))
+        batch_op.drop_index(batch_op.f('ix_user_token'))
@@ -0,0 +1,24 @@
+"""
+index user (lower(username), id) for keyset pagination
+
+Revision ID: 20250621_user_username_idx
+Revises: 20250620_lookup_indexes
+Create Date: 2025-06-21 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250621_user_username_idx'
+down_revision = '20250620_lookup_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_lower_username_id', 'user', [sa.text('lower(username)'), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_user_lower_username_id', table_name='user')
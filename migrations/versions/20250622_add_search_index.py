@@ -0,0 +1,82 @@
+"""
+add FTS5 search_index over users, identities and invitation codes
+
+Revision ID: 20250622_search_index
+Revises: 20250621_user_username_idx
+Create Date: 2025-06-22 00:00:00
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '20250622_search_index'
+down_revision = '20250621_user_username_idx'
+branch_labels = None
+depends_on = None
+
+# rowid = id * 4 + kind (0 user, 1 identity, 2 invitation)
+DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(body, tokenize='trigram')",
+    """CREATE TRIGGER IF NOT EXISTS search_user_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_au AFTER UPDATE OF username, email ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_ad AFTER DELETE ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_identity_ai AFTER INSERT ON identity BEGIN
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 1, coalesce(new.primary_email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_identity_au AFTER UPDATE OF primary_email ON identity BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 1, coalesce(new.primary_email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_identity_ad AFTER DELETE ON identity BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 1;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_invitation_ai AFTER INSERT ON invitation BEGIN
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 2, new.code);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_invitation_au AFTER UPDATE OF code ON invitation BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+        INSERT INTO search_index(rowid, body) VALUES (new.id * 4 + 2, new.code);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_invitation_ad AFTER DELETE ON invitation BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4 + 2;
+    END""",
+]
+
+BACKFILL = [
+    """INSERT INTO search_index(rowid, body)
+       SELECT id * 4, coalesce(username, '') || ' ' || coalesce(email, '') FROM "user" """,
+    """INSERT INTO search_index(rowid, body)
+       SELECT id * 4 + 1, coalesce(primary_email, '') FROM identity""",
+    """INSERT INTO search_index(rowid, body)
+       SELECT id * 4 + 2, code FROM invitation""",
+]
+
+TRIGGERS = [
+    f"search_{table}_{op_}"
+    for table in ("user", "identity", "invitation")
+    for op_ in ("ai", "au", "ad")
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for stmt in DDL + BACKFILL:
+        op.execute(stmt)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS search_index")
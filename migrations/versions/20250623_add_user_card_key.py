@@ -0,0 +1,92 @@
+"""
+add user.email_normalized / user.card_key for SQL-side grid grouping
+
+Revision ID: 20250623_user_card_key
+Revises: 20250622_search_index
+Create Date: 2025-06-23 00:00:00
+
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250623_user_card_key'
+down_revision = '20250622_search_index'
+branch_labels = None
+depends_on = None
+
+# frozen copy of app.models.EMAIL_RE
+EMAIL_RE = re.compile(r"^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$")
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('email_normalized', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('card_key', sa.String(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_email_normalized'), ['email_normalized'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_card_key'), ['card_key'], unique=False)
+
+    conn = op.get_bind()
+    user = sa.table(
+        'user',
+        sa.column('id', sa.Integer),
+        sa.column('email', sa.String),
+        sa.column('identity_id', sa.Integer),
+        sa.column('email_normalized', sa.String),
+        sa.column('card_key', sa.String),
+    )
+    updates = []
+    for uid, email, identity_id in conn.execute(sa.select(user.c.id, user.c.email, user.c.identity_id)):
+        email = (email or '').strip()
+        normalized = email.lower() if EMAIL_RE.fullmatch(email) else None
+        if identity_id:
+            key = f'i:{identity_id}'
+        elif normalized:
+            key = f'e:{normalized}'
+        else:
+            key = None
+        if normalized or key:
+            updates.append({'uid': uid, 'norm': normalized, 'key': key})
+    if updates:
+        conn.execute(
+            user.update()
+            .where(user.c.id == sa.bindparam('uid'))
+            .values(email_normalized=sa.bindparam('norm'), card_key=sa.bindparam('key')),
+            updates,
+        )
+
+
+# frozen copies of the objects the batch copy-and-move below can't carry
+# over: the expression index from 20250621_user_username_idx and the user
+# triggers from 20250622_search_index are dropped along with the old table
+USER_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS search_user_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_au AFTER UPDATE OF username, email ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_ad AFTER DELETE ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+    END""",
+]
+
+
+def downgrade():
+    op.drop_index('ix_user_card_key', table_name='user')
+    op.drop_index('ix_user_email_normalized', table_name='user')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('card_key')
+        batch_op.drop_column('email_normalized')
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_user_lower_username_id")
+    op.create_index('ix_user_lower_username_id', 'user', [sa.text('lower(username)'), 'id'], unique=False)
+    for stmt in USER_TRIGGERS:
+        op.execute(stmt)
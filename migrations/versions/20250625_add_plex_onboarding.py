@@ -0,0 +1,44 @@
+"""
+add plex_onboarding table for per-code Plex join status
+
+Revision ID: 20250625_plex_onboarding
+Revises: 20250624_jobs
+Create Date: 2025-06-25 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250625_plex_onboarding'
+down_revision = '20250624_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'plex_onboarding',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.String(), nullable=False),
+        sa.Column('server_id', sa.Integer(), nullable=True),
+        sa.Column('token', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('error', sa.String(), nullable=True),
+        sa.Column('job_id', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['server_id'], ['media_server.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    with op.batch_alter_table('plex_onboarding', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_plex_onboarding_code'), ['code'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('plex_onboarding', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_plex_onboarding_code'))
+    op.drop_table('plex_onboarding')
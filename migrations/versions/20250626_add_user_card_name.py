@@ -0,0 +1,76 @@
+"""
+add user.card_name and index (card_name, card_key) for the card grid
+
+Revision ID: 20250626_user_card_name
+Revises: 20250625_plex_onboarding
+Create Date: 2025-06-26 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250626_user_card_name'
+down_revision = '20250625_plex_onboarding'
+branch_labels = None
+depends_on = None
+
+# frozen copies of the objects the batch copy-and-move in downgrade() can't
+# carry over (see 20250621_user_username_idx / 20250622_search_index)
+USER_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS search_user_ai AFTER INSERT ON "user" BEGIN
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_au AFTER UPDATE OF username, email ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+        INSERT INTO search_index(rowid, body)
+        VALUES (new.id * 4, coalesce(new.username, '') || ' ' || coalesce(new.email, ''));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_user_ad AFTER DELETE ON "user" BEGIN
+        DELETE FROM search_index WHERE rowid = old.id * 4;
+    END""",
+]
+
+user = sa.table(
+    'user',
+    sa.column('id', sa.Integer),
+    sa.column('username', sa.String),
+    sa.column('card_key', sa.String),
+    sa.column('card_name', sa.String),
+)
+
+
+def upgrade():
+    op.add_column('user', sa.Column('card_name', sa.String(), nullable=True))
+    op.create_index('ix_user_card_name_key', 'user', ['card_name', 'card_key'], unique=False)
+
+    # accounts of their own get a "u:<id>" key, then every card its name
+    conn = op.get_bind()
+    conn.execute(
+        user.update()
+        .where(user.c.card_key.is_(None))
+        .values(card_key=sa.literal('u:') + sa.cast(user.c.id, sa.String))
+    )
+    other = user.alias('other')
+    conn.execute(
+        user.update().values(
+            card_name=sa.select(sa.func.min(sa.func.lower(other.c.username)))
+            .where(other.c.card_key == user.c.card_key)
+            .scalar_subquery()
+        )
+    )
+
+
+def downgrade():
+    op.drop_index('ix_user_card_name_key', table_name='user')
+    op.get_bind().execute(user.update().where(user.c.card_key.like('u:%')).values(card_key=None))
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('card_name')
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("DROP INDEX IF EXISTS ix_user_lower_username_id")
+    op.create_index('ix_user_lower_username_id', 'user', [sa.text('lower(username)'), 'id'], unique=False)
+    for stmt in USER_TRIGGERS:
+        op.execute(stmt)
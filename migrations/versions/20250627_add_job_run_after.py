@@ -0,0 +1,26 @@
+"""
+add job.run_after for jobs retried by their handler
+
+Revision ID: 20250627_job_run_after
+Revises: 20250626_user_card_name
+Create Date: 2025-06-27 00:00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '20250627_job_run_after'
+down_revision = '20250626_user_card_name'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('run_after', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('job', schema=None) as batch_op:
+        batch_op.drop_column('run_after')
@@ -3,4 +3,6 @@ from app import create_app
 app = create_app()
 
 if __name__ == "__main__":
+    from app.tasks.maintenance import start_scheduler
+    start_scheduler(app)
     app.run()
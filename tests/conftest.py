@@ -9,6 +9,7 @@ class TestConfig(BaseConfig):
     TESTING = True
     WTF_CSRF_ENABLED = False
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    CACHE_BACKEND = "simple"
 
 
 @pytest.fixture(scope="session")
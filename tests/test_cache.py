@@ -0,0 +1,97 @@
+from cachelib import SimpleCache
+
+from app.services.cache import make_cache, remember
+from app.services.media.client_base import USER_CACHE, MediaClient, RemoteUser
+
+
+def test_filesystem_cache_is_shared_between_instances(tmp_path):
+    cfg = {"CACHE_BACKEND": "filesystem", "CACHE_DIR": str(tmp_path)}
+    worker_a, worker_b = make_cache(cfg), make_cache(cfg)
+
+    worker_a.set("users:1", ("alice",))
+    assert worker_b.get("users:1") == ("alice",)
+
+    worker_b.delete("users:1")
+    assert worker_a.get("users:1") is None
+
+
+def test_remember_only_calls_producer_on_miss(app):
+    calls = []
+
+    def producer():
+        calls.append(1)
+        return ["Movies"]
+
+    with app.app_context():
+        assert remember("test-remember", 60, producer) == ["Movies"]
+        assert remember("test-remember", 60, producer) == ["Movies"]
+    assert len(calls) == 1
+
+
+def test_simple_backend_for_tests():
+    assert isinstance(make_cache({"CACHE_BACKEND": "simple"}), SimpleCache)
+
+
+class _FakeRedis:
+    """Dict-backed stand-in for the redis client calls cachelib makes."""
+
+    def __init__(self, store=None):
+        self.store = {} if store is None else store
+
+    def get(self, name):
+        return self.store.get(name)
+
+    def set(self, name, value, ex=None):
+        self.store[name] = value
+        return True
+
+    def delete(self, *names):
+        return sum(self.store.pop(n, None) is not None for n in names)
+
+    def exists(self, name):
+        return int(name in self.store)
+
+
+class _DownRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis is down")
+        return fail
+
+
+def test_redis_backend_is_shared_between_workers():
+    store = {}
+    cfg = {"CACHE_BACKEND": "redis"}
+    worker_a = make_cache(cfg, redis_client=_FakeRedis(store))
+    worker_b = make_cache(cfg, redis_client=_FakeRedis(store))
+
+    users = (RemoteUser(id="1", username="alice"),)
+    worker_a.set("users:1", users, timeout=60)
+    assert all(key.startswith("wizarr:") for key in store)
+    assert worker_b.get("users:1") == users
+
+    worker_b.delete("users:1")
+    assert worker_a.get("users:1") is None
+
+
+def test_user_snapshots_fall_back_to_a_live_fetch_when_redis_is_down(app):
+    fetched = []
+
+    class _Client:
+        server_id = 4242
+        remote_users = MediaClient.remote_users
+
+        def fetch_users(self):
+            fetched.append(1)
+            return [RemoteUser(id="1", username="alice")]
+
+    with app.app_context():
+        previous = app.extensions.get("shared_cache")
+        app.extensions["shared_cache"] = make_cache({"CACHE_BACKEND": "redis"}, redis_client=_DownRedis())
+        try:
+            assert _Client().remote_users() == (RemoteUser(id="1", username="alice"),)
+            assert _Client().remote_users() == (RemoteUser(id="1", username="alice"),)
+            USER_CACHE.invalidate(4242)
+        finally:
+            app.extensions["shared_cache"] = previous
+    assert len(fetched) == 2
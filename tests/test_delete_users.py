@@ -0,0 +1,58 @@
+import threading
+import time
+
+from app.extensions import db
+from app.models import Invitation, MediaServer, User
+from app.services.media import service
+
+
+def test_delete_users_batches_per_server(app, monkeypatch):
+    in_flight, peak, lock = {}, {}, threading.Lock()
+
+    class _Client:
+        def __init__(self, server):
+            self.sid = server.id
+
+        def delete_user(self, token):
+            with lock:
+                in_flight[self.sid] = in_flight.get(self.sid, 0) + 1
+                peak[self.sid] = max(peak.get(self.sid, 0), in_flight[self.sid])
+            time.sleep(0.05)
+            with lock:
+                in_flight[self.sid] -= 1
+            if token == "bulk-fail":
+                raise RuntimeError("upstream said no")
+
+    monkeypatch.setattr(service, "get_client_for_media_server", _Client)
+    with app.app_context():
+        app.config["USER_DELETE_PER_SERVER"] = 2
+        servers = [MediaServer(name=f"bulk{i}", server_type="jellyfin", url=f"http://bulk{i}", api_key="k")
+                   for i in range(2)]
+        db.session.add_all(servers)
+        db.session.flush()
+        users = [User(token=f"bulk{i}", username=f"bulk{i}", email="empty", code="c",
+                      server_id=servers[i % 2].id) for i in range(10)]
+        users.append(User(token="bulk-fail", username="bulkfail", email="empty", code="c",
+                          server_id=servers[0].id))
+        users.append(User(token="bulk-local", username="bulklocal", email="empty", code="c"))
+        db.session.add_all(users)
+        db.session.flush()
+        inv = Invitation(code="BULKDEL", used_by_id=users[0].id)
+        db.session.add(inv)
+        db.session.commit()
+        ids = [u.id for u in users]
+        fail_id = users[-2].id
+
+        results = service.delete_users(ids + [999999])
+
+        assert set(results) == set(ids)
+        assert results[fail_id] == "upstream said no"
+        assert all(err is None for uid, err in results.items() if uid != fail_id)
+        assert User.query.filter(User.id.in_(ids)).count() == 0  # removed locally regardless
+        assert db.session.get(Invitation, inv.id).used_by_id is None
+        assert max(peak.values()) == 2
+
+        db.session.delete(db.session.get(Invitation, inv.id))
+        MediaServer.query.filter(MediaServer.name.like("bulk%")).delete(synchronize_session=False)
+        db.session.commit()
+        app.config["USER_DELETE_PER_SERVER"] = 4
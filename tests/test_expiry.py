@@ -0,0 +1,63 @@
+import datetime
+
+from app.extensions import db
+from app.models import ExpiryRetry, MediaServer, User
+from app.services import expiry
+
+
+def test_expired_users_are_deleted_in_batches_and_failures_retried(app, monkeypatch):
+    now = datetime.datetime.now()
+    with app.app_context():
+        server = MediaServer(name="exp", server_type="jellyfin", url="http://exp", api_key="k")
+        db.session.add(server)
+        db.session.flush()
+        users = [
+            User(token=f"t{i}", username=f"u{i}", email="empty", code="c",
+                 expires=now - datetime.timedelta(minutes=1), server_id=server.id)
+            for i in range(5)
+        ]
+        future = User(token="tf", username="future", email="empty", code="c",
+                      expires=now + datetime.timedelta(days=1), server_id=server.id)
+        db.session.add_all(users + [future])
+        db.session.commit()
+        failing, *expected = [u.id for u in users]
+
+        batches = []
+
+        def fake_remote_delete(srv, group):
+            batches.append(len(group))
+            return {u.id: ("boom" if u.id == failing else None) for u in group}
+
+        monkeypatch.setattr(expiry, "remote_delete_users", fake_remote_delete)
+        monkeypatch.setitem(app.config, "EXPIRY_BATCH_SIZE", 2)
+
+        deleted = expiry.delete_user_if_expired()
+
+        assert sorted(deleted) == expected
+        assert batches == [2, 2, 1]
+        remaining = {u.username for u in User.query.filter_by(server_id=server.id)}
+        assert remaining == {"u0", "future"}
+
+        retry = db.session.get(ExpiryRetry, failing)
+        assert retry.attempts == 1 and retry.next_attempt_at > now
+
+        # backing off – not picked up again on the next tick
+        assert expiry.delete_user_if_expired() == []
+
+        User.query.filter_by(server_id=server.id).delete()
+        ExpiryRetry.query.delete()
+        db.session.delete(server)
+        db.session.commit()
+
+
+def test_expiry_check_interval_comes_from_the_app_config(app, monkeypatch):
+    from app.extensions import scheduler
+    from app.tasks.maintenance import schedule_expiry_check
+
+    monkeypatch.setitem(app.config, "EXPIRY_CHECK_SECONDS", 17)
+    schedule_expiry_check(app)
+    try:
+        job = scheduler.get_job("check_expiring")
+        assert job.trigger.interval.total_seconds() == 17
+    finally:
+        scheduler.remove_job("check_expiring")
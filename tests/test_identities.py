@@ -0,0 +1,69 @@
+from app.extensions import db
+from app.models import Identity, MediaServer, User
+from app.services.identities import (
+    link_identities,
+    pending_link_emails,
+    refresh_cards,
+    stale_card_keys,
+)
+
+
+def test_card_key_and_incremental_linking(app):
+    with app.app_context():
+        a = MediaServer(name="ida", server_type="jellyfin", url="http://a", api_key="k")
+        b = MediaServer(name="idb", server_type="plex", url="http://b", api_key="k")
+        db.session.add_all([a, b])
+        db.session.flush()
+        one = User(token="i1", username="one", email=" Same@Example.com", code="c", server_id=a.id)
+        two = User(token="i2", username="two", email="same@example.com", code="c", server_id=b.id)
+        solo = User(token="i3", username="solo", email="None", code="c", server_id=a.id)
+        db.session.add_all([one, two, solo])
+        db.session.commit()
+
+        assert one.email_normalized == "same@example.com"
+        assert one.card_key == two.card_key == "e:same@example.com"
+        assert solo.email_normalized is None and solo.card_key == f"u:{solo.id}"
+        # every account of a card sorts under the card's first name
+        assert one.card_name == two.card_name == "one"
+        assert solo.card_name == "solo"
+        assert pending_link_emails() == ["same@example.com"]
+
+        assert link_identities() == 2
+        db.session.commit()
+        db.session.refresh(one)
+        db.session.refresh(two)
+        assert one.identity_id == two.identity_id
+        assert one.card_key == f"i:{one.identity_id}"
+        assert one.card_name == two.card_name == "one"
+        assert pending_link_emails() == []
+        assert link_identities() == 0
+
+        # unlinking falls back to the e-mail key
+        iid = one.identity_id
+        one.identity = None
+        db.session.commit()
+        assert one.card_key == "e:same@example.com"
+        db.session.refresh(two)
+        assert (one.card_name, two.card_name) == ("one", "two")
+
+        # renaming the first account re-sorts the whole card
+        one.identity_id = two.identity_id = iid
+        db.session.commit()
+        one.username = "Zed"
+        db.session.commit()
+        db.session.refresh(two)
+        assert one.card_name == two.card_name == "two"
+
+        # bulk deletes skip the flush hook – the sync repairs the name later
+        User.query.filter_by(id=two.id).delete()
+        db.session.commit()
+        assert stale_card_keys() == [f"i:{iid}"]
+        refresh_cards(stale_card_keys())
+        db.session.commit()
+        db.session.refresh(one)
+        assert one.card_name == "zed" and stale_card_keys() == []
+
+        User.query.filter(User.server_id.in_([a.id, b.id])).delete()
+        Identity.query.filter_by(id=iid).delete()
+        MediaServer.query.filter(MediaServer.id.in_([a.id, b.id])).delete()
+        db.session.commit()
@@ -0,0 +1,18 @@
+from app.extensions import db
+from app.models import Invitation
+from app.services.invites import get_invite, is_invite_valid
+
+
+def test_invite_lookup_is_case_insensitive_via_normalized_code(app):
+    with app.app_context():
+        inv = Invitation(code="ABCDE12345", used=False)
+        db.session.add(inv)
+        db.session.commit()
+
+        assert inv.code_normalized == "abcde12345"
+        assert get_invite("abcde12345").id == inv.id
+        assert is_invite_valid("AbCdE12345") == (True, "okay")
+        assert get_invite("") is None
+
+        db.session.delete(inv)
+        db.session.commit()
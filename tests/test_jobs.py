@@ -0,0 +1,170 @@
+import datetime
+
+from app.extensions import db
+from app.models import Job, MediaServer, Settings
+from app.services import jobs
+
+
+@jobs.job_type("test_count")
+def _count_job(ctx, n: int):
+    for i in range(n):
+        ctx.progress(i + 1, n)
+    return {"counted": n}
+
+
+@jobs.job_type("test_boom")
+def _boom_job(ctx):
+    raise RuntimeError("boom")
+
+
+@jobs.job_type("test_flaky")
+def _flaky_job(ctx):
+    if not ctx.final_attempt:
+        raise jobs.RetryJob("not yet", delay=60)
+    return {"attempt": ctx.attempt}
+
+
+@jobs.job_type("test_signup", lane="test_lane")
+def _signup_job(ctx):
+    return {}
+
+
+def test_enqueue_dedupes_and_runs(app):
+    with app.app_context():
+        first = jobs.enqueue("test_count", {"n": 3}, key="count")
+        again = jobs.enqueue("test_count", {"n": 5}, key="count")
+        failing = jobs.enqueue("test_boom")
+        assert again.id == first.id
+
+        assert jobs.run_pending() == 2
+        db.session.expire_all()
+        done = db.session.get(Job, first.id)
+        state = jobs.job_state(done)
+        assert state["status"] == "done" and state["percent"] == 100
+        assert state["progress"] == 3 and state["result"] == {"counted": 3}
+
+        failed = db.session.get(Job, failing.id)
+        assert failed.status == "failed" and failed.error == "boom"
+
+        # a finished job no longer blocks its key
+        assert jobs.enqueue("test_count", {"n": 1}, key="count").id != first.id
+        jobs.run_pending()
+
+        Job.query.delete()
+        db.session.commit()
+
+
+def test_requeue_stale(app):
+    with app.app_context():
+        old = datetime.datetime.now() - datetime.timedelta(hours=1)
+        lost = Job(type="test_count", payload='{"n": 1}', status="running", attempts=1, heartbeat_at=old)
+        spent = Job(type="test_count", payload='{"n": 1}', status="running", attempts=3, heartbeat_at=old)
+        alive = Job(type="test_count", payload='{"n": 1}', status="running", attempts=1,
+                    heartbeat_at=datetime.datetime.now())
+        db.session.add_all([lost, spent, alive])
+        db.session.commit()
+
+        assert jobs.requeue_stale() == 2
+        db.session.expire_all()
+        assert (lost.status, spent.status, alive.status) == ("queued", "failed", "running")
+
+        Job.query.delete()
+        db.session.commit()
+
+
+def test_retried_jobs_wait_and_lanes_have_their_own_cap(app):
+    with app.app_context():
+        flaky = jobs.enqueue("test_flaky")
+        assert jobs.run_pending() == 1
+        db.session.expire_all()
+        assert (flaky.status, flaky.attempts, flaky.error) == ("queued", 1, "not yet")
+        assert flaky.run_after > datetime.datetime.now()
+        assert jobs.run_pending() == 0  # not due yet
+
+        # the default lane is full – a job in another lane still runs
+        flaky.run_after = None
+        busy = [Job(type="test_count", payload='{"n": 1}', status="running", attempts=1,
+                    heartbeat_at=datetime.datetime.now()) for _ in range(2)]
+        db.session.add_all(busy)
+        signup = jobs.enqueue("test_signup")
+        assert jobs.lanes() == ["default", "onboarding", "test_lane"]
+        assert jobs.run_pending() == 1
+        db.session.expire_all()
+        assert (flaky.status, signup.status) == ("queued", "done")
+
+        for job in busy:
+            job.status = "done"
+        db.session.commit()
+        app.config["JOBS_MAX_ATTEMPTS"] = 2
+        try:
+            assert jobs.run_pending() == 1
+        finally:
+            app.config["JOBS_MAX_ATTEMPTS"] = 3
+        db.session.expire_all()
+        assert flaky.status == "done" and jobs.job_state(flaky)["result"] == {"attempt": 2}
+
+        Job.query.delete()
+        db.session.commit()
+
+
+def test_job_progress_endpoint(app, client):
+    with app.app_context():
+        db.session.add(Settings(key="admin_username", value="admin"))
+        db.session.add(MediaServer(name="jobs", server_type="jellyfin", url="http://jobs", api_key="k"))
+        job = jobs.enqueue("test_count", {"n": 2})
+        job_id = job.id
+        jobs.run_pending()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "admin"
+        sess["_fresh"] = True
+
+    try:
+        resp = client.get(f"/jobs/{job_id}?format=json")
+        assert resp.status_code == 200
+        assert resp.get_json()["status"] == "done"
+
+        resp = client.get(f"/jobs/{job_id}")
+        assert "job-finished" in resp.headers["HX-Trigger"]
+        assert b"hx-trigger" not in resp.data
+    finally:
+        with app.app_context():
+            Job.query.delete()
+            MediaServer.query.filter_by(name="jobs").delete()
+            Settings.query.filter_by(key="admin_username").delete()
+            db.session.commit()
+
+
+def test_library_refresh_and_ombi_import_are_queued(app, client):
+    with app.app_context():
+        db.session.add_all([
+            Settings(key="admin_username", value="admin"),
+            Settings(key="overseerr_url", value="http://ombi"),
+            Settings(key="ombi_api_key", value="k"),
+            MediaServer(name="queued", server_type="jellyfin", url="http://queued", api_key="k"),
+        ])
+        db.session.commit()
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "admin"
+        sess["_fresh"] = True
+
+    try:
+        first = client.post("/settings/servers/refresh-libraries")
+        again = client.post("/settings/servers/refresh-libraries")
+        assert first.status_code == 200 and first.data == again.data
+        assert b"hx-trigger" in first.data  # polls until the worker is done
+
+        # the wizard leaves the slow importer call to the worker
+        assert client.get("/wizard/").status_code == 200
+        assert client.get("/wizard/").status_code == 200
+
+        with app.app_context():
+            queued = sorted((j.type, j.key) for j in Job.query.filter_by(status="queued"))
+            assert queued == [("ombi_import", "ombi_import"), ("refresh_libraries", "refresh_libraries")]
+    finally:
+        with app.app_context():
+            Job.query.delete()
+            MediaServer.query.filter_by(name="queued").delete()
+            Settings.query.filter(
+                Settings.key.in_(("admin_username", "overseerr_url", "ombi_api_key"))
+            ).delete()
+            db.session.commit()
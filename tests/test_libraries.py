@@ -0,0 +1,66 @@
+from app.extensions import db
+from app.models import Invitation, Library, MediaServer
+from app.services.libraries import LibrarySyncService, library_pairs
+
+
+def test_library_sync_diffs_in_bulk(app):
+    with app.app_context():
+        server = MediaServer(name="libs", server_type="jellyfin", url="http://libs", api_key="k")
+        other = MediaServer(name="libs2", server_type="jellyfin", url="http://libs2", api_key="k")
+        db.session.add_all([server, other])
+        db.session.flush()
+        gone = Library(external_id="lib-gone", name="Old", server_id=server.id)
+        foreign = Library(external_id="lib-foreign", name="Theirs", server_id=other.id)
+        orphan = Library(external_id="lib-orphan", name="Orphan")
+        inv = Invitation(code="LIBSYNC", server_id=server.id)
+        inv.libraries.append(gone)
+        db.session.add_all([gone, foreign, orphan, inv])
+        db.session.add(Library(external_id="lib-keep", name="Keep", server_id=server.id))
+        db.session.commit()
+
+        sync = LibrarySyncService(server)
+        result = sync.apply(library_pairs({"lib-keep": "Keep", "lib-orphan": "Movies", "lib-new": "Music"}))
+        assert result.added == ["lib-new"]
+        assert result.updated == ["lib-orphan"]
+        assert result.removed == ["lib-gone"]
+        assert [lib.name for lib in sync.libraries()] == ["Keep", "Movies", "Music"]
+        assert db.session.get(Library, foreign.id) is not None
+        db.session.refresh(inv)
+        assert inv.libraries == []
+
+        assert not sync.apply({"lib-keep": "Keep", "lib-orphan": "Movies", "lib-new": "Music"}).changed
+
+        db.session.delete(inv)
+        Library.query.filter(Library.server_id.in_([server.id, other.id])).delete()
+        MediaServer.query.filter(MediaServer.id.in_([server.id, other.id])).delete()
+        db.session.commit()
+
+
+def test_join_folder_mapping_uses_local_library_map(app, monkeypatch):
+    from app.services.media.jellyfin import JellyfinClient
+
+    with app.app_context():
+        server = MediaServer(name="libmap", server_type="jellyfin", url="http://libmap", api_key="k")
+        db.session.add(server)
+        db.session.flush()
+        db.session.add(Library(external_id="jf-movies", name="Movies", server_id=server.id))
+        db.session.commit()
+
+        client = JellyfinClient(media_server=server)
+        live = []
+        monkeypatch.setattr(client, "get", lambda path, **kw: live.append(path))
+
+        mapping = client._folder_mapping(["Movies", "jf-movies"])
+        assert mapping["Movies"] == "jf-movies" and live == []
+
+        class _Resp:
+            def json(self):
+                return {"Items": [{"Name": "Shows", "Id": "jf-shows"}]}
+
+        monkeypatch.setattr(client, "get", lambda path, **kw: live.append(path) or _Resp())
+        assert client._folder_mapping(["Shows"])["Shows"] == "jf-shows"
+        assert live == ["/Library/MediaFolders"]
+
+        Library.query.filter_by(server_id=server.id).delete()
+        db.session.delete(server)
+        db.session.commit()
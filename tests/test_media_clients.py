@@ -0,0 +1,125 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from sqlalchemy import update
+
+from app.extensions import db
+from app.models import MediaServer
+from app.services.media import client_base
+from app.services.media.client_base import client_for_server, client_registry_stats, http_session
+from app.services.media.service import get_client
+
+
+@pytest.fixture
+def flaky_server():
+    """Local HTTP server answering 503 once per path, then 200."""
+    hits: dict[str, int] = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def _answer(self):
+            hits[self.path] = hits.get(self.path, 0) + 1
+            self.send_response(503 if hits[self.path] == 1 else 200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_POST = _answer
+
+        def log_message(self, *args):
+            pass
+
+    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}", hits
+    httpd.shutdown()
+
+
+def test_http_session_is_reused_and_replaced_on_url_change(app):
+    with app.app_context():
+        first = http_session(9001, "http://one")
+        assert http_session(9001, "http://one") is first
+
+        closed = []
+        first.close = lambda: closed.append(True)
+        second = http_session(9001, "http://two")
+        assert second is not first and closed == [True]
+        assert http_session(9001, "http://two") is second
+        client_base.close_http_session(9001)
+
+
+def test_http_session_retries_idempotent_requests_only(app, flaky_server):
+    url, hits = flaky_server
+    with app.app_context():
+        app.config["MEDIA_HTTP_BACKOFF"] = 0
+        try:
+            session = http_session(None, url)
+            assert session.get(f"{url}/get", timeout=5).status_code == 200
+            assert hits["/get"] == 2
+            # POST isn't retried – it could create a user twice
+            assert session.post(f"{url}/post", timeout=5).status_code == 503
+            assert hits["/post"] == 1
+        finally:
+            app.config["MEDIA_HTTP_BACKOFF"] = 0.5
+            with client_base._SESSIONS_LOCK:
+                client_base._SESSIONS.pop(url, None)
+
+
+def test_override_client_does_not_replace_the_servers_session(app):
+    with app.app_context():
+        server = MediaServer(name="pooled", server_type="jellyfin", url="http://pooled", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+        try:
+            pooled = http_session(server.id, server.url)
+            adhoc = get_client("jellyfin", url="http://elsewhere", token="t")
+            assert adhoc.server_id is None
+            assert adhoc.http is not pooled
+            assert http_session(server.id, server.url) is pooled
+        finally:
+            db.session.delete(server)
+            db.session.commit()
+
+
+def test_client_registry_hits_misses_and_invalidation(app):
+    with app.app_context():
+        server = MediaServer(name="registry", server_type="jellyfin", url="http://reg", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+        sid = server.id
+        try:
+            first = client_for_server(server)
+            before = client_registry_stats()
+            assert client_for_server(server) is first
+            assert client_registry_stats()["hits"] == before["hits"] + 1
+
+            # edited by another worker: no mapper event here, the fingerprint notices
+            db.session.execute(update(MediaServer).where(MediaServer.id == sid).values(url="http://reg2"))
+            db.session.commit()
+            db.session.refresh(server)
+            second = client_for_server(server)
+            assert second is not first and second.url == "http://reg2"
+
+            # bookkeeping columns keep the client …
+            server.last_sync_status = "ok"
+            db.session.commit()
+            assert client_for_server(server) is second
+
+            # … an api_key edit drops it through the after_update listener
+            invalidations = client_registry_stats()["invalidations"]
+            server.api_key = "k2"
+            db.session.commit()
+            assert client_registry_stats()["invalidations"] == invalidations + 1
+            third = client_for_server(server)
+            assert third is not second and third.token == "k2"
+
+            # override clients never enter the registry
+            size = client_registry_stats()["size"]
+            get_client("jellyfin", url="http://elsewhere", token="t")
+            assert client_registry_stats()["size"] == size
+        finally:
+            db.session.delete(server)
+            db.session.commit()
+        # after_delete forgets the client
+        with client_base._INSTANCES_LOCK:
+            assert sid not in client_base._INSTANCES
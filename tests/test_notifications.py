@@ -0,0 +1,183 @@
+import datetime
+import json
+
+from app.extensions import db
+from app.models import Notification, NotificationDelivery, NotificationEvent
+from app.services import notifications
+
+
+def test_notify_enqueues_and_dispatcher_retries_rate_limited_agents(app, monkeypatch):
+    with app.app_context():
+        ok = Notification(name="ok", type="discord", url="http://ok")
+        limited = Notification(name="limited", type="ntfy", url="http://limited")
+        db.session.add_all([ok, limited])
+        db.session.commit()
+
+        def fake_post(url, data, headers):
+            if url == "http://limited":
+                raise notifications.DeliveryError("429", retry_after=120)
+
+        monkeypatch.setattr(notifications, "_post", fake_post)
+
+        notifications.notify("User Joined", "hello", "tada")
+        assert NotificationDelivery.query.count() == 0  # nothing sent inline
+
+        before = datetime.datetime.now()
+        counts = notifications.dispatch_notifications()
+        assert counts == {"sent": 1, "retry": 1, "failed": 0}
+
+        by_agent = {d.agent_id: d for d in NotificationDelivery.query.all()}
+        assert by_agent[ok.id].status == "sent"
+        retry = by_agent[limited.id]
+        assert retry.status == "pending" and retry.attempts == 1
+        assert retry.next_attempt_at >= before + datetime.timedelta(seconds=120)
+
+        # not due yet – nothing is re-sent
+        assert notifications.dispatch_notifications() == {"sent": 0, "retry": 0, "failed": 0}
+
+        NotificationDelivery.query.delete()
+        NotificationEvent.query.delete()
+        Notification.query.delete()
+        db.session.commit()
+
+
+def test_digest_agent_gets_one_message_per_window(app, monkeypatch):
+    with app.app_context():
+        agent = Notification(name="digest", type="discord", url="http://digest", digest_minutes=10)
+        db.session.add(agent)
+        db.session.commit()
+
+        sent = []
+        monkeypatch.setattr(notifications, "_post", lambda url, data, headers: sent.append(data))
+
+        for i in range(3):
+            notifications.notify("User Joined", f"user{i}", "tada")
+        assert notifications.dispatch_notifications()["sent"] == 0  # window still open
+
+        NotificationDelivery.query.update(
+            {NotificationDelivery.next_attempt_at: datetime.datetime.now()}
+        )
+        db.session.commit()
+        assert notifications.dispatch_notifications()["sent"] == 3
+        assert len(sent) == 1 and "user0" in sent[0] and "user2" in sent[0]
+
+        NotificationDelivery.query.delete()
+        NotificationEvent.query.delete()
+        Notification.query.delete()
+        db.session.commit()
+
+
+def test_large_discord_digest_fits_in_one_message(app, monkeypatch):
+    with app.app_context():
+        agent = Notification(name="burst", type="discord", url="http://burst", digest_minutes=10)
+        db.session.add(agent)
+        db.session.commit()
+
+        sent = []
+        monkeypatch.setattr(notifications, "_post", lambda url, data, headers: sent.append(data))
+
+        for i in range(50):
+            notifications.notify("User Joined", f"User user{i:02d} has joined your server!", "tada")
+        notifications.dispatch_notifications()
+        NotificationDelivery.query.update(
+            {NotificationDelivery.next_attempt_at: datetime.datetime.now()}
+        )
+        db.session.commit()
+        assert notifications.dispatch_notifications() == {"sent": 50, "retry": 0, "failed": 0}
+
+        content = json.loads(sent[0])["content"]
+        assert len(sent) == 1 and len(content) <= 2000
+        assert "user00" in content and "user49" not in content
+        assert content.splitlines()[-1].startswith("… and ")
+        shown = sum(line.startswith("• ") for line in content.splitlines())
+        assert content.endswith(f"… and {50 - shown} more")
+
+        NotificationDelivery.query.delete()
+        NotificationEvent.query.delete()
+        Notification.query.delete()
+        db.session.commit()
+
+
+def test_apprise_objects_are_reused_until_the_agent_changes(app, monkeypatch):
+    built = []
+
+    class FakeApprise:
+        def __init__(self):
+            built.append(self)
+
+        def add(self, url):
+            pass
+
+        def notify(self, title, body):
+            return True
+
+    monkeypatch.setattr(notifications.apprise, "Apprise", FakeApprise)
+    with app.app_context():
+        agent = Notification(name="ap", type="apprise", url="json://a")
+        db.session.add(agent)
+        db.session.commit()
+
+        for _ in range(2):
+            assert notifications._apprise("m", "t", "", agent.url, agent.id)
+        assert len(built) == 1
+
+        agent.url = "json://b"
+        db.session.commit()
+        assert notifications._apprise("m", "t", "", agent.url, agent.id)
+        assert len(built) == 2
+
+        db.session.delete(agent)
+        db.session.commit()
+
+
+def test_notify_leaves_the_transaction_to_the_caller(app):
+    with app.app_context():
+        notifications.notify("User Joined", "rolled back", "tada")
+        db.session.rollback()
+        assert NotificationEvent.query.filter_by(message="rolled back").count() == 0
+
+
+def test_prune_keeps_recent_and_pending_events(app):
+    with app.app_context():
+        agent = Notification(name="prune", type="discord", url="http://prune")
+        db.session.add(agent)
+        db.session.flush()
+        old = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=40)
+        settled, waiting, recent = (
+            NotificationEvent(title="t", message=m, fanned_out=True, created=c)
+            for m, c in (("settled", old), ("waiting", old), ("recent", None))
+        )
+        db.session.add_all([settled, waiting, recent])
+        db.session.flush()
+        now = datetime.datetime.now()
+        db.session.add_all([
+            NotificationDelivery(event_id=settled.id, agent_id=agent.id, status="sent", next_attempt_at=now),
+            NotificationDelivery(event_id=waiting.id, agent_id=agent.id, status="pending", next_attempt_at=now),
+        ])
+        db.session.commit()
+
+        assert notifications.prune_notifications(days=30) == 1
+        assert {e.message for e in NotificationEvent.query.all()} == {"waiting", "recent"}
+        assert NotificationDelivery.query.count() == 1
+
+        NotificationDelivery.query.delete()
+        NotificationEvent.query.delete()
+        Notification.query.delete()
+        db.session.commit()
+
+
+def test_autostart_schedules_the_dispatcher_outside_gunicorn(app, monkeypatch):
+    from app import create_app
+    from app.extensions import scheduler
+    from app.services import jobs
+
+    started = []
+    monkeypatch.setattr(scheduler, "app", scheduler.app)
+    monkeypatch.setattr(scheduler, "start", lambda: started.append("scheduler"))
+    monkeypatch.setattr(jobs, "start_workers", lambda app: started.append("workers"))
+
+    config = type("AutostartConfig", (), {**app.config, "SCHEDULER_AUTOSTART": True})
+    other = create_app(config)
+    assert started == ["scheduler", "workers"]
+    assert scheduler.app is other
+    assert scheduler.get_job("dispatch_notifications") is not None
@@ -0,0 +1,58 @@
+from app import middleware
+from app.extensions import db
+from app.models import MediaServer, Settings
+
+
+def test_onboarding_state_is_latched_and_rearmed(app, client):
+    assert client.get("/health").status_code == 200  # exempt by prefix
+
+    with app.app_context():
+        assert client.get("/j/abc").status_code == 302
+
+        db.session.add(Settings(key="admin_username", value="admin"))
+        server = MediaServer(name="s", server_type="jellyfin", url="http://s", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+
+        with app.test_request_context("/j/abc"):
+            assert middleware._onboarded()
+        assert middleware._onboarded_at is not None
+
+        # removing the last server bumps the settings version → re-checked
+        MediaServer.query.filter_by(id=server.id).delete()
+        db.session.commit()
+        with app.test_request_context("/j/abc"):
+            assert not middleware._onboarded()
+        assert middleware._onboarded_at is None
+
+        Settings.query.filter_by(key="admin_username").delete()
+        db.session.commit()
+
+
+def test_onboarding_latch_survives_settings_and_sync_writes(app):
+    with app.app_context():
+        db.session.add(Settings(key="admin_username", value="admin"))
+        server = MediaServer(name="latched", server_type="jellyfin", url="http://latched", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+        with app.test_request_context("/j/abc"):
+            assert middleware._onboarded()
+        latched = middleware._onboarded_at
+
+        # ordinary edits don't re-arm the check
+        db.session.add(Settings(key="server_name", value="Latched"))
+        server.url = "http://latched2"
+        db.session.commit()
+        with app.test_request_context("/j/abc"):
+            assert middleware._onboarded()
+        assert middleware._onboarded_at == latched
+
+        # clearing the admin account does
+        Settings.query.filter_by(key="admin_username").first().value = ""
+        db.session.commit()
+        with app.test_request_context("/j/abc"):
+            assert not middleware._onboarded()
+
+        db.session.delete(server)
+        Settings.query.filter(Settings.key.in_(("admin_username", "server_name"))).delete()
+        db.session.commit()
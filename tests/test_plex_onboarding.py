@@ -0,0 +1,175 @@
+import datetime
+
+from plexapi.exceptions import Unauthorized
+
+from app.extensions import db
+from app.models import Invitation, Job, MediaServer, PlexOnboarding, Settings, User
+from app.services import jobs
+from app.services.media import plex
+
+
+class _Account:
+    email, username = "joiner@example.com", "joiner"
+    accepted = []
+
+    def __init__(self, token=None, session=None):
+        self.token = token
+
+    def acceptInvite(self, owner):
+        self.accepted.append((self.token, owner))
+
+    def enableViewStateSync(self):
+        pass
+
+    def onlineMediaSources(self):
+        return []
+
+
+class _Client:
+    invited = []
+    admin = type("Admin", (), {"email": "owner@example.com"})()
+
+    def invite_friend(self, email, libs, allow_sync, allow_tv):
+        self.invited.append(email)
+
+
+def test_plex_join_is_onboarded_by_a_job(app, client, monkeypatch):
+    monkeypatch.setattr(plex, "MyPlexAccount", _Account)
+    monkeypatch.setattr(plex, "get_client_for_media_server", lambda server: _Client())
+    with app.app_context():
+        db.session.add(Settings(key="admin_username", value="admin"))
+        server = MediaServer(name="plexjoin", server_type="plex", url="http://plexjoin", api_key="k")
+        db.session.add(server)
+        db.session.flush()
+        db.session.add(Invitation(code="PLEXJOIN01", server_id=server.id, unlimited=True))
+        db.session.commit()
+        sid = server.id
+
+    try:
+        resp = client.post("/join", data={"code": "PLEXJOIN01", "token": "user-token"})
+        assert resp.status_code == 302 and "/wizard" in resp.headers["Location"]
+        assert client.get("/join/status/PLEXJOIN01?format=json").get_json()["status"] == "pending"
+        # another visitor can't peek at the sign-up
+        assert app.test_client().get("/join/status/PLEXJOIN01").status_code == 404
+
+        with app.app_context():
+            assert jobs.run_pending() == 1
+            row = PlexOnboarding.query.filter_by(code="PLEXJOIN01").one()
+            assert (row.status, row.email, row.token) == ("accepted", "joiner@example.com", None)
+            assert db.session.get(Job, row.job_id).status == "done"
+            assert User.query.filter_by(server_id=sid, email="joiner@example.com").count() == 1
+        assert _Client.invited == ["joiner@example.com"]
+        assert _Account.accepted == [("user-token", "owner@example.com")]
+
+        state = client.get("/join/status/PLEXJOIN01?format=json").get_json()
+        assert state == {"code": "PLEXJOIN01", "status": "accepted", "finished": True, "retrying": False}
+
+        # a full onboarding queue turns joins away instead of queueing more
+        app.config["PLEX_ONBOARD_QUEUE_LIMIT"] = 0
+        resp = client.post("/join", data={"code": "PLEXJOIN01", "token": "other-token"})
+        assert resp.status_code == 200 and b"Too many people" in resp.data
+        with app.app_context():
+            assert PlexOnboarding.query.filter_by(code="PLEXJOIN01").count() == 1
+    finally:
+        app.config["PLEX_ONBOARD_QUEUE_LIMIT"] = 50
+        with app.app_context():
+            PlexOnboarding.query.delete()
+            Job.query.delete()
+            Invitation.query.filter_by(code="PLEXJOIN01").delete()
+            User.query.filter_by(server_id=sid).delete()
+            MediaServer.query.filter_by(id=sid).delete()
+            Settings.query.filter_by(key="admin_username").delete()
+            db.session.commit()
+
+
+class _FlakyClient(_Client):
+    failures = []
+
+    def invite_friend(self, email, libs, allow_sync, allow_tv):
+        if self.failures:
+            raise self.failures.pop(0)
+        super().invite_friend(email, libs, allow_sync, allow_tv)
+
+
+class _FlakyAccount(_Account):
+    failures = []
+
+    def acceptInvite(self, owner):
+        if self.failures:
+            raise self.failures.pop(0)
+        super().acceptInvite(owner)
+
+
+def test_failed_plex_invites_are_retried_and_shown(app, client, monkeypatch):
+    monkeypatch.setattr(plex, "MyPlexAccount", _FlakyAccount)
+    monkeypatch.setattr(plex, "get_client_for_media_server", lambda server: _FlakyClient())
+    with app.app_context():
+        db.session.add(Settings(key="admin_username", value="admin"))
+        server = MediaServer(name="plexretry", server_type="plex", url="http://plexretry", api_key="k")
+        db.session.add(server)
+        db.session.flush()
+        db.session.add(Invitation(code="PLEXRETRY1", server_id=server.id, unlimited=True))
+        db.session.commit()
+        sid = server.id
+
+    try:
+        # a Plex hiccup keeps the sign-up pending and retries its job later
+        _FlakyClient.failures = [ConnectionError("plex.tv timed out")]
+        client.post("/join", data={"code": "PLEXRETRY1", "token": "retry-token"})
+        with app.app_context():
+            assert jobs.run_pending() == 1
+            row = PlexOnboarding.query.filter_by(code="PLEXRETRY1").one()
+            job = db.session.get(Job, row.job_id)
+            assert (row.status, row.error, row.token) == ("pending", "plex.tv timed out", "retry-token")
+            assert job.status == "queued" and job.run_after > datetime.datetime.now()
+            job_id = job.id
+        state = client.get("/join/status/PLEXRETRY1?format=json").get_json()
+        assert (state["status"], state["finished"], state["retrying"]) == ("pending", False, True)
+        assert b"trying again" in client.get("/join/status/PLEXRETRY1").data
+
+        with app.app_context():
+            db.session.get(Job, job_id).run_after = None
+            db.session.commit()
+            assert jobs.run_pending() == 1
+            row = PlexOnboarding.query.filter_by(code="PLEXRETRY1").one()
+            assert (row.status, row.error, row.token) == ("accepted", None, None)
+
+        # a token Plex rejects won't get better – fail at once and offer a retry
+        _FlakyClient.failures = [Unauthorized("(401) unauthorized")]
+        client.post("/join", data={"code": "PLEXRETRY1", "token": "bad-token"})
+        with app.app_context():
+            assert jobs.run_pending() == 1
+            row = PlexOnboarding.query.filter_by(code="PLEXRETRY1").order_by(PlexOnboarding.id.desc()).first()
+            assert (row.status, row.token) == ("failed", None)
+            assert db.session.get(Job, row.job_id).status == "failed"
+            # the failed invite left no local account with the rejected token behind
+            assert [u.token for u in User.query.filter_by(server_id=sid)] == ["retry-token"]
+        html = client.get("/join/status/PLEXRETRY1").get_data(as_text=True)
+        assert "Try again" in html and "/j/PLEXRETRY1" in html
+
+        # accepting is retried too; once out of attempts the token is dropped
+        # and the user is left to accept the invite in Plex
+        _FlakyAccount.failures = [ConnectionError("accept timed out")] * app.config["JOBS_MAX_ATTEMPTS"]
+        client.post("/join", data={"code": "PLEXRETRY1", "token": "accept-token"})
+        with app.app_context():
+            assert jobs.run_pending() == 1
+            row = PlexOnboarding.query.filter_by(code="PLEXRETRY1").order_by(PlexOnboarding.id.desc()).first()
+            assert (row.status, row.token) == ("invited", "accept-token")
+            assert db.session.get(Job, row.job_id).status == "queued"
+            for _ in range(app.config["JOBS_MAX_ATTEMPTS"] - 1):
+                db.session.get(Job, row.job_id).run_after = None
+                db.session.commit()
+                assert jobs.run_pending() == 1
+            row = db.session.get(PlexOnboarding, row.id)
+            assert (row.status, row.token, row.error) == ("invited", None, "accept timed out")
+        state = client.get("/join/status/PLEXRETRY1?format=json").get_json()
+        assert (state["status"], state["finished"], state["retrying"]) == ("invited", True, False)
+    finally:
+        with app.app_context():
+            PlexOnboarding.query.delete()
+            Job.query.delete()
+            Invitation.query.filter_by(code="PLEXRETRY1").delete()
+            User.query.filter_by(server_id=sid).delete()
+            MediaServer.query.filter_by(id=sid).delete()
+            Settings.query.filter_by(key="admin_username").delete()
+            db.session.commit()
@@ -0,0 +1,48 @@
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import MediaServer, User
+from app.services.media.client_base import RemoteUser, reconcile_users
+
+
+def _reconcile(server_id, remote):
+    return reconcile_users(
+        server_id,
+        remote,
+        key="token",
+        remote_key=lambda u: u.id,
+        row_values=lambda u: {"token": u.id, "username": u.username, "code": "empty"},
+        update_fields=("username",),
+    )
+
+
+def test_reconcile_users_is_set_based(app):
+    with app.app_context():
+        server = MediaServer(name="reconcile", server_type="jellyfin", url="http://x", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+
+        _reconcile(server.id, [RemoteUser(id=str(i), username=f"user{i}") for i in range(2000)])
+        assert User.query.filter_by(server_id=server.id).count() == 2000
+
+        # user 0 renamed, user 1 gone, user 2000 new
+        remote = [RemoteUser(id="0", username="renamed")]
+        remote += [RemoteUser(id=str(i), username=f"user{i}") for i in range(2, 2001)]
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            result = _reconcile(server.id, remote)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+
+        assert (result.inserted, result.updated, result.deleted) == (1, 1, 1)
+        assert len(statements) <= 5
+        tokens = {t for (t,) in db.session.query(User.token).filter_by(server_id=server.id)}
+        assert "1" not in tokens and "2000" in tokens
+        assert db.session.query(User.username).filter_by(server_id=server.id, token="0").scalar() == "renamed"
+
+        User.query.filter_by(server_id=server.id).delete()
+        db.session.delete(server)
+        db.session.commit()
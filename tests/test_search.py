@@ -0,0 +1,38 @@
+from app.extensions import db
+from app.models import Identity, Invitation, MediaServer, User
+from app.services.search import invite_ids, search_available, user_search_clause
+
+
+def test_search_index_follows_writes(app):
+    with app.app_context():
+        assert search_available()
+        server = MediaServer(name="fts", server_type="jellyfin", url="http://fts", api_key="k")
+        ident = Identity(primary_email="Owner@Family.example")
+        db.session.add_all([server, ident])
+        db.session.flush()
+        alice = User(token="fa", username="AliceSmith", email="empty", code="c", server_id=server.id)
+        linked = User(token="fb", username="kid", email="empty", code="c", server_id=server.id,
+                      identity_id=ident.id)
+        inv = Invitation(code="ZXQ987", server_id=server.id)
+        db.session.add_all([alice, linked, inv])
+        db.session.commit()
+
+        def matches(term):
+            return {u.token for u in User.query.filter(user_search_clause(term))}
+
+        assert matches("cesmi") == {"fa"}
+        assert matches("family") == {"fb"}  # via the identity's e-mail
+        assert invite_ids("xq98") == [inv.id]
+
+        alice.username = "Bob"
+        db.session.commit()
+        assert matches("alice") == set()
+        assert matches("bob") == {"fa"}
+
+        User.query.filter(User.server_id == server.id).delete()
+        db.session.delete(inv)
+        db.session.delete(ident)
+        db.session.delete(server)
+        db.session.commit()
+        assert matches("bob") == set()
+        assert invite_ids("xq98") == []
@@ -0,0 +1,56 @@
+import datetime
+
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import MediaServer, Settings
+from app.services import settings as settings_service
+
+
+def test_settings_are_cached_and_invalidated_by_writes(app):
+    with app.app_context():
+        db.session.add(Settings(key="server_name", value="Before"))
+        db.session.commit()
+        assert settings_service.get_setting("server_name") == "Before"
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, "before_cursor_execute", listener)
+        try:
+            with app.test_request_context("/"):
+                for _ in range(5):
+                    settings_service.get_setting("server_name")
+                    settings_service.get_settings()
+        finally:
+            event.remove(db.engine, "before_cursor_execute", listener)
+        # one tiny version check at most, never the settings table itself
+        assert len(statements) <= 1
+        assert all("settings_version" in sql for sql in statements)
+
+        Settings.query.filter_by(key="server_name").first().value = "After"
+        db.session.commit()
+        assert settings_service.get_setting("server_name") == "After"
+
+        Settings.query.filter_by(key="server_name").delete()
+        db.session.commit()
+        assert settings_service.get_setting("server_name", "Wizarr") == "Wizarr"
+
+
+def test_sync_bookkeeping_does_not_bump_the_settings_version(app):
+    with app.app_context():
+        server = MediaServer(name="bump", server_type="jellyfin", url="http://bump", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+        version = settings_service.settings_version()
+
+        server.last_synced_at = datetime.datetime.now()
+        server.last_sync_status = "ok"
+        db.session.commit()
+        assert settings_service.settings_version() == version
+
+        server.url = "http://bumped"
+        db.session.commit()
+        assert settings_service.settings_version() != version
+
+        db.session.delete(server)
+        db.session.commit()
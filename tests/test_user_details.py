@@ -0,0 +1,43 @@
+import time
+
+from app.extensions import db
+from app.models import MediaServer, User
+from app.services.media import service
+
+
+class _SlowClient:
+    calls = 0
+
+    def get_user(self, user_id):
+        type(self).calls += 1
+        time.sleep(0.3)
+        return {"Policy": {"EnableAllFolders": True}, "Id": user_id}
+
+
+def test_fetch_user_details_runs_concurrently_and_caches(app, monkeypatch):
+    monkeypatch.setattr(service, "get_client_for_media_server", lambda server: _SlowClient())
+    with app.app_context():
+        servers = [
+            MediaServer(name=f"det{i}", server_type="jellyfin", url=f"http://det{i}", api_key="k")
+            for i in range(4)
+        ]
+        db.session.add_all(servers)
+        db.session.flush()
+        accounts = [
+            User(token=f"det{i}", username="det", email="empty", code="c", server_id=s.id)
+            for i, s in enumerate(servers)
+        ]
+        db.session.add_all(accounts)
+        db.session.commit()
+
+        start = time.perf_counter()
+        details = service.fetch_user_details(accounts)
+        assert time.perf_counter() - start < 1.0  # not 4 × 0.3 s
+        assert {d["Id"] for d in details.values()} == {f"det{i}" for i in range(4)}
+
+        service.fetch_user_details(accounts)
+        assert _SlowClient.calls == 4  # second round served from the cache
+
+        User.query.filter(User.token.like("det%")).delete(synchronize_session=False)
+        MediaServer.query.filter(MediaServer.name.like("det%")).delete(synchronize_session=False)
+        db.session.commit()
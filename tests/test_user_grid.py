@@ -0,0 +1,57 @@
+import datetime
+import re
+
+import pytest
+
+from app.extensions import db
+from app.models import MediaServer, Settings, User
+
+
+@pytest.fixture
+def grid_server(app):
+    with app.app_context():
+        db.session.add(Settings(key="admin_username", value="admin"))
+        server = MediaServer(name="grid", server_type="jellyfin", url="http://grid", api_key="k",
+                             last_synced_at=datetime.datetime.now())
+        db.session.add(server)
+        db.session.flush()
+        db.session.add_all(
+            User(token=f"g{i}", username=f"Grid{i:02d}", email="empty", code="c", server_id=server.id)
+            for i in range(25)
+        )
+        # two accounts sharing a real e-mail form one card
+        db.session.add_all([
+            User(token="ga", username="Grid05b", email="same@example.com", code="c", server_id=server.id),
+            User(token="gb", username="Grid20b", email="same@example.com", code="c", server_id=server.id),
+        ])
+        db.session.commit()
+        sid = server.id
+    yield sid
+    with app.app_context():
+        User.query.filter_by(server_id=sid).delete()
+        MediaServer.query.filter_by(id=sid).delete()
+        Settings.query.filter_by(key="admin_username").delete()
+        db.session.commit()
+
+
+def test_user_grid_pages_with_keyset_cursor(client, grid_server):
+    sid = grid_server
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "admin"
+        sess["_fresh"] = True
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        url = f"/users/table?server={sid}&q=grid&per_page=10" + (f"&cursor={cursor}" if cursor else "")
+        html = client.get(url).get_data(as_text=True)
+        pages += 1
+        seen += re.findall(r'name="uids" value="(\d+)"', html)
+        if pages == 1:
+            assert "26 users" in html  # cards, not accounts
+        m = re.search(r"cursor=([\w=-]+)&(?:amp;)?per_page=10", html)
+        if not m:
+            break
+        cursor = m.group(1)
+
+    assert pages == 3
+    assert len(seen) == len(set(seen)) == 26  # 27 accounts, one merged card
@@ -0,0 +1,132 @@
+import time
+
+import pytest
+
+from app.extensions import db
+from app.models import Job, MediaServer, Settings
+from app.services import jobs
+from app.services.media import service
+
+
+@pytest.fixture
+def servers(app):
+    with app.app_context():
+        rows = [
+            MediaServer(name=name, server_type="jellyfin", url=f"http://{name}", api_key="k")
+            for name in ("fast", "slow", "broken")
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+        ids = {row.name: row.id for row in rows}
+    yield ids
+    with app.app_context():
+        MediaServer.query.filter(MediaServer.id.in_(ids.values())).delete()
+        db.session.commit()
+
+
+def test_sync_all_servers_runs_concurrently_with_deadline(app, servers, monkeypatch):
+    def fake_list_users_for_server(server, *, clear_cache=False, stamp=True):
+        if server.name == "slow":
+            time.sleep(1)
+        if server.name == "broken":
+            raise RuntimeError("boom")
+        return []
+
+    monkeypatch.setattr(service, "list_users_for_server", fake_list_users_for_server)
+    monkeypatch.setitem(app.config, "USER_SYNC_DEADLINE", 0.5)
+
+    with app.app_context():
+        started = time.monotonic()
+        statuses = service.sync_users_all_servers()
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 1.5
+        assert statuses == {
+            servers["fast"]: "ok",
+            servers["slow"]: "timeout",
+            servers["broken"]: "error",
+        }
+        assert db.session.get(MediaServer, servers["broken"]).last_sync_status == "error"
+
+        # the straggler finishes later but keeps its "timeout" status
+        time.sleep(1)
+        db.session.expire_all()
+        assert db.session.get(MediaServer, servers["slow"]).last_sync_status == "timeout"
+        assert db.session.get(MediaServer, servers["fast"]).last_sync_status == "ok"
+
+
+def test_user_grid_reads_the_mirror_and_syncs_new_servers_once(app, client, monkeypatch):
+    calls = []
+
+    class _Client:
+        def list_users(self):
+            calls.append(1)
+            return []
+
+    monkeypatch.setattr(service, "get_client_for_media_server", lambda server: _Client())
+    with app.app_context():
+        db.session.add(Settings(key="admin_username", value="admin"))
+        server = MediaServer(name="fresh", server_type="jellyfin", url="http://fresh", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+        sid = server.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "admin"
+        sess["_fresh"] = True
+
+    try:
+        # the first render only queues a sync – and only once
+        assert client.get("/users/table").status_code == 200
+        assert client.get("/users/table?cursor=x").status_code == 200
+        assert client.get("/users/table?q=a").status_code == 200
+        assert calls == []
+        with app.app_context():
+            assert Job.query.filter_by(key=f"sync_users:{sid}").count() == 1
+            assert jobs.run_pending() == 1
+            server = db.session.get(MediaServer, sid)
+            assert server.last_synced_at is not None and server.last_sync_status == "ok"
+        # later renders come from the local mirror only
+        assert client.get("/users/table").status_code == 200
+        with app.app_context():
+            assert jobs.run_pending() == 0
+        assert len(calls) == 1
+    finally:
+        with app.app_context():
+            Job.query.delete()
+            MediaServer.query.filter_by(id=sid).delete()
+            Settings.query.filter_by(key="admin_username").delete()
+            db.session.commit()
+
+
+def test_a_failed_first_sync_is_not_queued_again(app, client, monkeypatch):
+    class _Down:
+        def list_users(self):
+            raise ConnectionError("unreachable")
+
+    monkeypatch.setattr(service, "get_client_for_media_server", lambda server: _Down())
+    with app.app_context():
+        db.session.add(Settings(key="admin_username", value="admin"))
+        server = MediaServer(name="down", server_type="jellyfin", url="http://down", api_key="k")
+        db.session.add(server)
+        db.session.commit()
+        sid = server.id
+    with client.session_transaction() as sess:
+        sess["_user_id"] = "admin"
+        sess["_fresh"] = True
+
+    try:
+        assert client.get("/users/table").status_code == 200
+        with app.app_context():
+            assert jobs.run_pending() == 1
+            server = db.session.get(MediaServer, sid)
+            assert server.last_synced_at is None and server.last_sync_status == "error"
+        # the scheduler retries it; grid renders don't
+        assert client.get("/users/table").status_code == 200
+        with app.app_context():
+            assert jobs.run_pending() == 0
+    finally:
+        with app.app_context():
+            Job.query.delete()
+            MediaServer.query.filter_by(id=sid).delete()
+            Settings.query.filter_by(key="admin_username").delete()
+            db.session.commit()
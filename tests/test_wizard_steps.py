@@ -0,0 +1,55 @@
+import os
+
+from app.services.wizard_steps import StepRegistry
+
+
+def test_steps_are_parsed_once_and_reloaded_on_change(app, tmp_path):
+    server_dir = tmp_path / "plex"
+    server_dir.mkdir()
+    step = server_dir / "01_intro.md"
+    step.write_text("---\nrequires: [discord_id]\n---\n# Hi {{ name }}\n")
+
+    with app.test_request_context():
+        registry = StepRegistry(tmp_path, app.jinja_env)
+        first = registry.steps("plex")
+        assert registry.steps("plex") is first
+        assert not first[0].eligible({})
+        assert first[0].render({"name": "Bob"}) == "<h1>Hi Bob</h1>"
+
+        step.write_text("# Bye {{ name }}\n")
+        st = step.stat()
+        os.utime(step, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        reloaded = registry.steps("plex")
+        assert reloaded is not first
+        assert reloaded[0].render({"name": "Bob"}) == "<h1>Bye Bob</h1>"
+
+        assert registry.steps("..") == []
+
+
+def test_rendered_html_is_cached_per_settings_fingerprint(app, tmp_path):
+    from app.extensions import db
+    from app.models import Settings
+
+    (tmp_path / "plex").mkdir()
+    (tmp_path / "plex" / "01.md").write_text("[Join]({{ discord_id }})\n")
+
+    with app.test_request_context():
+        registry = StepRegistry(tmp_path, app.jinja_env)
+        step = registry.steps("plex")[0]
+        assert step.names == {"discord_id"}
+
+        for _ in range(5):
+            registry.render(step, {"discord_id": "123", "unrelated": "x"})
+        registry.render(step, {"discord_id": "123", "unrelated": "y"})
+        assert registry.stats == {"hits": 5, "misses": 1}
+
+        assert "456" in registry.render(step, {"discord_id": "456"})
+        assert registry.stats["misses"] == 2
+
+        db.session.add(Settings(key="wizard_cache_test", value="1"))
+        db.session.commit()
+        registry.render(step, {"discord_id": "123"})
+        assert registry.stats["misses"] == 3
+
+        Settings.query.filter_by(key="wizard_cache_test").delete()
+        db.session.commit()